@@ -0,0 +1,429 @@
+"""
+Serviço de agregação multi-dispositivo (alternativa de longa duração à Lambda).
+
+Assina veiculos/+/eventos, acumula os eventos de todos os veículos por até
+`max_latency_ms` (ou `max_batch` eventos), extrai as features de todas as
+janelas e chama o modelo uma única vez por lote, publicando cada resultado em
+veiculos/{dev}/resposta_IA com o mesmo payload da Lambda.
+
+- Backpressure: a fila de entrada é limitada; cheia, o produtor espera
+  (overflow='block', o cliente MQTT deixa de ler o socket) ou o evento é
+  descartado e contado (overflow='drop').
+- Ordem por dispositivo: um único coletor e um único classificador consomem
+  as filas em ordem FIFO e as respostas de um lote são publicadas em ordem,
+  então as respostas de um mesmo veículo saem na ordem de chegada.
+- Deduplicação: reentregas QoS 1 (mesma chave dispositivo/ts/amostras, ver
+  idempotency.py) são descartadas antes da fila.
+- Contadores: recebidos, descartados, duplicados, inválidos, classificados,
+  publicados, tamanho médio do lote, vazão e latência (chegada -> publish) p50/p95/max.
+
+Uso:
+  python aggregation_service.py --broker local --devices 500   # broker em memória + frota simulada
+  python aggregation_service.py --broker mqtt --host <endpoint> --ca root-CA.pem --cert ... --key ...
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from event_codec import encode_binary, payload_to_event
+from feature_engineering import TAXA_ATUALIZACAO_HZ, derive_channels
+from idempotency import DedupFilter, SQLiteBackend, event_key
+from model_artifacts import load_artifacts
+from scoring import EVENT_KEYS, classify_windows, is_stationary, parse_window
+
+TOPIC_EVENTS = 'veiculos/+/eventos'
+TOPIC_RESPONSE = 'veiculos/{dev}/resposta_IA'
+OVERFLOW_POLICIES = ('block', 'drop')
+
+
+def topic_matches(pattern, topic):
+    """Filtro MQTT com curingas '+' (um nível) e '#' (restante)."""
+    p_parts, t_parts = pattern.split('/'), topic.split('/')
+    for i, p in enumerate(p_parts):
+        if p == '#':
+            return True
+        if i >= len(t_parts) or (p != '+' and p != t_parts[i]):
+            return False
+    return len(p_parts) == len(t_parts)
+
+
+# --- TRANSPORTES ---
+
+class LocalBroker:
+    """
+    Broker MQTT em memória para testes locais: mesma interface assíncrona do
+    PahoTransport (subscribe/publish), entrega direta aos handlers assinados.
+    """
+
+    def __init__(self):
+        self._subs = []
+
+    async def subscribe(self, pattern, handler):
+        self._subs.append((pattern, handler))
+
+    async def publish(self, topic, payload):
+        for pattern, handler in self._subs:
+            if topic_matches(pattern, topic):
+                await handler(topic, payload)
+
+    async def close(self):
+        self._subs.clear()
+
+
+class PahoTransport:
+    """
+    Cliente paho-mqtt (mesma configuração TLS do dashboard). O loop de rede do
+    paho roda em outra thread; as mensagens são repassadas ao event loop e a
+    thread espera a fila aceitar o evento, o que propaga o backpressure até o
+    broker via TCP.
+    """
+
+    def __init__(self, host, port=8883, client_id='Aggregation_Service', ca=None, cert=None, key=None):
+        import paho.mqtt.client as mqtt
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        if ca:
+            import ssl
+            self.client.tls_set(ca_certs=ca, certfile=cert, keyfile=key, tls_version=ssl.PROTOCOL_TLSv1_2)
+        self.host, self.port = host, port
+        self._subs = []
+        self._loop = None
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    async def connect(self):
+        self._loop = asyncio.get_running_loop()
+        self.client.connect(self.host, self.port, 60)
+        self.client.loop_start()
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        if rc == 0:
+            for pattern, _ in self._subs:
+                client.subscribe(pattern)
+
+    def _on_message(self, client, userdata, msg):
+        for pattern, handler in self._subs:
+            if topic_matches(pattern, msg.topic):
+                asyncio.run_coroutine_threadsafe(handler(msg.topic, msg.payload), self._loop).result()
+
+    async def subscribe(self, pattern, handler):
+        self._subs.append((pattern, handler))
+        self.client.subscribe(pattern)
+
+    async def publish(self, topic, payload):
+        self.client.publish(topic, payload, qos=0)
+
+    async def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+# --- MÉTRICAS ---
+
+class ServiceStats:
+    """Contadores do serviço; latências guardadas em uma janela das últimas `window` respostas."""
+
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.received = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.scored = 0
+        self.published = 0
+        self.publish_failed = 0
+        self.batches = 0
+        self.latencies_ms = deque(maxlen=window)
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        lat = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'duplicates': self.duplicates,
+            'duplicate_rate': round(self.duplicates / self.received, 4) if self.received else 0.0,
+            'invalid': self.invalid,
+            'scored': self.scored,
+            'published': self.published,
+            'publish_failed': self.publish_failed,
+            'batches': self.batches,
+            'avg_batch': round(self.scored / self.batches, 1) if self.batches else 0.0,
+            'throughput_eps': round(self.scored / elapsed, 1) if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'p50': round(float(np.percentile(lat, 50)), 2),
+                'p95': round(float(np.percentile(lat, 95)), 2),
+                'max': round(float(lat.max()), 2),
+            },
+        }
+
+
+# --- SERVIÇO ---
+
+class _Pending:
+    __slots__ = ('device_id', 'event', 'arrived', 'key')
+
+    def __init__(self, device_id, event, arrived, key=None):
+        self.device_id = device_id
+        self.event = event
+        self.arrived = arrived
+        self.key = key              # chave de idempotência registrada no DedupFilter
+
+
+class AggregationService:
+    """
+    artifacts: ModelArtifacts (model_artifacts.load_artifacts).
+    transport: LocalBroker ou PahoTransport.
+    dedup: DedupFilter opcional (None = sem deduplicação).
+    """
+
+    def __init__(self, artifacts, transport, max_latency_ms=20.0, max_batch=512,
+                 queue_size=8192, overflow='block', fs=TAXA_ATUALIZACAO_HZ, dedup=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow inválido: {overflow} (opções: {', '.join(OVERFLOW_POLICIES)})")
+        self.artifacts = artifacts
+        self.transport = transport
+        self.max_latency = max_latency_ms / 1e3
+        self.max_batch = max_batch
+        self.overflow = overflow
+        self.fs = fs
+        self.dedup = dedup
+        self.stats = ServiceStats()
+        self._inbox = asyncio.Queue(maxsize=queue_size)
+        # Um lote sendo classificado e um pronto: o coletor segue acumulando nesse meio tempo
+        self._batches = asyncio.Queue(maxsize=2)
+        self._tasks = []
+
+    async def start(self):
+        await self.transport.subscribe(TOPIC_EVENTS, self.on_message)
+        self._tasks = [asyncio.create_task(self._collect(), name='agg-collect'),
+                       asyncio.create_task(self._score(), name='agg-score')]
+
+    async def on_message(self, topic, payload):
+        """Handler do tópico de eventos: decodifica (JSON ou binário) e enfileira (com backpressure)."""
+        self.stats.received += 1
+        try:
+            event = payload_to_event(payload)
+        except (ValueError, KeyError):
+            event = None
+        if not isinstance(event, dict):
+            self.stats.invalid += 1
+            return
+        device_id = event.get('dev_id') or topic.split('/')[1]
+        key = None
+        if self.dedup is not None:
+            try:
+                key = event_key(device_id, event.get('ts', 0), event)
+            except (ValueError, KeyError):
+                self.stats.invalid += 1
+                return
+            if self.dedup.check(key):
+                self.stats.duplicates += 1
+                return
+        item = _Pending(device_id, event, time.perf_counter(), key)
+        if self.overflow == 'block':
+            await self._inbox.put(item)
+        else:
+            try:
+                self._inbox.put_nowait(item)
+            except asyncio.QueueFull:
+                self.stats.dropped += 1
+                self._forget(item)      # descartado: a reentrega ainda deve ser aceita
+
+    def _forget(self, item):
+        if item.key is not None:
+            self.dedup.forget(item.key)
+
+    async def _collect(self):
+        """Agrupa eventos até max_batch ou até o orçamento de latência do primeiro do lote."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._inbox.get()]
+            deadline = loop.time() + self.max_latency - (time.perf_counter() - batch[0].arrived)
+            while len(batch) < self.max_batch:
+                if not self._inbox.empty():
+                    batch.append(self._inbox.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._inbox.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._batches.put(batch)
+
+    def score_batch(self, batch):
+        """Classifica um lote (roda fora do event loop). Retorna rótulo ou None (inválido) por item."""
+        labels = [None] * len(batch)
+        pending = []
+        for i, item in enumerate(batch):
+            try:
+                window = derive_channels(parse_window(item.event), fs=self.fs)
+            except Exception:
+                continue
+            if is_stationary(window):
+                labels[i] = 'slow'
+            else:
+                pending.append((i, window))
+        if pending:
+            predicted = classify_windows(self.artifacts, [w for _, w in pending], fs=self.fs)
+            for (i, _), label in zip(pending, predicted):
+                labels[i] = str(label)
+        return labels
+
+    async def _score(self):
+        while True:
+            batch = await self._batches.get()
+            try:
+                labels = await asyncio.to_thread(self.score_batch, batch)
+            except Exception as e:
+                print(f"ERRO ao classificar lote de {len(batch)}: {e}")
+                labels = [None] * len(batch)
+            self.stats.batches += 1
+
+            # Publica na ordem do lote (preserva a ordem por dispositivo)
+            for item, label in zip(batch, labels):
+                if label is None:
+                    self.stats.invalid += 1
+                    self._forget(item)
+                else:
+                    self.stats.scored += 1
+                    payload = json.dumps({"ts": item.event.get('ts', 0), "resultado": label})
+                    try:
+                        await self.transport.publish(TOPIC_RESPONSE.format(dev=item.device_id), payload)
+                        self.stats.published += 1
+                        self.stats.latencies_ms.append((time.perf_counter() - item.arrived) * 1e3)
+                    except Exception as e:
+                        self.stats.publish_failed += 1
+                        self._forget(item)
+                        print(f"ERRO ao publicar ({item.device_id}): {e}")
+                self._inbox.task_done()
+
+    async def drain(self):
+        """Espera todos os eventos já aceitos serem classificados e publicados."""
+        await self._inbox.join()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# --- FROTA SIMULADA (broker local) ---
+
+async def simulate_fleet(broker, n_devices, events_per_device, n_samples=49, rate_hz=50.0, seed=0,
+                         binary=False, duplicate_rate=0.0):
+    """
+    Cada veículo publica `events_per_device` eventos a `rate_hz` (eventos/s da frota
+    inteira), em JSON ou no formato binário do firmware; uma fração duplicate_rate
+    é publicada duas vezes (reentrega QoS 1). Devolve
+    {dev: [ts recebidos em resposta_IA, em ordem]} para conferir a ordem.
+    """
+    responses = {}
+
+    async def on_response(topic, payload):
+        responses.setdefault(topic.split('/')[1], []).append(json.loads(payload)['ts'])
+
+    await broker.subscribe('veiculos/+/resposta_IA', on_response)
+    rng = np.random.default_rng(seed)
+    scales = rng.uniform(0.05, 6.0, size=n_devices)
+    interval = 1.0 / rate_hz if rate_hz > 0 else 0.0
+    for ts in range(events_per_device):
+        for d in range(n_devices):
+            dev = f'sim-{d:05d}'
+            values = (rng.normal(size=(n_samples, len(EVENT_KEYS))) * scales[d]).round(2)
+            if binary:
+                t = ts * 10_000 + np.arange(n_samples) * 50
+                payload = encode_binary(dev, ts, np.column_stack([t, values]))
+            else:
+                payload = json.dumps({'dev_id': dev, 'ts': ts,
+                                      **{k: values[:, i].tolist() for i, k in enumerate(EVENT_KEYS)}})
+            await broker.publish(f'veiculos/{dev}/eventos', payload)
+            if duplicate_rate and rng.random() < duplicate_rate:
+                await broker.publish(f'veiculos/{dev}/eventos', payload)
+            await asyncio.sleep(interval)
+    return responses
+
+
+def _make_dedup(args):
+    if args.dedup_ttl_s <= 0:
+        return None
+    backend = SQLiteBackend(args.dedup_db) if args.dedup_db else None
+    return DedupFilter(args.dedup_ttl_s, args.dedup_max_keys, backend=backend)
+
+
+async def _run_local(args, artifacts):
+    broker = LocalBroker()
+    service = AggregationService(artifacts, broker, args.max_latency_ms, args.max_batch,
+                                 args.queue_size, args.overflow, dedup=_make_dedup(args))
+    await service.start()
+    t0 = time.perf_counter()
+    responses = await simulate_fleet(broker, args.devices, args.events, rate_hz=args.rate_hz,
+                                     binary=args.binary, duplicate_rate=args.duplicate_rate)
+    await service.drain()
+    elapsed = time.perf_counter() - t0
+    await service.stop()
+
+    in_order = all(ts == sorted(ts) for ts in responses.values())
+    unique = all(len(ts) == len(set(ts)) for ts in responses.values())
+    print(f"Frota simulada: {args.devices} veículos x {args.events} eventos em {elapsed:.2f} s")
+    print(f"Ordem por dispositivo preservada: {in_order} | Uma resposta por evento: {unique}")
+    print(json.dumps(service.stats.snapshot(), indent=2))
+
+
+async def _run_mqtt(args, artifacts):
+    transport = PahoTransport(args.host, args.port, args.client_id, args.ca, args.cert, args.key)
+    await transport.connect()
+    service = AggregationService(artifacts, transport, args.max_latency_ms, args.max_batch,
+                                 args.queue_size, args.overflow, dedup=_make_dedup(args))
+    await service.start()
+    print(f"Assinando {TOPIC_EVENTS} em {args.host}:{args.port}")
+    try:
+        while True:
+            await asyncio.sleep(args.report_every)
+            print(json.dumps(service.stats.snapshot()))
+    finally:
+        await service.stop()
+        await transport.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serviço de classificação em lote para a frota.")
+    parser.add_argument('--broker', choices=['local', 'mqtt'], default='local')
+    parser.add_argument('--model_dir', default=os.environ.get('MODEL_PATH', '.'))
+    parser.add_argument('--backend', default=os.environ.get('MODEL_BACKEND') or None)
+    parser.add_argument('--max_latency_ms', type=float, default=20.0, help="Orçamento de espera do lote.")
+    parser.add_argument('--max_batch', type=int, default=512)
+    parser.add_argument('--queue_size', type=int, default=8192)
+    parser.add_argument('--overflow', choices=OVERFLOW_POLICIES, default='block')
+    parser.add_argument('--dedup_ttl_s', type=float, default=600.0, help="Janela de deduplicação (0 desativa).")
+    parser.add_argument('--dedup_max_keys', type=int, default=100_000)
+    parser.add_argument('--dedup_db', help="Arquivo SQLite para persistir as chaves vistas (opcional).")
+    # broker local
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--events', type=int, default=5, help="Eventos por veículo.")
+    parser.add_argument('--rate_hz', type=float, default=0.0, help="Eventos/s da frota (0 = sem pausa).")
+    parser.add_argument('--binary', action='store_true', help="Frota publica no formato binário (event_codec).")
+    parser.add_argument('--duplicate_rate', type=float, default=0.0, help="Fração de eventos reentregues.")
+    # broker MQTT
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int, default=8883)
+    parser.add_argument('--client_id', default='Aggregation_Service')
+    parser.add_argument('--ca')
+    parser.add_argument('--cert')
+    parser.add_argument('--key')
+    parser.add_argument('--report_every', type=float, default=10.0, help="Intervalo (s) do relatório.")
+    args = parser.parse_args()
+
+    artifacts = load_artifacts(args.model_dir, backend=args.backend)
+    print(f"Modelo carregado (formato: {artifacts.format}, backend: {artifacts.backend}).")
+    asyncio.run(_run_local(args, artifacts) if args.broker == 'local' else _run_mqtt(args, artifacts))
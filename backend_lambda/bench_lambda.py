@@ -0,0 +1,89 @@
+"""
+Benchmark do caminho quente da Lambda: caminho antigo (pandas DataFrame +
+SCALER.transform) contra o caminho NumPy puro usado em lambda_handler.
+
+Uso: python bench_lambda.py [--events 2000] [--samples 49]
+Verifica também que as features escaladas e as predições são idênticas.
+"""
+
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import lambda_function as lf
+from feature_engineering import FEATURE_COLUMNS, derive_channels, extract_features_batch
+from model_artifacts import ENCODER_JOBLIB, SCALER_JOBLIB
+from predictors import MODEL_JOBLIB
+
+# Caminho antigo: sempre os pickles do treinamento
+SCALER = joblib.load(SCALER_JOBLIB)
+MODEL = joblib.load(MODEL_JOBLIB)
+ENCODER = joblib.load(ENCODER_JOBLIB)
+
+
+def make_events(n_events, n_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'dev_id': f'bench{i % 10}', 'ts': i,
+             **{k: (rng.normal(size=n_samples) * 3).tolist() for k in lf.EVENT_KEYS}}
+            for i in range(n_events)]
+
+
+def pandas_path(event):
+    """Reprodução do handler anterior (DataFrame do evento + DataFrame de features)."""
+    df = pd.DataFrame({
+        'acc_x': event['ax'], 'acc_y': event['ay'], 'acc_z': event['az'],
+        'gyro_x': event['gx'], 'gyro_y': event['gy'], 'gyro_z': event['gz']
+    })
+    dt = 1.0 / lf.TAXA_ATUALIZACAO_HZ
+    df['acc_vm'] = np.sqrt(df['acc_x']**2 + df['acc_y']**2 + df['acc_z']**2)
+    df['gyro_vm'] = np.sqrt(df['gyro_x']**2 + df['gyro_y']**2 + df['gyro_z']**2)
+    for ax in ['x', 'y', 'z']:
+        df[f'jerk_{ax}'] = np.concatenate(([0.0], np.diff(df[f'acc_{ax}']) / dt))
+    df['jerk_vm'] = np.sqrt(df['jerk_x']**2 + df['jerk_y']**2 + df['jerk_z']**2)
+    cols_order = ['acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z',
+                  'acc_vm', 'gyro_vm', 'jerk_x', 'jerk_y', 'jerk_z', 'jerk_vm']
+    features = extract_features_batch(df[cols_order].values[None], dtype=np.float64)
+    X_scaled = SCALER.transform(pd.DataFrame(features, columns=FEATURE_COLUMNS))
+    return X_scaled, ENCODER.inverse_transform(MODEL.predict(X_scaled))[0]
+
+
+def numpy_path(event):
+    """Mesmo caminho de lambda_handler (sem a publicação MQTT)."""
+    window = derive_channels(lf._parse_window(event), fs=lf.TAXA_ATUALIZACAO_HZ)
+    features = extract_features_batch(window[None], fs=lf.TAXA_ATUALIZACAO_HZ, dtype=np.float64)
+    X_scaled = lf.ARTIFACTS.scale_features(features)
+    return X_scaled, str(lf.ARTIFACTS.classes[lf.ARTIFACTS.predict(X_scaled)[0]])
+
+
+def bench(fn, events):
+    t0 = time.perf_counter()
+    out = [fn(ev) for ev in events]
+    return out, (time.perf_counter() - t0) / len(events) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do caminho quente da Lambda.")
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=49)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.samples)
+    # Aquecimento (imports preguiçosos, caches do XGBoost)
+    pandas_path(events[0]); numpy_path(events[0])
+
+    old, t_old = bench(pandas_path, events)
+    new, t_new = bench(numpy_path, events)
+
+    identical_x = all(np.array_equal(a[0], b[0], equal_nan=True) for a, b in zip(old, new))
+    identical_y = all(a[1] == b[1] for a, b in zip(old, new))
+    print(f"Eventos: {args.events} x {args.samples} amostras (artefatos: {lf.ARTIFACTS.format}, backend: {lf.ARTIFACTS.backend})")
+    print(f"pandas : {t_old:.3f} ms/evento")
+    print(f"numpy  : {t_new:.3f} ms/evento ({t_old / t_new:.1f}x)")
+    print(f"Features escaladas idênticas: {identical_x} | Predições idênticas: {identical_y}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Decodificação dos eventos publicados em veiculos/{dev}/eventos.
+
+Usado pela Lambda, pelo serviço de agregação e pelo dashboard. O JSON é lido
+com orjson quando instalado (fallback para o json da stdlib; EVENT_JSON_BACKEND
+força um dos dois) e vai direto para um array (n, 7) float64, validando os
+tamanhos das colunas e o identificador do dispositivo ('dev_id' ou 'dev', como
+o firmware envia).
+
+Aceita os dois formatos enviados pelo firmware (Build_JSON / Build_Binary_Payload
+em firmware_stm32/src/app_main.c):
+
+- JSON (legado): {"dev", "ts", "thr", "t": [...], "ax": [...], ..., "gz": [...]}
+- Binário v1, little-endian, identificado pelo prefixo b'TB':
+
+    offset  tipo      campo
+    0       2s        magic b'TB'
+    2       uint8     versão (1)
+    3       uint8     flags (reservado, 0)
+    4       uint16    n amostras
+    6       uint8     tamanho do dev id
+    7       uint8     reservado
+    8       uint32    ts (instante do gatilho, ms)
+    12      uint32    t0 (timestamp da primeira amostra, ms)
+    16      float32   thr_x
+    20      float32   thr_y
+    24      uint16    LSB por unidade de acc (100 -> 0,01 m/s²)
+    26      uint16    LSB por unidade de gyro (100 -> 0,01 °/s)
+    28      bytes     dev id (ASCII), completado com zero até tamanho par
+    ...     uint16[n] dt entre amostras consecutivas (ms; dt[0] = 0)
+    ...     int16[n]  ax, ay, az, gx, gy, gz (uma coluna por vez)
+
+  Com 49 amostras são ~740 bytes, contra ~2,1 KB do JSON. As colunas são lidas
+  com um único np.frombuffer e convertidas para (n, 7) sem objetos Python por
+  elemento. Valor = inteiro / LSB, o que reproduz exatamente os números com
+  duas casas do JSON.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+SAMPLE_KEYS = ['t', 'ax', 'ay', 'az', 'gx', 'gy', 'gz']
+DEVICE_KEYS = ('dev_id', 'dev')
+
+
+def _select_json_backend(name=None):
+    """'orjson' se disponível (ou pedido), senão 'json'. Retorna (nome, loads)."""
+    name = name or os.environ.get('EVENT_JSON_BACKEND', 'auto')
+    if name in ('auto', 'orjson'):
+        try:
+            import orjson
+            return 'orjson', orjson.loads
+        except ImportError:
+            if name == 'orjson':
+                raise
+    if name not in ('auto', 'json'):
+        raise ValueError(f"EVENT_JSON_BACKEND inválido: {name} (opções: auto, orjson, json)")
+    return 'json', json.loads
+
+
+JSON_BACKEND, _loads = _select_json_backend()
+
+BINARY_MAGIC = b'TB'
+BINARY_VERSION = 1
+_HEADER = struct.Struct('<2sBBHBxIIffHH')
+DEFAULT_LSB = 100
+
+
+def is_binary(payload):
+    return isinstance(payload, (bytes, bytearray, memoryview)) and bytes(payload[:2]) == BINARY_MAGIC
+
+
+def decode_binary(payload):
+    """Payload binário -> (meta, amostras (n, 7) float64 na ordem SAMPLE_KEYS)."""
+    try:
+        magic, version, _, n, dev_len, ts, t0, thr_x, thr_y, acc_lsb, gyro_lsb = _HEADER.unpack_from(payload, 0)
+    except struct.error as e:
+        raise ValueError(f"Payload binário truncado: {e}")
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"Payload binário não suportado (magic={magic!r}, versão={version})")
+    offset = _HEADER.size + dev_len + (dev_len & 1)
+    if len(payload) < offset + 7 * 2 * n:
+        raise ValueError(f"Payload binário truncado: {len(payload)} bytes para {n} amostras")
+
+    cols = np.frombuffer(payload, dtype='<i2', count=7 * n, offset=offset).reshape(7, n)
+    samples = np.empty((n, 7), dtype=np.float64)
+    samples[:, 0] = t0 + np.cumsum(cols[0].view('<u2'), dtype=np.int64)
+    np.divide(cols[1:4].T, acc_lsb, out=samples[:, 1:4])
+    np.divide(cols[4:7].T, gyro_lsb, out=samples[:, 4:7])
+
+    dev = bytes(payload[_HEADER.size:_HEADER.size + dev_len]).decode('ascii', 'replace')
+    meta = {'dev': dev, 'dev_id': dev, 'ts': ts, 'thr': [float(thr_x), float(thr_y)], 'format': 'binary'}
+    return meta, samples
+
+
+def device_id(event, default=None):
+    """Identificador do dispositivo: 'dev_id' (IoT Rule / simulador) ou 'dev' (firmware)."""
+    for k in DEVICE_KEYS:
+        value = event.get(k)
+        if value:
+            return str(value)
+    return default
+
+
+def validate_event(event):
+    """
+    Confere as colunas do evento e devolve n. Coluna ausente -> KeyError
+    (mesma mensagem "Campo ausente" da Lambda); tamanhos diferentes -> ValueError.
+    't' é opcional.
+    """
+    n = None
+    for k in SAMPLE_KEYS:
+        col = event.get(k)
+        if col is None:
+            if k == 't':
+                continue
+            raise KeyError(k)
+        if n is None:
+            n = len(col)
+        elif len(col) != n:
+            raise ValueError(f"Tamanhos diferentes nas colunas do evento ({k}: {len(col)}, esperado {n}).")
+    return n
+
+
+def event_samples(event):
+    """Evento já validado (dict) -> amostras (n, 7) float64, 't' ausente vira NaN."""
+    if 't' in event:
+        return np.array([event[k] for k in SAMPLE_KEYS], dtype=np.float64).T
+    n = len(event['ax'])
+    cols = np.empty((7, n), dtype=np.float64)
+    cols[0] = np.nan
+    cols[1:] = [event[k] for k in SAMPLE_KEYS[1:]]
+    return cols.T
+
+
+def decode_json(payload, loads=None):
+    """Evento JSON (bytes ou str) -> (meta, amostras (n, 7))."""
+    event = (loads or _loads)(payload)
+    if not isinstance(event, dict):
+        raise ValueError("Evento JSON deve ser um objeto.")
+    validate_event(event)
+    samples = event_samples(event)
+    meta = {k: v for k, v in event.items() if k not in SAMPLE_KEYS}
+    meta['dev_id'] = device_id(event)
+    meta['format'] = 'json'
+    return meta, samples
+
+
+def decode_payload(payload):
+    """Qualquer um dos formatos -> (meta, amostras (n, 7))."""
+    if is_binary(payload):
+        return decode_binary(payload)
+    return decode_json(payload)
+
+
+def payload_to_event(payload, as_lists=False):
+    """
+    Payload bruto -> dict no formato do evento JSON (chaves de SAMPLE_KEYS), para
+    os consumidores que já trabalham com o evento, com 'dev_id' preenchido a partir
+    de 'dev' quando necessário. JSON mantém as listas; no binário as colunas são
+    views NumPy do array (n, 7) (listas com as_lists=True).
+    """
+    if not is_binary(payload):
+        event = _loads(payload)
+        if not isinstance(event, dict):
+            raise ValueError("Evento JSON deve ser um objeto.")
+        if 'dev_id' not in event and 'dev' in event:
+            event['dev_id'] = event['dev']
+        return event
+    meta, samples = decode_binary(payload)
+    event = dict(meta)
+    for i, k in enumerate(SAMPLE_KEYS):
+        event[k] = samples[:, i].tolist() if as_lists else samples[:, i]
+    return event
+
+
+def encode_binary(dev, ts, samples, thr=(0.0, 0.0), acc_lsb=DEFAULT_LSB, gyro_lsb=DEFAULT_LSB):
+    """
+    Mesmo layout do firmware (Build_Binary_Payload), para simulador, testes e
+    benchmarks. samples: (n, 7) na ordem SAMPLE_KEYS.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    n = len(samples)
+    dev_bytes = dev.encode('ascii')
+    t = samples[:, 0].astype(np.int64)
+    dt = np.clip(np.diff(t, prepend=t[:1]), 0, 0xFFFF).astype('<u2')
+    cols = np.empty((7, n), dtype='<i2')
+    cols[0] = dt.view('<i2')
+    cols[1:4] = np.clip(np.round(samples[:, 1:4].T * acc_lsb), -32768, 32767)
+    cols[4:7] = np.clip(np.round(samples[:, 4:7].T * gyro_lsb), -32768, 32767)
+    header = _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, n, len(dev_bytes), ts & 0xFFFFFFFF,
+                          int(t[0]) & 0xFFFFFFFF if n else 0, thr[0], thr[1], acc_lsb, gyro_lsb)
+    return header + dev_bytes + b'\0' * (len(dev_bytes) & 1) + cols.tobytes()
+
+
+if __name__ == "__main__":
+    import argparse
+    import timeit
+
+    parser = argparse.ArgumentParser(description="Compara tamanho e decodificação (json/orjson/binário).")
+    parser.add_argument('--samples', type=int, default=49, help="Amostras por evento (padrão: 24 + 25).")
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    t = 1_000_000 + np.arange(args.samples) * 50
+    values = np.round(rng.normal(size=(args.samples, 6)) * 4, 2)
+    samples = np.column_stack([t, values])
+    # Mesmo texto gerado por Build_JSON (duas casas decimais)
+    as_json = json.dumps({'dev': 'Monitoramento_Veicular', 'ts': int(t[24]), 'thr': [3.0, 3.0],
+                          **{k: (samples[:, i].astype(int).tolist() if k == 't' else samples[:, i].tolist())
+                             for i, k in enumerate(SAMPLE_KEYS)}}, separators=(',', ':')).encode()
+    as_bin = encode_binary('Monitoramento_Veicular', int(t[24]), samples, thr=(3.0, 3.0))
+
+    def legacy():
+        ev = json.loads(as_json)
+        return np.column_stack([np.asarray(ev[k], dtype=np.float64) for k in SAMPLE_KEYS])
+
+    assert np.array_equal(decode_payload(as_bin)[1], legacy())
+    assert np.array_equal(decode_payload(as_json)[1], legacy())
+    print(f"Tamanho: JSON {len(as_json)} B | binário {len(as_bin)} B ({len(as_json) / len(as_bin):.1f}x menor)")
+    cases = [('json.loads + column_stack (atual)', legacy),
+             ('decode_json (json)', lambda: decode_json(as_json, loads=json.loads))]
+    if JSON_BACKEND == 'orjson':
+        cases.append(('decode_json (orjson)', lambda: decode_json(as_json)))
+    cases.append(('decode_payload (binário)', lambda: decode_payload(as_bin)))
+    for name, fn in cases:
+        us = timeit.timeit(fn, number=args.repeat) / args.repeat * 1e6
+        print(f"  {name:<34} {us:8.2f} us/evento")
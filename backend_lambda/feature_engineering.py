@@ -0,0 +1,143 @@
+"""
+Extração vetorizada das 168 features usadas pelo modelo XGBoost.
+
+Módulo compartilhado entre a Lambda (lambda_function.py), o simulador do
+Assetto Corsa (simulation_ac/simulador_ai_tcc.py) e o script de treinamento
+(machine_learning/Modelo_FINAL_IA.py). Todas as estatísticas são calculadas
+ao longo do eixo temporal de um array (n_janelas, tamanho_janela, 12), com uma
+única rfft para todas as janelas e canais.
+"""
+
+import numpy as np
+
+TAXA_ATUALIZACAO_HZ = 20.0
+
+RAW_CHANNELS = ['acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z']
+CHANNELS = RAW_CHANNELS + ['acc_vm', 'gyro_vm', 'jerk_x', 'jerk_y', 'jerk_z', 'jerk_vm']
+STATS = ['mean', 'std', 'var', 'min', 'max', 'median', 'rms', 'energy', 'iqr',
+         'skew', 'kurtosis', 'zcross_rate', 'dom_freq', 'dom_mag']
+
+# Mesma ordem de feature_columns_final.json (canal a canal, 14 estatísticas cada)
+FEATURE_COLUMNS = [f'{ch}_{st}' for ch in CHANNELS for st in STATS]
+N_FEATURES = len(FEATURE_COLUMNS)
+
+# Limita a memória temporária quando o treinamento passa centenas de milhares de janelas
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def derive_channels(raw, fs=TAXA_ATUALIZACAO_HZ):
+    """
+    Recebe (..., n, 6) com acc_xyz/gyro_xyz e devolve (..., n, 12) na ordem CHANNELS
+    (acc_vm, gyro_vm, jerk_xyz e jerk_vm calculados ao longo do eixo temporal).
+    """
+    raw = np.asarray(raw, dtype=np.float64)
+    out = np.empty(raw.shape[:-1] + (len(CHANNELS),), dtype=np.float64)
+    out[..., :6] = raw
+    acc, gyro = raw[..., 0:3], raw[..., 3:6]
+    out[..., 6] = np.sqrt(np.sum(acc**2, axis=-1))
+    out[..., 7] = np.sqrt(np.sum(gyro**2, axis=-1))
+    jerk = out[..., 8:11]
+    jerk[..., 0, :] = 0.0
+    jerk[..., 1:, :] = np.diff(acc, axis=-2) / (1.0 / fs)
+    out[..., 11] = np.sqrt(np.sum(jerk**2, axis=-1))
+    return out
+
+
+def sliding_window_batch(arr, win_size, step):
+    """
+    Janelas deslizantes sem cópia sobre um array contíguo (n, canais).
+    Retorna uma view (n_janelas, win_size, canais) que pode ir direto para
+    extract_features_batch.
+    """
+    arr = np.asarray(arr)
+    if len(arr) < win_size:
+        return np.empty((0, win_size) + arr.shape[1:], dtype=arr.dtype)
+    view = np.lib.stride_tricks.sliding_window_view(arr, win_size, axis=0)[::step]
+    return np.moveaxis(view, -1, 1)
+
+
+def _moments(centered, m2, mean):
+    """skew/kurtosis com a mesma convenção de scipy.stats (bias=True, Fisher)."""
+    # Mesma sequência de multiplicações de scipy.stats._moment
+    sq = centered**2
+    m3 = np.mean(sq * centered, axis=-1)
+    m4 = np.mean(sq**2, axis=-1)
+    # scipy devolve NaN quando a variância é numericamente nula
+    zero = m2 <= (np.finfo(np.float64).eps * mean)**2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = np.where(zero, np.nan, m3 / m2**1.5)
+        kurt = np.where(zero, np.nan, m4 / m2**2 - 3.0)
+    return skew, kurt
+
+
+def _extract_chunk(w, fs, out):
+    """
+    Preenche out (n, 12, 14) a partir de w (n, 12, tamanho_janela) contíguo.
+    As reduções correm no último eixo, como o scipy/pandas fazem em cada série
+    1-D: a soma sai igual bit a bit e janelas constantes continuam com
+    variância exatamente zero (skew/kurtosis NaN).
+    """
+    n = w.shape[-1]
+    mean = np.mean(w, axis=-1)
+    centered = w - mean[..., None]
+    var = np.mean(centered**2, axis=-1)
+    energy = np.sum(w**2, axis=-1)
+    q75, q50, q25 = np.percentile(w, [75, 50, 25], axis=-1)
+    skew, kurt = _moments(centered, var, mean)
+
+    out[:, :, 0] = mean
+    out[:, :, 1] = np.sqrt(var)
+    out[:, :, 2] = var
+    out[:, :, 3] = np.min(w, axis=-1)
+    out[:, :, 4] = np.max(w, axis=-1)
+    out[:, :, 5] = q50
+    out[:, :, 6] = np.sqrt(energy / n)
+    out[:, :, 7] = energy
+    out[:, :, 8] = q75 - q25
+    out[:, :, 9] = skew
+    out[:, :, 10] = kurt
+    if n > 1:
+        out[:, :, 11] = np.count_nonzero(w[..., :-1] * w[..., 1:] < 0, axis=-1) / (n - 1)
+    else:
+        out[:, :, 11] = 0.0
+
+    # Domínio da Frequência (FFT): uma única rfft para todas as janelas e canais
+    mags = np.abs(np.fft.rfft(w, axis=-1))
+    if mags.shape[-1] > 1:
+        idx = np.argmax(mags[..., 1:], axis=-1) + 1
+        freqs = np.fft.rfftfreq(n, d=1.0 / fs)
+        out[:, :, 12] = freqs[idx]
+        out[:, :, 13] = np.take_along_axis(mags, idx[..., None], axis=-1)[..., 0]
+    else:
+        out[:, :, 12] = 0.0
+        out[:, :, 13] = 0.0
+
+
+def extract_features_batch(windows, fs=TAXA_ATUALIZACAO_HZ, dtype=np.float32,
+                           chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Extrai as 168 features de um lote de janelas.
+
+    windows: array (n_janelas, tamanho_janela, 12) na ordem CHANNELS. Pode ser uma
+    view com strides (ex.: sliding_window_view); cada bloco é transposto para
+    (n, 12, tamanho_janela) em float64 contíguo apenas durante o cálculo.
+    Retorna uma matriz contígua (n_janelas, 168) na ordem FEATURE_COLUMNS.
+    """
+    windows = np.asarray(windows)
+    if windows.ndim != 3 or windows.shape[2] != len(CHANNELS):
+        raise ValueError(f"Esperado array (n_janelas, tamanho_janela, {len(CHANNELS)}), "
+                         f"recebido {windows.shape}")
+    n_windows = windows.shape[0]
+    out = np.empty((n_windows, len(CHANNELS), len(STATS)), dtype=dtype)
+    if n_windows == 0:
+        return out.reshape(0, N_FEATURES)
+
+    buf = np.empty((min(chunk_size, n_windows), len(CHANNELS), len(STATS)), dtype=np.float64)
+    for start in range(0, n_windows, chunk_size):
+        stop = min(start + chunk_size, n_windows)
+        w = np.ascontiguousarray(windows[start:stop].transpose(0, 2, 1), dtype=np.float64)
+        chunk_out = buf[:stop - start]
+        _extract_chunk(w, fs, chunk_out)
+        out[start:stop] = chunk_out
+    return out.reshape(n_windows, N_FEATURES)
+
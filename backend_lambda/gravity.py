@@ -0,0 +1,114 @@
+"""
+Remoção da componente da gravidade em acc_xyz (passa-baixas Butterworth de 2ª
+ordem em GRAVITY_CUTOFF_HZ; o sinal menos a parte de baixa frequência).
+
+Módulo compartilhado entre o treinamento (machine_learning/Modelo_FINAL_IA.py)
+e o simulador (simulation_ac/simulador_ai_tcc.py). Os coeficientes são
+projetados uma vez por (fs, cutoff) e reaproveitados em todas as sessões,
+janelas e eventos.
+
+- remove_gravity: filtfilt (fase zero) sobre os três eixos de uma vez, ao
+  longo do eixo temporal de um array; aceita um lote de janelas (k, n, 3).
+  É o filtro com que o modelo foi treinado.
+- GravityStream: modo causal para uso online (sosfilt), com o estado zi
+  guardado por dispositivo, de modo que cada bloco continua o anterior;
+  process_many filtra vários dispositivos em uma chamada.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from scipy import signal
+
+GRAVITY_CUTOFF_HZ = 0.5
+FILTER_ORDER = 2
+
+
+class GravityFilter:
+    """Coeficientes de um (fs, cutoff): b/a para filtfilt, sos/zi para o modo causal."""
+
+    def __init__(self, fs, cutoff_hz):
+        wn = cutoff_hz / (0.5 * fs)
+        self.fs = fs
+        self.cutoff_hz = cutoff_hz
+        self.b, self.a = signal.butter(FILTER_ORDER, wn, btype='low', analog=False)
+        self.sos = signal.butter(FILTER_ORDER, wn, btype='low', analog=False, output='sos')
+        self.sos_zi = signal.sosfilt_zi(self.sos)        # (seções, 2), resposta a degrau unitário
+        # filtfilt exige mais amostras que o padding (3 * max(len(a), len(b)))
+        self.padlen = 3 * max(len(self.a), len(self.b))
+
+
+@lru_cache(maxsize=None)
+def gravity_filter(fs, cutoff_hz=GRAVITY_CUTOFF_HZ):
+    return GravityFilter(float(fs), float(cutoff_hz))
+
+
+def remove_gravity(acc, fs, cutoff_hz=GRAVITY_CUTOFF_HZ, axis=0):
+    """
+    acc menos a gravidade estimada por filtfilt, em uma única chamada para
+    todos os eixos/janelas. `axis` é o eixo temporal. Sinais curtos demais
+    para o filtro têm só a média subtraída. Devolve um array novo; a entrada
+    não é alterada.
+    """
+    acc = np.asarray(acc, dtype=np.float64)
+    filt = gravity_filter(fs, cutoff_hz)
+    if acc.shape[axis] > filt.padlen:
+        return acc - signal.filtfilt(filt.b, filt.a, acc, axis=axis)
+    return acc - acc.mean(axis=axis, keepdims=True)
+
+
+class GravityStream:
+    """
+    process(device_id, acc) -> acc (n, n_axes) sem a gravidade, filtrado de
+    forma causal e contínuo entre chamadas do mesmo dispositivo. O primeiro
+    bloco de cada dispositivo parte do regime permanente na primeira amostra
+    (sem transitório de partida). Guarda no máximo max_devices estados (LRU).
+    """
+
+    def __init__(self, fs, cutoff_hz=GRAVITY_CUTOFF_HZ, n_axes=3, max_devices=1000):
+        self.filter = gravity_filter(fs, cutoff_hz)
+        self.n_axes = n_axes
+        self.max_devices = max_devices
+        self._zi = OrderedDict()        # device_id -> zi (seções, 2, n_axes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._zi)
+
+    def process(self, device_id, acc):
+        acc = np.asarray(acc, dtype=np.float64).reshape(-1, self.n_axes)
+        return self.process_many([device_id], acc[None])[0]
+
+    def process_many(self, device_ids, acc):
+        """
+        Um bloco do mesmo tamanho por dispositivo, acc (d, n, n_axes), filtrado em
+        uma única chamada do sosfilt (os estados zi são empilhados nos eixos):
+        com muitos dispositivos mandando uma amostra por vez, o custo fixo da
+        chamada deixa de ser pago por dispositivo.
+        """
+        acc = np.asarray(acc, dtype=np.float64).reshape(len(device_ids), -1, self.n_axes)
+        d, n, _ = acc.shape
+        if not n or not d:
+            return acc.copy()
+        with self._lock:
+            zi = [self._zi.pop(device_id, None) for device_id in device_ids]
+        zi = np.concatenate([self.filter.sos_zi[:, :, None] * acc[i, 0] if z is None else z
+                             for i, z in enumerate(zi)], axis=-1)
+        x = acc.transpose(1, 0, 2).reshape(n, d * self.n_axes)
+        g, zi = signal.sosfilt(self.filter.sos, x, axis=0, zi=zi)
+        with self._lock:
+            for i, device_id in enumerate(device_ids):
+                self._zi[device_id] = zi[:, :, i * self.n_axes:(i + 1) * self.n_axes].copy()
+            while len(self._zi) > self.max_devices:
+                self._zi.popitem(last=False)
+        return acc - g.reshape(n, d, self.n_axes).transpose(1, 0, 2)
+
+    def reset(self, device_id=None):
+        """Esquece o estado de um dispositivo (ou de todos)."""
+        with self._lock:
+            if device_id is None:
+                self._zi.clear()
+            else:
+                self._zi.pop(device_id, None)
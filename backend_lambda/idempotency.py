@@ -0,0 +1,203 @@
+"""
+Deduplicação de eventos reentregues (o firmware publica com QoS 1).
+
+A chave de idempotência é (dispositivo, ts, hash das amostras): o hash usa as
+seis colunas de movimento (ax..gz) em float64, então o mesmo evento gera a
+mesma chave em JSON ou binário (event_codec reproduz os mesmos valores) e na
+Lambda, no serviço de agregação e no dashboard.
+
+DedupFilter guarda as chaves vistas em um LRU com janela de tempo (ttl_s) e
+tamanho máximo; opcionalmente consulta um backend persistente, compartilhado
+entre processos/containers:
+
+- SQLiteBackend  : arquivo local (dashboard, serviço de agregação)
+- DynamoDBBackend: tabela com put condicional (Lambda; boto3 só é importado
+                   quando o backend é usado)
+
+Um conjunto exato em memória foi preferido a um filtro de Bloom: com ~100 mil
+chaves ocupa poucos MB e não tem falsos positivos (um falso positivo aqui
+descartaria um evento real).
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MOTION_KEYS = ['ax', 'ay', 'az', 'gx', 'gy', 'gz']
+
+
+def samples_hash(data):
+    """
+    Hash (16 hex) das amostras de movimento. data: evento (dict com as colunas
+    MOTION_KEYS), matriz (n, 6) ax..gz ou (n, 7) t/ax..gz (ordem de SAMPLE_KEYS).
+    """
+    if isinstance(data, dict):
+        motion = np.array([data[k] for k in MOTION_KEYS], dtype=np.float64).T
+    else:
+        motion = np.asarray(data, dtype=np.float64)
+        if motion.ndim != 2 or motion.shape[1] not in (6, 7):
+            raise ValueError(f"Amostras devem ter formato (n, 6) ou (n, 7), recebido {motion.shape}.")
+        if motion.shape[1] == 7:
+            motion = motion[:, 1:]
+    return hashlib.blake2b(np.ascontiguousarray(motion).tobytes(), digest_size=8).hexdigest()
+
+
+def event_key(device_id, ts, data):
+    """Chave de idempotência 'dispositivo|ts|hash'."""
+    return f"{device_id}|{int(ts)}|{samples_hash(data)}"
+
+
+class DedupStats:
+    """Chaves verificadas e duplicadas (acumulado)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+        self.backend_hits = 0      # duplicadas que só o backend persistente conhecia
+
+    def record(self, duplicate, from_backend=False):
+        with self._lock:
+            self.checked += 1
+            if duplicate:
+                self.duplicates += 1
+                if from_backend:
+                    self.backend_hits += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'duplicates': self.duplicates,
+                'backend_hits': self.backend_hits,
+                'duplicate_rate': round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+            }
+
+
+class DedupFilter:
+    """
+    check(key) -> True se a chave já foi vista nos últimos ttl_s (duplicada);
+    senão registra e devolve False. Se o backend falhar, a chave é tratada
+    como nova. forget(key) desfaz o registro (use quando o
+    processamento falhar, para a reentrega poder tentar de novo).
+    """
+
+    def __init__(self, ttl_s=600.0, max_entries=100_000, backend=None, clock=time.monotonic):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.backend = backend
+        self.clock = clock
+        self.stats = DedupStats()
+        self._seen = OrderedDict()       # chave -> instante do registro (mais antigo primeiro)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def _expire(self, now):
+        limit = now - self.ttl_s
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if seen_at > limit and len(self._seen) < self.max_entries:
+                break
+            self._seen.popitem(last=False)
+
+    def check(self, key):
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            if key in self._seen:
+                self.stats.record(True)
+                return True
+            self._seen[key] = now
+        if self.backend is not None:
+            try:
+                new = self.backend.add(key, self.ttl_s)
+            except Exception as e:
+                # Backend fora do ar: processa (uma duplicada a mais é melhor que um evento perdido)
+                print(f"AVISO: backend de deduplicação indisponível: {e}")
+                new = True
+            if not new:
+                self.stats.record(True, from_backend=True)
+                return True
+        self.stats.record(False)
+        return False
+
+    def forget(self, key):
+        with self._lock:
+            self._seen.pop(key, None)
+        if self.backend is not None:
+            self.backend.discard(key)
+
+
+# --- BACKENDS PERSISTENTES ---
+# add(key, ttl_s) -> True se a chave é nova (ou expirou) e foi gravada; False se já existe.
+
+class SQLiteBackend:
+    def __init__(self, path, purge_every=1000):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS dedup (key TEXT PRIMARY KEY, expires REAL NOT NULL)")
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def add(self, key, ttl_s):
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO dedup (key, expires) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET expires = excluded.expires WHERE dedup.expires < ?",
+                (key, now + ttl_s, now))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self.conn.execute("DELETE FROM dedup WHERE expires < ?", (now,))
+            return cur.rowcount > 0
+
+    def discard(self, key):
+        with self._lock:
+            self.conn.execute("DELETE FROM dedup WHERE key = ?", (key,))
+
+
+class DynamoDBBackend:
+    """
+    Tabela com chave de partição 'pk' (string); 'expires' (epoch s) pode ser
+    configurado como atributo de TTL da tabela. client_factory devolve o
+    cliente boto3 'dynamodb' (o mesmo padrão do get_iot_client da Lambda).
+    """
+
+    def __init__(self, table, client_factory=None, region=None):
+        self.table = table
+        self.region = region
+        self._client_factory = client_factory
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            if self._client_factory is not None:
+                self._client = self._client_factory()
+            else:
+                import boto3
+                self._client = boto3.client('dynamodb', region_name=self.region)
+        return self._client
+
+    def add(self, key, ttl_s):
+        now = int(time.time())
+        try:
+            self._get_client().put_item(
+                TableName=self.table,
+                Item={'pk': {'S': key}, 'expires': {'N': str(now + int(ttl_s))}},
+                ConditionExpression='attribute_not_exists(pk) OR expires < :now',
+                ExpressionAttributeValues={':now': {'N': str(now)}})
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    def discard(self, key):
+        self._get_client().delete_item(TableName=self.table, Key={'pk': {'S': key}})
@@ -1,148 +1,350 @@
 import json
-import joblib
-import pandas as pd
+import base64
 import numpy as np
-from scipy import stats
 import os
-import boto3 
+import time
 import traceback
 
+from event_codec import device_id as event_device_id, payload_to_event
+from feature_engineering import derive_channels, extract_features_batch
+from idempotency import DedupFilter, DynamoDBBackend, event_key
+from model_artifacts import load_artifacts
+from mqtt_publisher import ResponsePublisher
+from prediction_cache import PredictionCache, model_version
+from scoring import classify_windows, is_stationary
+from scoring import parse_window as _parse_window
+
 # --- CONFIGURAÇÕES ---
 TAXA_ATUALIZACAO_HZ = 20.0
 
 # --- CARREGAMENTO DOS MODELOS ---
 MODEL_PATH = os.environ.get('MODEL_PATH', '.') 
+# 'native' (xgboost_final.ubj + model_meta.json), 'joblib' ou 'auto'
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'auto')
+# 'xgboost', 'onnx', 'compiled' ou 'sklearn' (ver predictors.py); vazio = padrão do formato
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND') or None
+IOT_REGION = os.environ.get('IOT_REGION', 'us-east-2')
+
+# Publicação das respostas: 'sync', 'async' ou 'batch' (ver mqtt_publisher.py)
+PUBLISH_MODE = os.environ.get('PUBLISH_MODE', 'sync')
+BATCH_PUBLISH_MODE = os.environ.get('BATCH_PUBLISH_MODE', 'batch')
+PUBLISH_WORKERS = int(os.environ.get('PUBLISH_WORKERS', '4'))
+PUBLISH_QUEUE_SIZE = int(os.environ.get('PUBLISH_QUEUE_SIZE', '256'))
+
+# Deduplicação das reentregas QoS 1 (ver idempotency.py): janela em segundos
+# (0 desativa), chaves em memória por container e tabela DynamoDB opcional
+# compartilhada entre containers
+DEDUP_TTL_S = float(os.environ.get('DEDUP_TTL_S', '600'))
+DEDUP_MAX_KEYS = int(os.environ.get('DEDUP_MAX_KEYS', '100000'))
+DEDUP_TABLE = os.environ.get('DEDUP_TABLE') or None
+DEDUP = DedupFilter(DEDUP_TTL_S, DEDUP_MAX_KEYS,
+                    backend=DynamoDBBackend(DEDUP_TABLE, region=IOT_REGION) if DEDUP_TABLE else None) \
+    if DEDUP_TTL_S > 0 else None
+
+# Cache de predições por janela (ver prediction_cache.py); 0 entradas desativa
+PRED_CACHE_SIZE = int(os.environ.get('PRED_CACHE_SIZE', '4096'))
+PRED_CACHE_TTL_S = float(os.environ.get('PRED_CACHE_TTL_S', '3600'))
+PRED_CACHE_QUANTUM = float(os.environ.get('PRED_CACHE_QUANTUM', '0.01'))
 
-# Cliente MQTT (IoT Core)
+# Cliente MQTT (IoT Core), criado no primeiro publish para tirar boto3 do cold start
+# e reutilizado entre invocações (pool de conexões HTTPS com keep-alive)
 # A região deve ser a mesma onde você criou a Lambda (ex: us-east-2)
-iot_client = boto3.client('iot-data', region_name='us-east-2') 
+iot_client = None
+
+def get_iot_client():
+    global iot_client
+    if iot_client is None:
+        import boto3
+        from botocore.config import Config
+        config = Config(
+            max_pool_connections=max(10, PUBLISH_WORKERS * 2),
+            tcp_keepalive=True,
+            connect_timeout=2,
+            read_timeout=3,
+            retries={'max_attempts': 2, 'mode': 'standard'},
+        )
+        iot_client = boto3.client('iot-data', region_name=IOT_REGION, config=config)
+    return iot_client
+
+PUBLISHER = ResponsePublisher(get_iot_client, mode=PUBLISH_MODE,
+                              queue_size=PUBLISH_QUEUE_SIZE, workers=PUBLISH_WORKERS)
+BATCH_PUBLISHER = ResponsePublisher(get_iot_client, mode=BATCH_PUBLISH_MODE,
+                                    queue_size=PUBLISH_QUEUE_SIZE, workers=PUBLISH_WORKERS)
 
 try:
     print("Carregando modelos...")
-    SCALER = joblib.load(os.path.join(MODEL_PATH, 'scaler_final.joblib'))
-    MODEL = joblib.load(os.path.join(MODEL_PATH, 'xgboost_final.joblib'))
-    ENCODER = joblib.load(os.path.join(MODEL_PATH, 'label_encoder_final.joblib'))
-    print("Modelos carregados com sucesso.")
+    ARTIFACTS = load_artifacts(MODEL_PATH, MODEL_FORMAT, MODEL_BACKEND)
+    print(f"Modelos carregados com sucesso (formato: {ARTIFACTS.format}, backend: {ARTIFACTS.backend}).")
 except Exception as e:
     print(f"ERRO FATAL ao carregar modelos: {e}")
-    SCALER, MODEL, ENCODER = None, None, None
+    ARTIFACTS = None
+
+PRED_CACHE = PredictionCache(model_version(ARTIFACTS, MODEL_PATH), PRED_CACHE_SIZE, PRED_CACHE_TTL_S,
+                             PRED_CACHE_QUANTUM) if ARTIFACTS and PRED_CACHE_SIZE > 0 else None
 
 # --- FUNÇÕES DE PROCESSAMENTO ---
 
-def extract_features_window(arr, fs=TAXA_ATUALIZACAO_HZ):
+def _expand_event(event):
     """
-    Extrai as 168 features estatísticas da janela de dados.
+    Eventos binários (event_codec.py) chegam pela IoT Rule como
+    {'payload_b64': ..., 'dev_id': topic(2)}; viram o mesmo dict do evento JSON.
     """
-    feats = {}
-    axes = ['acc_x','acc_y','acc_z', 'gyro_x', 'gyro_y', 'gyro_z',
-            'acc_vm', 'gyro_vm', 'jerk_x', 'jerk_y', 'jerk_z', 'jerk_vm']
-    
-    for i, ax in enumerate(axes):
-        v = arr[:, i]
-        # Domínio do Tempo
-        feats[f'{ax}_mean'] = np.mean(v); feats[f'{ax}_std'] = np.std(v)
-        feats[f'{ax}_var'] = np.var(v); feats[f'{ax}_min'] = np.min(v)
-        feats[f'{ax}_max'] = np.max(v); feats[f'{ax}_median'] = np.median(v)
-        feats[f'{ax}_rms'] = np.sqrt(np.mean(v**2)); feats[f'{ax}_energy'] = np.sum(v**2)
-        feats[f'{ax}_iqr'] = np.subtract(*np.percentile(v, [75, 25]))
-        feats[f'{ax}_skew'] = stats.skew(v); feats[f'{ax}_kurtosis'] = stats.kurtosis(v)
-        
-        # Zero Crossing
-        if len(v) > 1: zc = ((v[:-1] * v[1:]) < 0).sum() / (len(v)-1)
-        else: zc = 0.0
-        feats[f'{ax}_zcross_rate'] = zc
-        
-        # Domínio da Frequência (FFT)
-        try:
-            fft = np.fft.rfft(v); mags = np.abs(fft); freqs = np.fft.rfftfreq(len(v), d=1.0/fs)
-            if len(mags) > 1:
-                idx = np.argmax(mags[1:]) + 1
-                feats[f'{ax}_dom_freq'] = freqs[idx]; feats[f'{ax}_dom_mag'] = mags[idx]
-            else: feats[f'{ax}_dom_freq'] = 0.0; feats[f'{ax}_dom_mag'] = 0.0
-        except: feats[f'{ax}_dom_freq'] = 0.0; feats[f'{ax}_dom_mag'] = 0.0
-    return feats
+    if 'payload_b64' not in event:
+        return event
+    decoded = payload_to_event(base64.b64decode(event['payload_b64']))
+    decoded['dev_id'] = event.get('dev_id') or event_device_id(decoded, 'unknown')
+    return decoded
 
 def lambda_handler(event, context):
     """
     Função principal executada pela AWS.
     """
-    if not MODEL: return {'statusCode': 500, 'body': 'Modelos não carregados.'}
+    if not ARTIFACTS: return {'statusCode': 500, 'body': 'Modelos não carregados.'}
     
     prediction_label = "unknown"
-    device_id = event.get('dev_id', 'unknown')
+    try:
+        event = _expand_event(event)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': str(e)}
+    device_id = event_device_id(event, 'unknown')
+    dedup_key = None
+    t_start = time.perf_counter()
     
     try:
-        # 1. Parseamento do JSON
+        # 1. Parseamento do JSON direto para NumPy (n, 6)
         # O firmware já envia 'ax', 'ay', etc limpos de gravidade
-        input_data = {
-            'acc_x': event['ax'], 'acc_y': event['ay'], 'acc_z': event['az'],
-            'gyro_x': event['gx'], 'gyro_y': event['gy'], 'gyro_z': event['gz']
-        }
-        df = pd.DataFrame(input_data)
+        try:
+            raw = _parse_window(event)
+        except ValueError as e:
+            return {'statusCode': 400, 'body': str(e)}
+
+        # Reentrega (QoS 1) de um evento já classificado: não refaz inferência nem publish
+        if DEDUP is not None:
+            dedup_key = event_key(device_id, event.get('ts', 0), raw)
+            if DEDUP.check(dedup_key):
+                print(f"Evento duplicado ignorado ({device_id}, ts={event.get('ts', 0)})")
+                return {'statusCode': 200, 'device_id': device_id, 'duplicate': True,
+                        'dedup': DEDUP.stats.snapshot()}
+
+        # Janela já classificada neste container (heartbeat parado, reenvio): usa o cache
+        cache_key = PRED_CACHE.key(raw) if PRED_CACHE is not None else None
+        cached = PRED_CACHE.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            prediction_label = cached
+        else:
+            # 2. Engenharia de Features (Vetores e Jerk) -> (n, 12) na ordem CHANNELS
+            # Magnitude (Agora sem gravidade, valores próximos de 0 se parado)
+            window = derive_channels(raw, fs=TAXA_ATUALIZACAO_HZ)
         
-        if len(df) < 10: return {'statusCode': 400, 'body': 'Dados insuficientes.'}
+            # --- Zero Motion Gate ---
+            # Se a variação (std) for muito baixa, assume parado
+            if is_stationary(window):
+                print(f"Zero Motion Gate ({device_id}): Veículo parado -> SLOW")
+                prediction_label = 'slow'
+            # ------------------------
+            else:
+                # 3. Extrair Features (lote de 1 janela)
+                features = extract_features_batch(window[None], fs=TAXA_ATUALIZACAO_HZ, dtype=np.float64)
+            
+                # 4. Predição
+                X_scaled = ARTIFACTS.scale_features(features)
+                prediction_idx = ARTIFACTS.predict(X_scaled)[0]
+                prediction_label = str(ARTIFACTS.classes[prediction_idx])
 
-        # 2. Engenharia de Features (Calcular Vetores e Jerk)
-        dt = 1.0 / TAXA_ATUALIZACAO_HZ
+        t_inference = time.perf_counter()
+
+        # 5. RETORNO VIA MQTT (erros de publish são contados em PUBLISHER.stats)
+        # Publica assim que a predição sai: no modo 'async' o envio corre enquanto
+        # o cache e o log abaixo são atualizados; flush() só antes do return
+        response_payload = json.dumps({
+            "ts": event.get('ts', 0),
+            "resultado": prediction_label 
+        })
         
-        # Magnitude (Agora sem gravidade, valores próximos de 0 se parado)
-        df['acc_vm'] = np.sqrt(df['acc_x']**2 + df['acc_y']**2 + df['acc_z']**2)
+        TOPIC_RESPONSE = f"veiculos/{device_id}/resposta_IA"
         
-        # --- Zero Motion Gate ---
-        # Se a variação (std) for muito baixa, assume parado
-        if df['acc_vm'].std() < 0.2:
-            print(f"Zero Motion Gate ({device_id}): Veículo parado -> SLOW")
-            prediction_label = 'slow'
-        # ------------------------
-        else:
-            # Calcula Gyro VM e Jerks
-            df['gyro_vm'] = np.sqrt(df['gyro_x']**2 + df['gyro_y']**2 + df['gyro_z']**2)
-            for ax in ['x', 'y', 'z']:
-                acc_col, jerk_col = f'acc_{ax}', f'jerk_{ax}'
-                df[jerk_col] = np.concatenate(([0.0], np.diff(df[acc_col]) / dt))
-            df['jerk_vm'] = np.sqrt(df['jerk_x']**2 + df['jerk_y']**2 + df['jerk_z']**2)
+        PUBLISHER.stats.reset()
+        PUBLISHER.publish(TOPIC_RESPONSE, response_payload)
 
+        if cache_key is not None and cached is None:
+            PRED_CACHE.put(cache_key, prediction_label)
+        print(f"Predição para {device_id}: {prediction_label.upper()}")
 
-            # 3. Extrair Features
-            cols_order = ['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z',
-                          'acc_vm','gyro_vm','jerk_x','jerk_y','jerk_z','jerk_vm']
-            
-            # Converte para matriz numpy e extrai
-            features_dict = extract_features_window(df[cols_order].values)
-            
-            # 4. Predição
-            X_scaled = SCALER.transform(pd.DataFrame([features_dict]))
-            prediction_idx = MODEL.predict(X_scaled)[0]
-            prediction_label = ENCODER.inverse_transform([prediction_idx])[0]
+        PUBLISHER.flush()
+        t_end = time.perf_counter()
 
-        print(f"Predição para {device_id}: {prediction_label.upper()}")
+        if PUBLISHER.stats.failed:
+            # Resposta não entregue: a reentrega deve ser processada, não descartada como duplicada
+            if dedup_key is not None:
+                DEDUP.forget(dedup_key)
+            return {'statusCode': 500, 'device_id': device_id, 'prediction': prediction_label,
+                    'body': 'Falha ao publicar a resposta.', 'publish': PUBLISHER.stats.snapshot()}
 
-        # 5. RETORNO VIA MQTT
-        try:
-            response_payload = json.dumps({
-                "ts": event.get('ts', 0),
-                "resultado": prediction_label 
-            })
-            
-            TOPIC_RESPONSE = f"veiculos/{device_id}/resposta_IA"
-            
-            iot_client.publish(
-                topic=TOPIC_RESPONSE,
-                qos=0,
-                payload=response_payload
-            )
-            print(f"Resposta enviada para: {TOPIC_RESPONSE}")
-            
-        except Exception as mqtt_err:
-            print(f"ERRO ao publicar no MQTT: {mqtt_err}")
+        timing = {
+            'inference': round((t_inference - t_start) * 1e3, 3),
+            'publish': round((t_end - t_inference) * 1e3, 3),
+        }
+        print(f"Resposta enviada para: {TOPIC_RESPONSE} ({PUBLISHER.mode}) | "
+              f"inferência {timing['inference']:.1f} ms, publish {timing['publish']:.1f} ms")
 
         return {
             'statusCode': 200,
             'device_id': device_id,
-            'prediction': prediction_label
+            'prediction': prediction_label,
+            'timing_ms': timing,
+            'publish': PUBLISHER.stats.snapshot(),
+            'dedup': DEDUP.stats.snapshot() if DEDUP is not None else None,
+            'cache': PRED_CACHE.snapshot() if PRED_CACHE is not None else None
         }
 
     except Exception as e:
         print(f"ERRO GERAL: {e}")
         traceback.print_exc()
-        return {'statusCode': 500, 'body': str(e)}
\ No newline at end of file
+        if dedup_key is not None:
+            DEDUP.forget(dedup_key)  # deixa a reentrega tentar de novo
+        return {'statusCode': 500, 'body': str(e)}
+
+
+# --- MODO EM LOTE (IoT Rule batch / SQS / Kinesis) ---
+
+def _unpack_batch(event):
+    """
+    Normaliza a entrada do lote para uma lista de (item_id, evento_ou_None, erro).
+    Aceita uma lista de eventos, {'events': [...]} ou {'Records': [...]} (SQS/Kinesis).
+    """
+    if isinstance(event, list):
+        events = event
+    elif 'events' in event:
+        events = event['events']
+    else:
+        events = None
+    if events is not None:
+        items = []
+        for i, ev in enumerate(events):
+            try:
+                items.append((str(i), _expand_event(ev), None))
+            except Exception as e:
+                items.append((str(i), None, f"Registro inválido: {e}"))
+        return items
+
+    items = []
+    for i, record in enumerate(event.get('Records', [])):
+        try:
+            if 'kinesis' in record:
+                item_id = record['kinesis'].get('sequenceNumber', str(i))
+                body = base64.b64decode(record['kinesis']['data'])
+            else:
+                item_id = record.get('messageId', str(i))
+                body = record['body']
+            items.append((item_id, _expand_event(payload_to_event(body)), None))
+        except Exception as e:
+            items.append((record.get('messageId', str(i)), None, f"Registro inválido: {e}"))
+    return items
+
+def lambda_batch_handler(event, context):
+    """
+    Ponto de entrada em lote: extrai features de todas as janelas como um único
+    array, aplica scaler e modelo uma única vez e publica as respostas com
+    BATCH_PUBLISHER (em paralelo no modo 'batch').
+    Erros por item são reportados em 'results' e 'batchItemFailures' sem
+    falhar o lote inteiro. Eventos já vistos (DEDUP) saem com duplicate=True,
+    sem predição nem publish.
+    """
+    if not ARTIFACTS: return {'statusCode': 500, 'body': 'Modelos não carregados.'}
+
+    t_start = time.perf_counter()
+    results = []
+    pending = []  # (posição em results, janela (n, 12), chave de idempotência, chave do cache)
+    dedup_keys = {}  # posição em results -> chave de idempotência registrada
+    for item_id, ev, err in _unpack_batch(event):
+        device_id = event_device_id(ev, 'unknown') if isinstance(ev, dict) else 'unknown'
+        ts = ev.get('ts', 0) if isinstance(ev, dict) else 0
+        result = {'item_id': item_id, 'device_id': device_id, 'ts': ts}
+        results.append(result)
+        if err:
+            result.update(statusCode=400, error=err)
+            continue
+        try:
+            raw = _parse_window(ev)
+            window = derive_channels(raw, fs=TAXA_ATUALIZACAO_HZ)
+        except KeyError as e:
+            result.update(statusCode=400, error=f"Campo ausente: {e.args[0]}")
+            continue
+        except Exception as e:
+            result.update(statusCode=400, error=str(e) or type(e).__name__)
+            continue
+
+        # Reentregas (também dentro do mesmo lote) não são classificadas de novo
+        key = event_key(device_id, ts, raw) if DEDUP is not None else None
+        if key is not None and DEDUP.check(key):
+            result.update(statusCode=200, duplicate=True)
+            continue
+        if key is not None:
+            dedup_keys[len(results) - 1] = key
+
+        # Janela já classificada neste container
+        cache_key = PRED_CACHE.key(raw) if PRED_CACHE is not None else None
+        cached = PRED_CACHE.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            result.update(statusCode=200, prediction=cached)
+            continue
+
+        # --- Zero Motion Gate ---
+        if is_stationary(window):
+            result.update(statusCode=200, prediction='slow')
+            if cache_key is not None:
+                PRED_CACHE.put(cache_key, 'slow')
+        else:
+            pending.append((len(results) - 1, window, key, cache_key))
+
+    if pending:
+        try:
+            labels = classify_windows(ARTIFACTS, [w for _, w, _, _ in pending], fs=TAXA_ATUALIZACAO_HZ)
+            for (pos, _, _, cache_key), label in zip(pending, labels):
+                results[pos].update(statusCode=200, prediction=str(label))
+                if cache_key is not None:
+                    PRED_CACHE.put(cache_key, str(label))
+        except Exception as e:
+            print(f"ERRO GERAL no lote: {e}")
+            traceback.print_exc()
+            for pos, _, key, _ in pending:
+                results[pos].update(statusCode=500, error=str(e))
+                if key is not None:
+                    DEDUP.forget(key)
+
+    t_inference = time.perf_counter()
+    ok = [pos for pos, r in enumerate(results) if 'prediction' in r]
+    BATCH_PUBLISHER.stats.reset()
+    for pos in ok:
+        r = results[pos]
+        BATCH_PUBLISHER.publish(f"veiculos/{r['device_id']}/resposta_IA",
+                                json.dumps({"ts": r['ts'], "resultado": r['prediction']}), tag=pos)
+    BATCH_PUBLISHER.flush()
+    t_end = time.perf_counter()
+
+    # Resposta não publicada: o item falha e a chave é esquecida, para a reentrega ser processada
+    for pos in BATCH_PUBLISHER.stats.failed_tags:
+        results[pos].update(statusCode=500, error="Falha ao publicar a resposta")
+        key = dedup_keys.get(pos)
+        if key is not None:
+            DEDUP.forget(key)
+
+    timing = {
+        'inference': round((t_inference - t_start) * 1e3, 3),
+        'publish': round((t_end - t_inference) * 1e3, 3),
+    }
+    publish_stats = BATCH_PUBLISHER.stats.snapshot()
+    n_dup = sum(1 for r in results if r.get('duplicate'))
+    print(f"Lote processado: {len(ok)}/{len(results)} classificados, {n_dup} duplicados, "
+          f"{publish_stats['failed']} falhas de publicação | "
+          f"inferência {timing['inference']:.1f} ms, publish {timing['publish']:.1f} ms")
+
+    return {
+        'statusCode': 200,
+        'results': results,
+        'timing_ms': timing,
+        'publish': publish_stats,
+        'dedup': DEDUP.stats.snapshot() if DEDUP is not None else None,
+        'cache': PRED_CACHE.snapshot() if PRED_CACHE is not None else None,
+        'batchItemFailures': [{'itemIdentifier': r['item_id']} for r in results if r['statusCode'] != 200]
+    }
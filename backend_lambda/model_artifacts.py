@@ -0,0 +1,127 @@
+"""
+Artefatos do modelo em formato compacto para a Lambda.
+
+O treinamento salva três pickles (scaler_final.joblib, xgboost_final.joblib,
+label_encoder_final.joblib). Carregar esses pickles importa joblib + sklearn no
+cold start. Este módulo exporta os mesmos artefatos para:
+
+- xgboost_final.ubj : booster nativo do XGBoost (UBJSON)
+- model_meta.json   : mean_/scale_ do StandardScaler, classes do LabelEncoder
+                      e a lista de features
+
+e carrega o formato nativo (só numpy + xgboost) quando disponível. O modelo
+em si fica atrás de um Predictor (predictors.py), escolhido por backend.
+
+Exportar: python model_artifacts.py --model_dir . --out_dir .
+"""
+
+import json
+import os
+
+import numpy as np
+
+from feature_engineering import FEATURE_COLUMNS
+from predictors import BOOSTER_FILE, load_predictor
+
+META_FILE = 'model_meta.json'
+SCALER_JOBLIB = 'scaler_final.joblib'
+ENCODER_JOBLIB = 'label_encoder_final.joblib'
+
+
+class ModelArtifacts:
+    """
+    Parâmetros do scaler, classes e o Predictor, independentes do formato de origem.
+    predict(X_scaled) devolve os índices das classes (int).
+    """
+
+    def __init__(self, mean, scale, classes, predictor, fmt):
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.predictor = predictor
+        self.format = fmt
+
+    @property
+    def backend(self):
+        return self.predictor.name
+
+    def scale_features(self, features):
+        """Mesma conta do StandardScaler.transform (X -= mean_; X /= scale_)."""
+        X = np.array(features, dtype=np.float64)
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+    def predict(self, X_scaled):
+        return self.predictor.predict(X_scaled)
+
+
+def _load_meta_native(model_dir):
+    with open(os.path.join(model_dir, META_FILE)) as f:
+        meta = json.load(f)
+    if meta['feature_columns'] != FEATURE_COLUMNS:
+        raise ValueError(f"{META_FILE} não corresponde às features de feature_engineering.py")
+    return meta['scaler_mean'], meta['scaler_scale'], meta['classes']
+
+
+def _load_meta_joblib(model_dir):
+    import joblib
+
+    scaler = joblib.load(os.path.join(model_dir, SCALER_JOBLIB))
+    encoder = joblib.load(os.path.join(model_dir, ENCODER_JOBLIB))
+    return scaler.mean_, scaler.scale_, encoder.classes_
+
+
+def load_artifacts(model_dir='.', fmt='auto', backend=None):
+    """
+    fmt: origem do scaler/classes -- 'native' (model_meta.json), 'joblib' (pickles
+    do treinamento) ou 'auto' (native se model_meta.json existir, senão joblib).
+    backend: ver predictors.PREDICTOR_BACKENDS; padrão 'xgboost' para o formato
+    nativo e 'sklearn' para joblib.
+    """
+    if fmt == 'auto':
+        fmt = 'native' if os.path.exists(os.path.join(model_dir, META_FILE)) else 'joblib'
+    if fmt == 'native':
+        mean, scale, classes = _load_meta_native(model_dir)
+    elif fmt == 'joblib':
+        mean, scale, classes = _load_meta_joblib(model_dir)
+    else:
+        raise ValueError(f"Formato de modelo desconhecido: {fmt}")
+    if backend is None:
+        backend = 'xgboost' if fmt == 'native' else 'sklearn'
+    return ModelArtifacts(mean, scale, classes, load_predictor(backend, model_dir), fmt)
+
+
+def export_artifacts(model_dir='.', out_dir='.'):
+    """Converte os pickles do treinamento para o formato nativo compacto."""
+    artifacts = load_artifacts(model_dir, fmt='joblib', backend='sklearn')
+    booster = artifacts.predictor.model.get_booster()
+    if booster.num_features() != len(FEATURE_COLUMNS):
+        raise ValueError(f"Modelo espera {booster.num_features()} features, "
+                         f"feature_engineering.py define {len(FEATURE_COLUMNS)}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    booster.save_model(os.path.join(out_dir, BOOSTER_FILE))
+    meta = {
+        'feature_columns': FEATURE_COLUMNS,
+        'classes': [str(c) for c in artifacts.classes],
+        'scaler_mean': None if artifacts.mean is None else artifacts.mean.tolist(),
+        'scaler_scale': None if artifacts.scale is None else artifacts.scale.tolist(),
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+    return os.path.join(out_dir, BOOSTER_FILE), os.path.join(out_dir, META_FILE)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta os artefatos joblib para UBJSON + JSON.")
+    parser.add_argument('--model_dir', default='.', help="Diretório com os .joblib (padrão: '.').")
+    parser.add_argument('--out_dir', default='.', help="Diretório de saída (padrão: '.').")
+    args = parser.parse_args()
+
+    for path in export_artifacts(args.model_dir, args.out_dir):
+        print(f"[INFO] Salvo: {path} ({os.path.getsize(path) / 1024:.1f} KB)")
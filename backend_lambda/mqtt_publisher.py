@@ -0,0 +1,143 @@
+"""
+Publicação das respostas da IA no IoT Core (veiculos/{dev}/resposta_IA).
+
+Modos (PUBLISH_MODE na Lambda):
+- 'sync'  : publica na hora, na thread do handler (comportamento original)
+- 'async' : enfileira em uma fila limitada; threads em segundo plano publicam
+            enquanto o handler segue. flush() espera a fila esvaziar antes do
+            retorno do handler (a Lambda congela o container depois do return).
+            Só ganha tempo se houver trabalho entre publish() e flush().
+- 'batch' : acumula as mensagens e publica todas de uma vez, em paralelo, no flush().
+
+O tempo gasto em publish é medido separado da inferência (PublishStats).
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PUBLISH_MODES = ('sync', 'async', 'batch')
+
+
+class PublishStats:
+    """
+    Contadores de publicação. sent/failed/tempos valem desde o último reset()
+    (o handler zera a cada invocação); total_sent/total_failed acumulam pela
+    vida do container e nunca são zerados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total_sent = 0
+        self.total_failed = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.sent = 0
+            self.failed = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+            self.failed_tags = []      # tag de cada publish que falhou (ver publish)
+
+    def record(self, elapsed_ms, ok, tag=None):
+        with self._lock:
+            if ok:
+                self.sent += 1
+                self.total_sent += 1
+            else:
+                self.failed += 1
+                self.total_failed += 1
+                if tag is not None:
+                    self.failed_tags.append(tag)
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            n = self.sent + self.failed
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'avg_ms': round(self.total_ms / n, 3) if n else 0.0,
+                'max_ms': round(self.max_ms, 3),
+                'total_sent': self.total_sent,
+                'total_failed': self.total_failed,
+            }
+
+
+class ResponsePublisher:
+    """
+    client_factory: função sem argumentos que devolve o cliente boto3 'iot-data'
+    (criado uma vez e reutilizado entre invocações do mesmo container).
+    """
+
+    def __init__(self, client_factory, mode='sync', queue_size=256, workers=4, qos=0):
+        if mode not in PUBLISH_MODES:
+            raise ValueError(f"PUBLISH_MODE inválido: {mode} (opções: {', '.join(PUBLISH_MODES)})")
+        self.client_factory = client_factory
+        self.mode = mode
+        self.qos = qos
+        self.workers = max(1, workers)
+        self.stats = PublishStats()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = []
+        self._threads = []
+        self._pool = None
+
+    # --- envio de uma mensagem ---
+    def _send(self, topic, payload, tag=None):
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            self.client_factory().publish(topic=topic, qos=self.qos, payload=payload)
+        except Exception as mqtt_err:
+            ok = False
+            print(f"ERRO ao publicar no MQTT ({topic}): {mqtt_err}")
+        self.stats.record((time.perf_counter() - t0) * 1e3, ok, tag)
+        return ok
+
+    # --- modo async ---
+    def _worker(self):
+        while True:
+            topic, payload, tag = self._queue.get()
+            try:
+                self._send(topic, payload, tag)
+            finally:
+                self._queue.task_done()
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        # Garante o cliente antes de abrir as threads (criação do boto3 não é thread-safe)
+        self.client_factory()
+        for _ in range(self.workers):
+            t = threading.Thread(target=self._worker, name='mqtt-publisher', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def publish(self, topic, payload, tag=None):
+        """tag identifica a mensagem em stats.failed_tags se o envio falhar."""
+        if self.mode == 'sync':
+            self._send(topic, payload, tag)
+        elif self.mode == 'async':
+            self._ensure_workers()
+            # Fila cheia bloqueia o produtor (backpressure) em vez de crescer sem limite
+            self._queue.put((topic, payload, tag))
+        else:
+            self._pending.append((topic, payload, tag))
+
+    def flush(self):
+        """Espera todas as publicações pendentes terminarem. Chamar antes do return do handler."""
+        if self.mode == 'async':
+            self._queue.join()
+        elif self.mode == 'batch' and self._pending:
+            pending, self._pending = self._pending, []
+            if len(pending) == 1:
+                self._send(*pending[0])
+                return
+            self.client_factory()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mqtt-batch')
+            list(self._pool.map(lambda msg: self._send(*msg), pending))
@@ -0,0 +1,135 @@
+"""
+Cache de predições por impressão digital da janela.
+
+Heartbeats de veículos parados são quase constantes (o simulador ainda completa
+o heartbeat repetindo a última amostra) e reenvios trazem janelas idênticas.
+Para essas janelas o cache devolve o rótulo sem derive_channels, extração de
+features, scaler e modelo.
+
+A chave é um hash (blake2b, 8 bytes) da janela de movimento (n, 6) ax..gz
+quantizada em `quantum` (0,01 = resolução do JSON do firmware) junto com a
+versão do modelo, então trocar os artefatos invalida o cache. Entradas saem
+por LRU (max_entries) ou por idade (ttl_s).
+
+Usado pela Lambda (um cache por container quente) e pelo simulador
+(processar_pacote_ia).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MODEL_FILES = ('model_meta.json', 'xgboost_final.ubj', 'xgboost_final.joblib', 'xgboost_final.onnx',
+               'scaler_final.joblib', 'label_encoder_final.joblib')
+
+
+def model_version(artifacts, model_dir='.'):
+    """
+    Identificador dos artefatos carregados: backend, scaler, classes e
+    nome/tamanho/mtime dos arquivos do modelo em model_dir.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update(f"{artifacts.format}:{artifacts.backend}".encode())
+    for arr in (artifacts.mean, artifacts.scale):
+        if arr is not None:
+            h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+    h.update('|'.join(str(c) for c in artifacts.classes).encode())
+    for name in MODEL_FILES:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def snapshot(self, size):
+        total = self.hits + self.misses
+        return {
+            'size': size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expired': self.expired,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class PredictionCache:
+    """
+    key(window) -> chave da janela (n, 6) ax..gz, ou (n, 7) com t na coluna 0.
+    get(key) -> rótulo ou None; put(key, label) grava.
+    """
+
+    def __init__(self, model_version, max_entries=4096, ttl_s=3600.0, quantum=0.01, clock=time.monotonic):
+        self.model_version = str(model_version)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.quantum = quantum
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries = OrderedDict()    # chave -> (rótulo, instante)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, window):
+        window = np.asarray(window, dtype=np.float64)
+        if window.ndim == 2 and window.shape[1] == 7:
+            window = window[:, 1:]
+        # int64: com int32 leituras acima de ~2^31 * quantum davam a volta e
+        # colidiam com outras janelas; o clip evita o cast indefinido de inf
+        q = np.rint(np.clip(window / self.quantum, -2.0 ** 62, 2.0 ** 62)).astype(np.int64)
+        h = hashlib.blake2b(digest_size=8)
+        h.update(self.model_version.encode())
+        h.update(np.asarray(q.shape, dtype=np.int64).tobytes())
+        h.update(q.tobytes())
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            label, stored = entry
+            if self.clock() - stored > self.ttl_s:
+                del self._entries[key]
+                self.stats.expired += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return label
+
+    def put(self, key, label):
+        with self._lock:
+            self._entries[key] = (label, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get_or_compute(self, window, compute):
+        """Rótulo do cache ou compute() (gravado no cache)."""
+        key = self.key(window)
+        label = self.get(key)
+        if label is None:
+            label = compute()
+            self.put(key, label)
+        return label
+
+    def snapshot(self):
+        with self._lock:
+            return self.stats.snapshot(len(self._entries))
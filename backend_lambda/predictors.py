@@ -0,0 +1,228 @@
+"""
+Backends de predição intercambiáveis para o modelo XGBoost.
+
+Todos recebem a matriz já escalada (n, 168) e devolvem os índices das classes
+(int64), na mesma convenção de XGBClassifier.predict. A escolha do backend é
+feita por configuração (MODEL_BACKEND na Lambda / no simulador):
+
+- 'sklearn'  : XGBClassifier do joblib (referência do treinamento)
+- 'xgboost'  : Booster nativo (xgboost_final.ubj) com inplace_predict
+- 'onnx'     : sessão do ONNX Runtime (xgboost_final.onnx)
+- 'compiled' : biblioteca compartilhada gerada com Treelite/TL2cgen (xgboost_final.so)
+
+As dependências de cada backend só são importadas quando ele é usado.
+
+Exportar:  python predictors.py export --backend onnx|compiled
+Paridade:  python predictors.py check [--backend all]
+"""
+
+import os
+import time
+
+import numpy as np
+
+BOOSTER_FILE = 'xgboost_final.ubj'
+MODEL_JOBLIB = 'xgboost_final.joblib'
+ONNX_FILE = 'xgboost_final.onnx'
+COMPILED_LIB = 'xgboost_final.so'
+
+
+class Predictor:
+    """Interface comum: predict(X_scaled) -> índices das classes."""
+
+    name = 'base'
+
+    def predict(self, X_scaled):
+        raise NotImplementedError
+
+    @staticmethod
+    def _to_labels(pred):
+        # Saídas de probabilidade (n, n_classes) ou (n, 1, n_classes) viram argmax
+        pred = np.asarray(pred)
+        if pred.ndim == 3:
+            pred = pred[:, 0, :]
+        if pred.ndim == 2:
+            pred = np.argmax(pred, axis=1)
+        return pred.astype(np.int64)
+
+
+class SklearnPredictor(Predictor):
+    name = 'sklearn'
+
+    def __init__(self, model):
+        self.model = model
+
+    @classmethod
+    def load(cls, model_dir):
+        import joblib
+        return cls(joblib.load(os.path.join(model_dir, MODEL_JOBLIB)))
+
+    def predict(self, X_scaled):
+        return self._to_labels(self.model.predict(X_scaled))
+
+
+class XGBoostNativePredictor(Predictor):
+    name = 'xgboost'
+
+    def __init__(self, booster):
+        self.booster = booster
+
+    @classmethod
+    def load(cls, model_dir):
+        import xgboost as xgb
+        path = os.path.join(model_dir, BOOSTER_FILE)
+        if not os.path.exists(path):
+            # Sem o .ubj exportado, usa o booster de dentro do pickle
+            return cls(SklearnPredictor.load(model_dir).model.get_booster())
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return cls(booster)
+
+    def predict(self, X_scaled):
+        return self._to_labels(self.booster.inplace_predict(X_scaled))
+
+
+class OnnxPredictor(Predictor):
+    name = 'onnx'
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    @classmethod
+    def load(cls, model_dir):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        # Predição de poucas linhas: threads extras só adicionam overhead
+        opts.intra_op_num_threads = 1
+        opts.inter_op_num_threads = 1
+        return cls(ort.InferenceSession(os.path.join(model_dir, ONNX_FILE), opts,
+                                        providers=['CPUExecutionProvider']))
+
+    def predict(self, X_scaled):
+        X = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        label = self.session.run(None, {self.input_name: X})[0]
+        return self._to_labels(label)
+
+
+class CompiledPredictor(Predictor):
+    name = 'compiled'
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    @classmethod
+    def load(cls, model_dir):
+        import tl2cgen
+        return cls(tl2cgen.Predictor(os.path.join(model_dir, COMPILED_LIB), nthread=1))
+
+    def predict(self, X_scaled):
+        import tl2cgen
+        X = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        return self._to_labels(self.predictor.predict(tl2cgen.DMatrix(X)))
+
+
+PREDICTOR_BACKENDS = {
+    'sklearn': SklearnPredictor,
+    'xgboost': XGBoostNativePredictor,
+    'onnx': OnnxPredictor,
+    'compiled': CompiledPredictor,
+}
+
+
+def load_predictor(backend, model_dir='.'):
+    try:
+        return PREDICTOR_BACKENDS[backend].load(model_dir)
+    except KeyError:
+        raise ValueError(f"Backend desconhecido: {backend} (opções: {', '.join(PREDICTOR_BACKENDS)})")
+
+
+# --- EXPORTAÇÃO ---
+
+def export_onnx(model_dir='.', out_dir='.'):
+    from onnxmltools import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+
+    model = SklearnPredictor.load(model_dir).model
+    n_features = model.get_booster().num_features()
+    onx = convert_xgboost(model, initial_types=[('input', FloatTensorType([None, n_features]))])
+    path = os.path.join(out_dir, ONNX_FILE)
+    with open(path, 'wb') as f:
+        f.write(onx.SerializeToString())
+    return path
+
+
+def export_compiled(model_dir='.', out_dir='.', toolchain='gcc'):
+    import tl2cgen
+    import treelite
+
+    booster = XGBoostNativePredictor.load(model_dir).booster
+    model = treelite.frontend.from_xgboost(booster)
+    path = os.path.join(out_dir, COMPILED_LIB)
+    tl2cgen.export_lib(model, toolchain=toolchain, libpath=path,
+                       params={'parallel_comp': os.cpu_count() or 1})
+    return path
+
+
+EXPORTERS = {'onnx': export_onnx, 'compiled': export_compiled}
+
+
+# --- PARIDADE ---
+
+def check_parity(predictor, X_scaled, reference=None, model_dir='.'):
+    """
+    Compara as predições do backend com o XGBClassifier do treinamento.
+    Retorna (fração de predições iguais, ms por linha em chamadas de 1 linha).
+    """
+    if reference is None:
+        reference = SklearnPredictor.load(model_dir)
+    expected = reference.predict(X_scaled)
+    got = predictor.predict(X_scaled)
+    agreement = float(np.mean(expected == got))
+
+    rows = X_scaled[:min(len(X_scaled), 200)]
+    t0 = time.perf_counter()
+    for i in range(len(rows)):
+        predictor.predict(rows[i:i + 1])
+    ms_per_row = (time.perf_counter() - t0) / len(rows) * 1e3
+    return agreement, ms_per_row
+
+
+def _parity_inputs(model_dir, n_rows=2000, seed=0):
+    """Janelas sintéticas passadas pelo mesmo pipeline da Lambda (features + scaler)."""
+    from feature_engineering import derive_channels, extract_features_batch
+    from model_artifacts import load_artifacts
+
+    artifacts = load_artifacts(model_dir, backend='sklearn')
+    rng = np.random.default_rng(seed)
+    raw = rng.normal(size=(n_rows, 49, 6)) * rng.uniform(0.1, 6.0, size=(n_rows, 1, 1))
+    features = extract_features_batch(derive_channels(raw), dtype=np.float64)
+    return artifacts.scale_features(features), artifacts.predictor
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta e valida backends de predição.")
+    parser.add_argument('command', choices=['export', 'check'])
+    parser.add_argument('--backend', default='all', help="Backend (ou 'all').")
+    parser.add_argument('--model_dir', default='.', help="Diretório dos artefatos (padrão: '.').")
+    parser.add_argument('--rows', type=int, default=2000, help="Linhas sintéticas para a paridade.")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        backends = list(EXPORTERS) if args.backend == 'all' else [args.backend]
+        for backend in backends:
+            print(f"[INFO] {backend}: salvo em {EXPORTERS[backend](args.model_dir, args.model_dir)}")
+    else:
+        backends = list(PREDICTOR_BACKENDS) if args.backend == 'all' else [args.backend]
+        X_scaled, reference = _parity_inputs(args.model_dir, args.rows)
+        for backend in backends:
+            try:
+                predictor = load_predictor(backend, args.model_dir)
+            except Exception as e:
+                print(f"  {backend:<9} indisponível: {e}")
+                continue
+            agreement, ms = check_parity(predictor, X_scaled, reference)
+            status = 'OK' if agreement == 1.0 else 'DIVERGENTE'
+            print(f"  {backend:<9} paridade={agreement:.4%}  {ms:.3f} ms/linha  [{status}]")
@@ -0,0 +1,87 @@
+"""
+Relatório de cold start da Lambda.
+
+Importa lambda_function em um processo Python novo com `-X importtime` e
+mostra o tempo total de inicialização (imports + carga dos modelos) e os
+módulos mais caros. Use --json para guardar o relatório e comparar entre
+versões, e --budget_ms para falhar quando o cold start passar do limite.
+
+Uso: python profile_cold_start.py [--format native|joblib|auto] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """Converte a saída de -X importtime em [(modulo, self_us, cumulativo_us)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cum_us, name = [p.strip() for p in line.split(':', 1)[1].split('|')]
+        rows.append((name, int(self_us), int(cum_us)))
+    return rows
+
+
+def profile(model_format='auto'):
+    env = dict(os.environ, MODEL_FORMAT=model_format, PYTHONDONTWRITEBYTECODE='1')
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import lambda_function'],
+                          cwd=HERE, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - t0) * 1e3
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falha ao importar lambda_function:\n{proc.stderr[-2000:]}")
+
+    rows = parse_importtime(proc.stderr)
+    top_level = {}
+    for name, _, cum_us in rows:
+        root = name.split('.')[0]
+        top_level[root] = max(top_level.get(root, 0), cum_us)
+    init_us = next((cum for name, _, cum in rows if name == 'lambda_function'), 0)
+    return {
+        'model_format': model_format,
+        'process_wall_ms': round(wall_ms, 1),
+        'lambda_function_import_ms': round(init_us / 1e3, 1),
+        'modules_loaded': len(rows),
+        'packages_ms': {k: round(v / 1e3, 1) for k, v in sorted(top_level.items(), key=lambda kv: -kv[1])},
+        'model_load_log': proc.stdout.strip().splitlines(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de imports/cold start da Lambda.")
+    parser.add_argument('--format', default='auto', choices=['auto', 'native', 'joblib'])
+    parser.add_argument('--top', type=int, default=15, help="Quantidade de pacotes listados.")
+    parser.add_argument('--json', help="Salva o relatório completo neste arquivo.")
+    parser.add_argument('--budget_ms', type=float, help="Sai com erro se o import passar deste tempo.")
+    args = parser.parse_args()
+
+    report = profile(args.format)
+    print(f"Formato do modelo     : {report['model_format']}")
+    print(f"Import lambda_function: {report['lambda_function_import_ms']:.1f} ms")
+    print(f"Processo completo     : {report['process_wall_ms']:.1f} ms ({report['modules_loaded']} módulos)")
+    for line in report['model_load_log']:
+        print(f"  > {line}")
+    print("\nPacotes mais caros (cumulativo):")
+    for name, ms in list(report['packages_ms'].items())[:args.top]:
+        print(f"  {name:<28} {ms:8.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRelatório salvo em: {args.json}")
+
+    if args.budget_ms is not None and report['lambda_function_import_ms'] > args.budget_ms:
+        print(f"\n[ERRO] Cold start acima do limite ({args.budget_ms:.0f} ms).")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
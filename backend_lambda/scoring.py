@@ -0,0 +1,46 @@
+"""
+Etapas de classificação compartilhadas entre a Lambda (lambda_function.py) e o
+serviço de agregação (aggregation_service.py): parse do evento, zero motion
+gate e predição em lote de várias janelas.
+"""
+
+import numpy as np
+
+from event_codec import validate_event
+from feature_engineering import N_FEATURES, TAXA_ATUALIZACAO_HZ, extract_features_batch
+
+MIN_AMOSTRAS = 10
+ZERO_MOTION_STD = 0.2
+EVENT_KEYS = ['ax', 'ay', 'az', 'gx', 'gy', 'gz']
+
+
+def parse_window(event):
+    """
+    Converte os arrays do evento em uma matriz (n, 6) acc_xyz/gyro_xyz.
+    Coluna ausente -> KeyError; tamanhos diferentes ou poucas amostras -> ValueError.
+    """
+    if validate_event(event) < MIN_AMOSTRAS:
+        raise ValueError('Dados insuficientes.')
+    return np.array([event[k] for k in EVENT_KEYS], dtype=np.float64).T
+
+
+def is_stationary(window):
+    """Zero Motion Gate: variação (std) de acc_vm muito baixa -> veículo parado."""
+    return np.std(window[:, 6], ddof=1) < ZERO_MOTION_STD
+
+
+def classify_windows(artifacts, windows, fs=TAXA_ATUALIZACAO_HZ):
+    """
+    Classifica uma lista de janelas (n, 12) com um único transform/predict.
+    Janelas de tamanhos diferentes são agrupadas por tamanho para a extração.
+    """
+    features = np.empty((len(windows), N_FEATURES), dtype=np.float64)
+    by_len = {}
+    for i, w in enumerate(windows):
+        by_len.setdefault(len(w), []).append(i)
+    for idxs in by_len.values():
+        features[idxs] = extract_features_batch(np.stack([windows[i] for i in idxs]), fs=fs,
+                                                dtype=np.float64)
+
+    X_scaled = artifacts.scale_features(features)
+    return artifacts.classes[artifacts.predict(X_scaled)]
@@ -0,0 +1,169 @@
+"""
+Pontuação contínua por dispositivo: a cada WINDOW_STEP amostras novas sai uma
+janela com as últimas WINDOW_SIZE, já nos 12 canais de CHANNELS.
+
+Reproduz o pré-processamento do treinamento (Modelo_FINAL_IA.py: gravidade
+removida de acc_xyz, derive_channels sobre a sessão inteira, janelas de
+sliding_window_batch), só que incremental:
+
+- a gravidade sai com o filtro causal GravityStream (estado por dispositivo);
+- cada dispositivo guarda só as últimas WINDOW_SIZE - 1 amostras derivadas e
+  a última amostra bruta (para o jerk da primeira amostra do bloco), então
+  push() custa O(amostras novas) e a memória por dispositivo é fixa;
+- as janelas completadas por um bloco saem de uma vez como views de
+  sliding_window_batch e vão para extract_features_batch em um único lote.
+
+As estatísticas de cada janela são recalculadas pelo extrator em lote: somas
+de potências mantidas amostra a amostra eram mais lentas em Python puro e
+perdiam precisão no skew/kurtosis com offsets grandes.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from feature_engineering import CHANNELS, RAW_CHANNELS, TAXA_ATUALIZACAO_HZ, derive_channels, sliding_window_batch
+from gravity import GravityStream
+from scoring import classify_windows, is_stationary
+
+WINDOW_SIZE = 50
+WINDOW_STEP = 10
+
+
+class _DeviceWindow:
+    __slots__ = ('tail', 'last_raw', 'count')
+
+    def __init__(self):
+        self.tail = np.empty((0, len(CHANNELS)))   # últimas win_size - 1 amostras derivadas
+        self.last_raw = None                       # última amostra (6,) já sem gravidade
+        self.count = 0                             # amostras recebidas
+
+
+class RollingWindows:
+    """
+    push(device_id, samples) -> janelas (m, win_size, 12) completadas pelo bloco
+    (m = 0 na maioria das chamadas amostra a amostra). As janelas terminam nas
+    amostras win_size, win_size + step, ... de cada dispositivo, como as de
+    sliding_window_batch sobre a sessão inteira. gravity=False entrega os
+    eixos como chegaram. Guarda no máximo max_devices dispositivos (LRU).
+    """
+
+    def __init__(self, win_size=WINDOW_SIZE, step=WINDOW_STEP, fs=TAXA_ATUALIZACAO_HZ, gravity=True,
+                 max_devices=1000):
+        self.win_size = win_size
+        self.step = step
+        self.fs = fs
+        self.max_devices = max_devices
+        self.gravity = GravityStream(fs, max_devices=max_devices) if gravity else None
+        self._devices = OrderedDict()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def _state(self, device_id):
+        state = self._devices.pop(device_id, None) or _DeviceWindow()
+        self._devices[device_id] = state
+        while len(self._devices) > self.max_devices:
+            evicted, _ = self._devices.popitem(last=False)
+            if self.gravity is not None:
+                self.gravity.reset(evicted)
+        return state
+
+    def push(self, device_id, samples):
+        return self.push_many({device_id: samples})[device_id]
+
+    def push_many(self, blocks):
+        """
+        {device_id: amostras (k, 6)} -> {device_id: janelas completadas}. Os
+        blocos de mesmo tamanho (o caso comum: uma amostra por dispositivo a
+        cada tick) passam juntos pelo filtro de gravidade e por derive_channels.
+        """
+        out = {}
+        by_len = {}
+        for device_id, samples in blocks.items():
+            raw = np.array(samples, dtype=np.float64).reshape(-1, len(RAW_CHANNELS))
+            by_len.setdefault(len(raw), []).append((device_id, raw))
+        for k, group in by_len.items():
+            ids = [device_id for device_id, _ in group]
+            states = [self._state(device_id) for device_id in ids]
+            if not k:
+                out.update((device_id, np.empty((0, self.win_size, len(CHANNELS)))) for device_id in ids)
+                continue
+            raw = np.stack([r for _, r in group])
+            if self.gravity is not None:
+                raw[:, :, :3] = self.gravity.process_many(ids, raw[:, :, :3])
+            # jerk da primeira amostra continua a diferença com a última do bloco
+            # anterior (dispositivo novo: repete a primeira, jerk 0 como na sessão)
+            prev = np.stack([raw[i, 0] if st.last_raw is None else st.last_raw for i, st in enumerate(states)])
+            derived = derive_channels(np.concatenate((prev[:, None], raw), axis=1), fs=self.fs)[:, 1:]
+            for i, (device_id, state) in enumerate(zip(ids, states)):
+                state.last_raw = raw[i, -1]
+                out[device_id] = self._append(state, derived[i])
+        return out
+
+    def _append(self, state, derived):
+        before, after = state.count, state.count + len(derived)
+        state.count = after
+        arr = np.concatenate((state.tail, derived)) if len(state.tail) else derived
+        state.tail = arr[max(len(arr) - (self.win_size - 1), 0):].copy()
+
+        # Primeiro fim de janela depois de `before` na grade win_size + k * step
+        first_end = max(self.win_size, before + 1)
+        first_end = self.win_size + -(-(first_end - self.win_size) // self.step) * self.step
+        if first_end > after:
+            return np.empty((0, self.win_size, len(CHANNELS)))
+        start = first_end - self.win_size - (before - (len(arr) - len(derived)))
+        return sliding_window_batch(arr[start:], self.win_size, self.step)
+
+    def samples_seen(self, device_id):
+        state = self._devices.get(device_id)
+        return state.count if state is not None else 0
+
+    def window_ends(self, device_id, n_windows):
+        """Posição (amostras do dispositivo) do fim de cada uma das últimas n_windows janelas."""
+        count = self.samples_seen(device_id)
+        last = count - (count - self.win_size) % self.step
+        return last - self.step * np.arange(n_windows - 1, -1, -1)
+
+    def reset(self, device_id=None):
+        """Esquece um dispositivo (ou todos), por exemplo no fim de uma sessão."""
+        if device_id is None:
+            self._devices.clear()
+        else:
+            self._devices.pop(device_id, None)
+        if self.gravity is not None:
+            self.gravity.reset(device_id)
+
+
+class StreamingScorer:
+    """
+    Classifica o fluxo contínuo de vários dispositivos. push_many({device_id:
+    amostras (k, 6)}) devolve [(device_id, amostra_final, classe)], uma tupla
+    por janela completada, com todas as janelas do lote em um único
+    classify_windows. Janelas paradas (Zero Motion Gate) saem como 'slow', como
+    na Lambda.
+    """
+
+    def __init__(self, artifacts, win_size=WINDOW_SIZE, step=WINDOW_STEP, fs=TAXA_ATUALIZACAO_HZ,
+                 gravity=True, max_devices=1000):
+        self.artifacts = artifacts
+        self.fs = fs
+        self.windows = RollingWindows(win_size, step, fs=fs, gravity=gravity, max_devices=max_devices)
+
+    def push(self, device_id, samples):
+        return self.push_many({device_id: samples})
+
+    def push_many(self, blocks):
+        results, pending = [], []
+        for device_id, windows in self.windows.push_many(blocks).items():
+            if not len(windows):
+                continue
+            for w, w_end in zip(windows, self.windows.window_ends(device_id, len(windows))):
+                results.append([device_id, int(w_end), 'slow'])
+                if not is_stationary(w):
+                    pending.append((len(results) - 1, w))
+        if pending:
+            labels = classify_windows(self.artifacts, [w for _, w in pending], fs=self.fs)
+            for (pos, _), label in zip(pending, labels):
+                results[pos][2] = str(label)
+        return [tuple(r) for r in results]
@@ -0,0 +1,375 @@
+"""
+Armazenamento local e persistente de telemetria (janelas + predições da IA).
+
+Substitui a releitura dos CSVs por execução (DADOS_TCC_<cenario>_<ts>.csv) e o
+estado só em memória do dashboard para perguntas históricas. Layout em disco,
+particionado por dispositivo e dia (UTC):
+
+    <root>/labels.json                       classes já vistas (código = posição)
+    <root>/<device>/<AAAA-MM-DD>/index.bin   um registro INDEX_DTYPE por janela
+    <root>/<device>/<AAAA-MM-DD>/samples.bin amostras float32, uma janela após a outra
+    <root>/<device>/hourly.bin               predições por (hora, classe), HOURLY_DTYPE
+
+Cada janela é gravada coluna a coluna (7, n) em float32, com t relativo a t0
+(guardado em float64 no índice): ~1,4 KB para 49 amostras contra ~4 KB de CSV.
+O índice tem (time, ts) de cada janela: `time` é o instante em ms epoch usado
+nas consultas por intervalo e na partição; `ts` é o timestamp do evento (o
+mesmo que a resposta da IA traz), usado para casar a predição com a janela.
+
+As consultas leem só as partições do intervalo pedido: o índice inteiro de um
+dia cabe em poucos KB e é filtrado com NumPy; as amostras são lidas por memmap
+apenas para as janelas selecionadas. As contagens por hora não leem os índices:
+hourly.bin é atualizado a cada predição gravada (um registro por hora e classe,
+reescrito no lugar) e basta um arquivo por dispositivo para a consulta.
+
+Um único processo deve escrever em cada root (leitores podem ser vários).
+"""
+
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from event_codec import SAMPLE_KEYS
+
+INDEX_FILE = 'index.bin'
+SAMPLES_FILE = 'samples.bin'
+LABELS_FILE = 'labels.json'
+HOURLY_FILE = 'hourly.bin'
+
+NO_LABEL = -1
+INDEX_DTYPE = np.dtype([
+    ('time', '<i8'),      # ms epoch (UTC)
+    ('ts', '<i8'),        # timestamp do evento
+    ('t0', '<f8'),        # t da primeira amostra
+    ('offset', '<i8'),    # posição (em float32) da janela em samples.bin
+    ('n', '<u4'),         # número de amostras
+    ('label', '<i2'),     # código da classe em labels.json (NO_LABEL = sem predição)
+    ('kind', '<u2'),      # tipo do pacote (0 = evento, 1 = heartbeat, ...)
+])
+HOURLY_DTYPE = np.dtype([
+    ('hour', '<i8'),      # ms epoch // HOUR_MS (UTC)
+    ('label', '<i2'),     # código da classe em labels.json
+    ('count', '<i8'),     # predições da classe nessa hora
+])
+# Registros do fim de hourly.bin lidos antes do arquivo inteiro (a hora atual
+# quase sempre está no fim)
+HOURLY_TAIL = 64
+N_COLS = len(SAMPLE_KEYS)
+HOUR_MS = 3600 * 1000
+
+
+def now_ms():
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def to_ms(value):
+    """datetime (sem tz = UTC) ou número (ms epoch) -> ms epoch."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+
+def day_of(time_ms):
+    return datetime.fromtimestamp(time_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def days_between(t1_ms, t2_ms):
+    day = datetime.fromtimestamp(t1_ms / 1000, tz=timezone.utc).date()
+    last = datetime.fromtimestamp(t2_ms / 1000, tz=timezone.utc).date()
+    while day <= last:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+class TelemetryStore:
+    """
+    add_event / add_prediction gravam; windows / last_samples /
+    class_counts_hourly consultam.
+    `recent` limita o mapa (dispositivo, ts) -> registro usado para aplicar as
+    respostas da IA sem reler o índice.
+    """
+
+    def __init__(self, root, recent=10000):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.recent = recent
+        self._recent = OrderedDict()
+        self._labels = self._load_labels()
+        self._codes = {c: i for i, c in enumerate(self._labels)}
+
+    # --- classes --------------------------------------------------------------
+    def _load_labels(self):
+        path = os.path.join(self.root, LABELS_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def _label_code(self, label):
+        if label is None:
+            return NO_LABEL
+        label = str(label).lower()
+        code = self._codes.get(label)
+        if code is None:
+            code = len(self._labels)
+            self._labels.append(label)
+            self._codes[label] = code
+            with open(os.path.join(self.root, LABELS_FILE), 'w') as f:
+                json.dump(self._labels, f)
+        return code
+
+    @property
+    def labels(self):
+        return list(self._labels)
+
+    # --- partições ------------------------------------------------------------
+    def _partition(self, device_id, day):
+        return os.path.join(self.root, quote(str(device_id), safe=''), day)
+
+    def devices(self):
+        return sorted(unquote(d) for d in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, d)))
+
+    def days(self, device_id):
+        path = os.path.join(self.root, quote(str(device_id), safe=''))
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    def _hourly_path(self, device_id):
+        return os.path.join(self.root, quote(str(device_id), safe=''), HOURLY_FILE)
+
+    def _read_index(self, part):
+        path = os.path.join(part, INDEX_FILE)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.fromfile(path, dtype=INDEX_DTYPE)
+
+    # --- escrita --------------------------------------------------------------
+    def add_event(self, device_id, ts, samples, time_ms=None, label=None, kind=0):
+        """
+        Grava uma janela (n, 7) na ordem SAMPLE_KEYS. time_ms (padrão: agora)
+        define a partição; label pode vir junto (simulador) ou depois via
+        add_prediction.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim != 2 or samples.shape[1] != N_COLS:
+            raise ValueError(f"samples deve ter formato (n, {N_COLS}), recebido {samples.shape}.")
+        time_ms = now_ms() if time_ms is None else to_ms(time_ms)
+        part = self._partition(device_id, day_of(time_ms))
+        os.makedirs(part, exist_ok=True)
+
+        t0 = float(samples[0, 0]) if len(samples) else 0.0
+        block = samples.T.astype(np.float32)
+        if len(samples):
+            block[0] = samples[:, 0] - t0
+        samples_path = os.path.join(part, SAMPLES_FILE)
+        offset = os.path.getsize(samples_path) // 4 if os.path.exists(samples_path) else 0
+        with open(samples_path, 'ab') as f:
+            f.write(block.tobytes())
+
+        code = self._label_code(label)
+        self._ensure_hourly(device_id)
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record[0] = (time_ms, int(ts), t0, offset, len(samples), code, kind)
+        index_path = os.path.join(part, INDEX_FILE)
+        pos = os.path.getsize(index_path) // INDEX_DTYPE.itemsize if os.path.exists(index_path) else 0
+        with open(index_path, 'ab') as f:
+            f.write(record.tobytes())
+        self._add_hourly(device_id, time_ms, code, 1)
+
+        self._remember((str(device_id), int(ts)), (part, pos))
+        return pos
+
+    def _remember(self, key, value):
+        self._recent[key] = value
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.recent:
+            self._recent.popitem(last=False)
+
+    def add_prediction(self, device_id, ts, label, time_ms=None):
+        """
+        Aplica a resposta da IA na janela (dispositivo, ts). Procura no mapa
+        recente e, se não achar, no dia de time_ms (padrão: agora) e no anterior.
+        Devolve False se a janela não existir.
+        """
+        key = (str(device_id), int(ts))
+        found = self._recent.get(key)
+        if found is None:
+            time_ms = now_ms() if time_ms is None else to_ms(time_ms)
+            for day in (day_of(time_ms), day_of(time_ms - 24 * HOUR_MS)):
+                part = self._partition(device_id, day)
+                hits = np.flatnonzero(self._read_index(part)['ts'] == key[1])
+                if len(hits):
+                    found = (part, int(hits[-1]))
+                    break
+        if found is None:
+            return False
+        part, pos = found
+        code = self._label_code(label)
+        self._ensure_hourly(device_id)
+        with open(os.path.join(part, INDEX_FILE), 'r+b') as f:
+            f.seek(pos * INDEX_DTYPE.itemsize)
+            record = np.frombuffer(f.read(INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)[0]
+            f.seek(pos * INDEX_DTYPE.itemsize + INDEX_DTYPE.fields['label'][1])
+            f.write(np.array([code], dtype=INDEX_DTYPE['label']).tobytes())
+        # Reentrega com a mesma classe não muda a contagem; classe nova troca a antiga
+        if record['label'] != code:
+            self._add_hourly(device_id, record['time'], int(record['label']), -1)
+            self._add_hourly(device_id, record['time'], code, 1)
+        return True
+
+    # --- contagens por hora -----------------------------------------------------
+    def _read_hourly(self, device_id):
+        path = self._hourly_path(device_id)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=HOURLY_DTYPE)
+        return np.fromfile(path, dtype=HOURLY_DTYPE)
+
+    def _ensure_hourly(self, device_id):
+        """
+        Cria hourly.bin a partir dos índices já gravados (roots de antes do
+        arquivo existir). Chamado antes de gravar, para não contar duas vezes.
+        """
+        path = self._hourly_path(device_id)
+        if os.path.exists(path):
+            return
+        parts = [self._read_index(self._partition(device_id, day)) for day in self.days(device_id)]
+        idx = np.concatenate(parts) if parts else np.empty(0, dtype=INDEX_DTYPE)
+        idx = idx[idx['label'] != NO_LABEL]
+        keys, counts = np.unique(np.stack([idx['time'] // HOUR_MS, idx['label']], axis=1),
+                                 axis=0, return_counts=True)
+        hourly = np.zeros(len(keys), dtype=HOURLY_DTYPE)
+        if len(keys):
+            hourly['hour'], hourly['label'], hourly['count'] = keys[:, 0], keys[:, 1], counts
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        hourly.tofile(path)
+
+    def _add_hourly(self, device_id, time_ms, code, delta):
+        """Soma delta na contagem (hora de time_ms, classe code) de hourly.bin."""
+        if code == NO_LABEL:
+            return
+        path = self._hourly_path(device_id)
+        hour = int(time_ms) // HOUR_MS
+        size = os.path.getsize(path) // HOURLY_DTYPE.itemsize
+        start = max(size - HOURLY_TAIL, 0)
+        hits = []
+        with open(path, 'r+b') as f:
+            for first in (start, 0) if start else (0,):
+                f.seek(first * HOURLY_DTYPE.itemsize)
+                hourly = np.frombuffer(f.read((size - first) * HOURLY_DTYPE.itemsize), dtype=HOURLY_DTYPE)
+                hits = np.flatnonzero((hourly['hour'] == hour) & (hourly['label'] == code))
+                if len(hits):
+                    break
+            if len(hits):
+                pos = first + int(hits[0])
+                count = hourly['count'][hits[0]] + delta
+            else:
+                pos, count = size, delta
+            f.seek(pos * HOURLY_DTYPE.itemsize)
+            record = np.zeros(1, dtype=HOURLY_DTYPE)
+            record[0] = (hour, code, count)
+            f.write(record.tobytes())
+
+    # --- consultas ------------------------------------------------------------
+    def index(self, device_id, t1, t2):
+        """Registros do índice de device_id com t1 <= time < t2 (ms epoch ou datetime)."""
+        t1, t2 = to_ms(t1), to_ms(t2)
+        parts = []
+        for day in days_between(t1, max(t1, t2 - 1)):
+            idx = self._read_index(self._partition(device_id, day))
+            if len(idx):
+                parts.append(idx[(idx['time'] >= t1) & (idx['time'] < t2)])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=INDEX_DTYPE)
+
+    def windows(self, device_id, t1, t2):
+        """
+        Todas as janelas de device_id entre t1 e t2: lista de dicts com time, ts,
+        label (None sem predição), kind e samples (n, 7) float64 em SAMPLE_KEYS.
+        """
+        t1, t2 = to_ms(t1), to_ms(t2)
+        out = []
+        for day in days_between(t1, max(t1, t2 - 1)):
+            part = self._partition(device_id, day)
+            idx = self._read_index(part)
+            if not len(idx):
+                continue
+            idx = idx[(idx['time'] >= t1) & (idx['time'] < t2)]
+            if not len(idx):
+                continue
+            data = np.memmap(os.path.join(part, SAMPLES_FILE), dtype='<f4', mode='r')
+            for rec in idx:
+                off, n = int(rec['offset']), int(rec['n'])
+                samples = data[off:off + N_COLS * n].reshape(N_COLS, n).T.astype(np.float64)
+                samples[:, 0] += rec['t0']
+                out.append({
+                    'time': int(rec['time']),
+                    'ts': int(rec['ts']),
+                    'label': self._labels[rec['label']] if rec['label'] != NO_LABEL else None,
+                    'kind': int(rec['kind']),
+                    'samples': samples,
+                })
+        return out
+
+    def last_samples(self, device_id, n):
+        """
+        Últimas n amostras de device_id, (n, 7) float64 em SAMPLE_KEYS, com as
+        janelas concatenadas em ordem cronológica. Lê os dias do mais novo para o
+        mais antigo e para assim que junta n amostras.
+        """
+        blocks, total = [], 0
+        for day in reversed(self.days(device_id)):
+            part = self._partition(device_id, day)
+            idx = self._read_index(part)
+            if not len(idx):
+                continue
+            # Janelas do fim do dia para trás até completar o que falta
+            acc = np.cumsum(idx['n'][::-1].astype(np.int64))
+            k = min(int(np.searchsorted(acc, n - total)) + 1, len(idx))
+            data = np.memmap(os.path.join(part, SAMPLES_FILE), dtype='<f4', mode='r')
+            day_blocks = []
+            for rec in idx[len(idx) - k:]:
+                off, m = int(rec['offset']), int(rec['n'])
+                samples = data[off:off + N_COLS * m].reshape(N_COLS, m).T.astype(np.float64)
+                samples[:, 0] += rec['t0']
+                day_blocks.append(samples)
+            blocks[:0] = day_blocks
+            total += int(acc[k - 1])
+            if total >= n:
+                break
+        if not blocks:
+            return np.empty((0, N_COLS))
+        return np.concatenate(blocks)[-n:]
+
+    def class_counts_hourly(self, t1, t2, devices=None):
+        """
+        Contagem de predições por classe, dispositivo e hora (UTC) entre t1 e t2.
+        Uma linha por (device_id, hora) com uma coluna por classe. Lê só o
+        hourly.bin de cada dispositivo: entram as horas inteiras que se
+        sobrepõem a [t1, t2).
+        """
+        t1, t2 = to_ms(t1), to_ms(t2)
+        devices = self.devices() if devices is None else devices
+        n_labels = len(self._labels)
+        rows = []
+        for device_id in devices:
+            self._ensure_hourly(device_id)
+            hourly = self._read_hourly(device_id)
+            hourly = hourly[(hourly['hour'] >= t1 // HOUR_MS) & (hourly['hour'] * HOUR_MS < t2)
+                            & (hourly['count'] > 0)]
+            if not len(hourly):
+                continue
+            uniq, inv = np.unique(hourly['hour'], return_inverse=True)
+            counts = np.zeros((len(uniq), n_labels), dtype=np.int64)
+            np.add.at(counts, (inv, hourly['label']), hourly['count'])
+            for hour, row in zip(uniq.tolist(), counts.tolist()):
+                rows.append({
+                    'device_id': device_id,
+                    'hora': datetime.fromtimestamp(hour * 3600, tz=timezone.utc),
+                    **dict(zip(self._labels, row)),
+                })
+        return rows
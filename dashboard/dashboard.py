@@ -1,12 +1,22 @@
 import streamlit as st
 import paho.mqtt.client as mqtt
 import json
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import ssl
 import time
-import queue
-from datetime import datetime
+import sys
+import os
+# Decodificação dos eventos (JSON ou binário) compartilhada com a Lambda (usada em ingestion.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend_lambda'))
+from decimate import decimate
+from device_store import DeviceStore
+from ingestion import IngestionWorker
+from idempotency import DedupFilter, SQLiteBackend
+from session_log import SessionLog
+from telemetry_store import TelemetryStore
+from ring_buffer import TRACE_COLUMNS
 
 # ==============================================================================
 # 1. CONFIGURAÇÕES DO SISTEMA
@@ -20,7 +30,45 @@ CA_PATH = "root-CA.pem"
 CERT_PATH = "dashboard-cert.pem.crt"
 KEY_PATH = "dashboard-private.pem.key"
 
+# Amostras mantidas em memória por veículo (~28 KB cada) e capacidade por
+# dispositivo (sobrescreve MAX_SAMPLES)
 MAX_SAMPLES = 500 
+MAX_SAMPLES_DEVICE = {}
+
+# Pontos enviados por curva nos gráficos (decimação min/max)
+MAX_PLOT_POINTS = 1000
+
+# Log da sessão em disco (SQLite); o CSV é gerado em memória sob demanda para download
+SESSION_DB = "telemetry_session.db"
+
+# Deduplicação das reentregas QoS 1 (idempotency.py): janela (s) e arquivo
+# SQLite com as chaves vistas (None = só em memória)
+DEDUP_TTL_S = 600
+DEDUP_DB = "dedup.db"
+
+# Histórico persistente por veículo/dia (backend_lambda/telemetry_store.py); None desativa
+TELEMETRY_DIR = "telemetria"
+
+# Janelas dos gráficos (amostras). As maiores que MAX_SAMPLES são lidas do
+# histórico em disco, só para o veículo selecionado (exigem TELEMETRY_DIR)
+CHART_WINDOWS = {"500 amostras": MAX_SAMPLES}
+if TELEMETRY_DIR:
+    CHART_WINDOWS.update({"6.000 (~5 min)": 6000, "36.000 (~30 min)": 36000, "72.000 (~1 h)": 72000})
+
+# Intervalo de verificação de dados novos (s); a página só é refeita quando o
+# veículo selecionado muda. Tabela da frota e métricas acompanham no máximo a
+# cada FLEET_REFRESH_S
+REFRESH_S = 1.0
+FLEET_REFRESH_S = 10.0
+
+# Limite de veículos mantidos em memória (o menos recente sai primeiro)
+MAX_DEVICES = 1000
+
+# Mensagens aguardando a thread de ingestão (acima disso são descartadas)
+INGEST_QUEUE_SIZE = 10000
+
+def trace_capacity(device_id):
+    return MAX_SAMPLES_DEVICE.get(device_id, MAX_SAMPLES)
 
 # ==============================================================================
 # 2. CONFIGURAÇÃO DA PÁGINA E ESTILO
@@ -96,97 +144,19 @@ st.markdown("""
 # ==============================================================================
 # 3. GERENCIAMENTO DE ESTADO
 # ==============================================================================
-if 'trace_ax' not in st.session_state: st.session_state.trace_ax = [0] * MAX_SAMPLES
-if 'trace_ay' not in st.session_state: st.session_state.trace_ay = [0] * MAX_SAMPLES
-if 'trace_az' not in st.session_state: st.session_state.trace_az = [0] * MAX_SAMPLES
-if 'trace_gx' not in st.session_state: st.session_state.trace_gx = [0] * MAX_SAMPLES
-if 'trace_gy' not in st.session_state: st.session_state.trace_gy = [0] * MAX_SAMPLES
-if 'trace_gz' not in st.session_state: st.session_state.trace_gz = [0] * MAX_SAMPLES
-
-if 'full_session_data' not in st.session_state: st.session_state.full_session_data = []
-
-if 'last_prediction' not in st.session_state: st.session_state.last_prediction = "AGUARDANDO..."
-if 'dev_id' not in st.session_state: st.session_state.dev_id = "--"
-if 'last_update' not in st.session_state: st.session_state.last_update = "OFFLINE"
-if 'raw_event' not in st.session_state: st.session_state.raw_event = {}
-if 'raw_ai' not in st.session_state: st.session_state.raw_ai = {}
-
+# Estado compartilhado por todas as sessões do navegador: um único worker de
+# ingestão aplica as mensagens no DeviceStore (ver ingestion.py); cada sessão
+# só guarda o veículo selecionado e lê snapshots.
 @st.cache_resource
-def get_msg_queue(): return queue.Queue()
-msg_queue = get_msg_queue()
-
-# ==============================================================================
-# 4. PROCESSAMENTO DE DADOS (COM TRAVA ANTI-DUPLICIDADE)
-# ==============================================================================
-def process_queue():
-    updated = False
-    try:
-        while not msg_queue.empty():
-            msg = msg_queue.get_nowait()
-            data = msg['payload']
-            topic = msg['topic']
-            updated = True
-            
-            st.session_state.last_update = datetime.now().strftime("%H:%M:%S")
-            
-            if "eventos" in topic:
-                st.session_state.raw_event = data
-                st.session_state.dev_id = data.get('dev_id', 'N/A')
-                ts = data.get('ts', 0)
-
-                # --- TRAVA DE DUPLICIDADE ---
-                # Se o timestamp for igual ao último salvo, ignora o pacote.
-                if st.session_state.full_session_data:
-                    if ts == st.session_state.full_session_data[-1].get("timestamp_device", 0):
-                        continue # Pula processamento
-                
-                ax, ay, az = data.get('ax', []), data.get('ay', []), data.get('az', [])
-                gx, gy, gz = data.get('gx', []), data.get('gy', []), data.get('gz', [])
-                
-                # Atualiza Buffers Gráficos
-                if isinstance(ax, list):
-                    st.session_state.trace_ax.extend(ax)
-                    st.session_state.trace_ay.extend(ay)
-                    st.session_state.trace_az.extend(az)
-                    st.session_state.trace_ax = st.session_state.trace_ax[-MAX_SAMPLES:]
-                    st.session_state.trace_ay = st.session_state.trace_ay[-MAX_SAMPLES:]
-                    st.session_state.trace_az = st.session_state.trace_az[-MAX_SAMPLES:]
-
-                if isinstance(gx, list):
-                    st.session_state.trace_gx.extend(gx)
-                    st.session_state.trace_gy.extend(gy)
-                    st.session_state.trace_gz.extend(gz)
-                    st.session_state.trace_gx = st.session_state.trace_gx[-MAX_SAMPLES:]
-                    st.session_state.trace_gy = st.session_state.trace_gy[-MAX_SAMPLES:]
-                    st.session_state.trace_gz = st.session_state.trace_gz[-MAX_SAMPLES:]
-
-                # Gravação CSV (Nova Linha)
-                max_val = max(ax) if ax else 0
-                new_row = {
-                    "timestamp_device": ts,
-                    "horario_chegada": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "device_id": st.session_state.dev_id,
-                    "ax_list": str(ax), "ay_list": str(ay), "az_list": str(az),
-                    "gx_list": str(gx), "gy_list": str(gy), "gz_list": str(gz),
-                    "pico_acc": max_val,
-                    "predicao_ia": "Processando..."
-                }
-                st.session_state.full_session_data.append(new_row)
-
-            elif "resposta_IA" in topic:
-                st.session_state.raw_ai = data
-                resultado = data.get("resultado", "ERRO").upper()
-                st.session_state.last_prediction = resultado
-                
-                # Atualiza a última linha com a resposta da IA
-                if st.session_state.full_session_data:
-                    st.session_state.full_session_data[-1]["predicao_ia"] = resultado
-
-    except Exception as e: pass
-    return updated
+def get_ingestion():
+    telemetry = TelemetryStore(TELEMETRY_DIR) if TELEMETRY_DIR else None
+    dedup = DedupFilter(DEDUP_TTL_S, backend=SQLiteBackend(DEDUP_DB) if DEDUP_DB else None)
+    return IngestionWorker(DeviceStore(trace_capacity, max_devices=MAX_DEVICES), SessionLog(SESSION_DB),
+                           telemetry=telemetry, dedup=dedup, queue_size=INGEST_QUEUE_SIZE).start()
+ingestion = get_ingestion()
 
 # ==============================================================================
-# 5. CONEXÃO MQTT
+# 4. CONEXÃO MQTT
 # ==============================================================================
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
@@ -194,13 +164,12 @@ def on_connect(client, userdata, flags, rc, properties=None):
         client.subscribe(TOPIC_AI)
 
 def on_message(client, userdata, msg):
-    try:
-        msg_queue.put({"topic": msg.topic, "payload": json.loads(msg.payload.decode())})
-    except: pass
+    # Só enfileira o payload bruto; a decodificação acontece na thread de ingestão
+    userdata.submit(msg.topic, msg.payload)
 
 @st.cache_resource
 def start_mqtt():
-    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="Dash_Final_Clean")
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="Dash_Final_Clean", userdata=ingestion)
     client.tls_set(ca_certs=CA_PATH, certfile=CERT_PATH, keyfile=KEY_PATH, tls_version=ssl.PROTOCOL_TLSv1_2)
     client.on_connect = on_connect
     client.on_message = on_message
@@ -213,9 +182,11 @@ def start_mqtt():
 _ = start_mqtt()
 
 # ==============================================================================
-# 6. LAYOUT E RENDERIZAÇÃO
+# 5. LAYOUT E RENDERIZAÇÃO
 # ==============================================================================
-process_queue()
+window = CHART_WINDOWS[st.session_state.get('chart_window', next(iter(CHART_WINDOWS)))]
+snap = ingestion.snapshot(st.session_state.get('selected_device'), window=window)
+metrics = snap['metrics']
 
 # --- HEADER ---
 st.markdown(f"""
@@ -226,13 +197,28 @@ st.markdown(f"""
     <div style="display:flex; align-items:center; font-family:'Orbitron'; color:#fff;">
         <span class="live-indicator"></span> SYSTEM ONLINE
         <span style="margin-left:20px; color:#555;">|</span>
-        <span style="margin-left:20px; color:#00f2ff;">{st.session_state.last_update}</span>
+        <span style="margin-left:20px; color:#00f2ff;">{snap['last_update']}</span>
     </div>
 </div>
 """, unsafe_allow_html=True)
+st.caption(f"INGESTÃO // fila {metrics['fila']} (máx {metrics['fila_max']}) · lag {metrics['lag_ms']:.1f} ms "
+           f"(médio {metrics['lag_medio_ms']:.1f}, máx {metrics['lag_max_ms']:.1f}) · {metrics['msgs_s']:.1f} msg/s · "
+           f"descartadas {metrics['descartadas']} · duplicadas {metrics['duplicadas']} ({metrics['taxa_duplicadas']:.1%}) · "
+           f"erros {metrics['erros']}")
+
+# --- SELEÇÃO DE VEÍCULO ---
+devices = snap['devices']
+if st.session_state.get('selected_device') not in devices:
+    st.session_state.pop('selected_device', None)
+col_dev, col_win = st.columns([3, 1])
+with col_dev:
+    selected = st.selectbox("VEÍCULO", devices, key='selected_device') if devices else None
+with col_win:
+    st.selectbox("JANELA", list(CHART_WINDOWS), key='chart_window')
+traces = snap['traces'] if snap['traces'] is not None and len(snap['traces']) else np.zeros((MAX_SAMPLES, len(TRACE_COLUMNS)))
 
 # --- KPIS / CARDS ---
-pred = st.session_state.last_prediction
+pred = snap['last_prediction'].upper() if snap['last_prediction'] else "AGUARDANDO..."
 status_style = {"color": "text-cyan", "border": "border-cyan", "icon": "💠"}
 if "AGGRESSIVE" in pred: status_style = {"color": "text-red", "border": "border-red", "icon": "☢️"}
 elif "NORMAL" in pred: status_style = {"color": "text-green", "border": "border-green", "icon": "🟢"}
@@ -244,21 +230,22 @@ with col1:
     <div class="hud-value {status_style['color']}">{status_style['icon']} {pred}</div></div>""", unsafe_allow_html=True)
 with col2:
     st.markdown(f"""<div class="hud-card border-cyan"><div class="hud-label">DEVICE ID</div>
-    <div class="hud-value" title="{st.session_state.dev_id}">{st.session_state.dev_id}</div></div>""", unsafe_allow_html=True)
+    <div class="hud-value" title="{selected or '--'}">{selected or '--'}</div></div>""", unsafe_allow_html=True)
 with col3:
-    pico = max(st.session_state.trace_ax[-10:]) if st.session_state.trace_ax else 0
+    pico = traces[-10:, 1].max()
     st.markdown(f"""<div class="hud-card border-magenta"><div class="hud-label">INSTANT PICO X</div>
     <div class="hud-value text-magenta">{pico:.2f} m/s²</div></div>""", unsafe_allow_html=True)
 with col4:
     st.markdown(f"""<div class="hud-card border-green"><div class="hud-label">SESSION LOGS</div>
-    <div class="hud-value text-green">{len(st.session_state.full_session_data)} <span style="font-size:16px">pkts</span></div></div>""", unsafe_allow_html=True)
+    <div class="hud-value text-green">{snap['session_rows']} <span style="font-size:16px">pkts / {len(devices)} veículos</span></div></div>""", unsafe_allow_html=True)
 
 # --- GRÁFICOS (VERTICAL) ---
 def create_neon_chart(title, x, y, z):
+    # Janelas longas vão decimadas (mín/máx por bloco): no máximo ~MAX_PLOT_POINTS por curva
     fig = go.Figure()
-    fig.add_trace(go.Scatter(y=x, mode='lines', name='Eixo X', line=dict(color='#00f2ff', width=2)))
-    fig.add_trace(go.Scatter(y=y, mode='lines', name='Eixo Y', line=dict(color='#ff00ff', width=2)))
-    fig.add_trace(go.Scatter(y=z, mode='lines', name='Eixo Z', line=dict(color='#ffe600', width=2)))
+    for values, name, color in ((x, 'Eixo X', '#00f2ff'), (y, 'Eixo Y', '#ff00ff'), (z, 'Eixo Z', '#ffe600')):
+        idx, values = decimate(values, MAX_PLOT_POINTS)
+        fig.add_trace(go.Scatter(x=idx, y=values, mode='lines', name=name, line=dict(color=color, width=2)))
     
     fig.update_layout(
         title=dict(text=title, font=dict(family="Orbitron", size=14, color="#aaa")),
@@ -271,8 +258,15 @@ def create_neon_chart(title, x, y, z):
     )
     return fig
 
-st.plotly_chart(create_neon_chart("ACELERÔMETRO (m/s²)", st.session_state.trace_ax, st.session_state.trace_ay, st.session_state.trace_az), use_container_width=True)
-st.plotly_chart(create_neon_chart("GIROSCÓPIO (deg/s)", st.session_state.trace_gx, st.session_state.trace_gy, st.session_state.trace_gz), use_container_width=True)
+st.plotly_chart(create_neon_chart("ACELERÔMETRO (m/s²)", traces[:, 1], traces[:, 2], traces[:, 3]), use_container_width=True)
+st.plotly_chart(create_neon_chart("GIROSCÓPIO (deg/s)", traces[:, 4], traces[:, 5], traces[:, 6]), use_container_width=True)
+
+# --- VISÃO GERAL DA FROTA ---
+st.markdown('<div class="hud-label">FLEET OVERVIEW</div>', unsafe_allow_html=True)
+if snap['fleet']:
+    st.dataframe(pd.DataFrame(snap['fleet']), hide_index=True, use_container_width=True, height=250)
+else:
+    st.write("Nenhum veículo conectado.")
 
 # --- ÁREA DE CONTROLE E EXPORTAÇÃO ---
 st.markdown("---")
@@ -282,37 +276,47 @@ with col_actions:
     st.markdown('<div class="hud-label">SESSION CONTROL</div>', unsafe_allow_html=True)
     st.write("")
     
-    if st.session_state.full_session_data:
-        df_export = pd.DataFrame(st.session_state.full_session_data)
-        csv = df_export.to_csv(index=False).encode('utf-8')
-        
-        # Botão de Download Único
-        st.download_button(
-            label="💾 DOWNLOAD CSV", data=csv,
-            file_name=f"telemetry_log.csv", # Nome estático para evitar re-render loop
-            mime="text/csv", type="primary"
-        )
+    if snap['session_rows']:
+        # O CSV só é gerado no clique (lido do SQLite em blocos), não a cada rerun
+        if st.button("📦 GERAR CSV"):
+            st.session_state.export_ready = ingestion.export_csv()
+        if st.session_state.get('export_ready'):
+            st.download_button(
+                label="💾 DOWNLOAD CSV", data=st.session_state.export_ready,
+                file_name=f"telemetry_log.csv", # Nome estático para evitar re-render loop
+                mime="text/csv", type="primary",
+                on_click=lambda: st.session_state.pop('export_ready', None)
+            )
     else:
         st.button("💾 NO DATA", disabled=True)
 
     st.write("")
     if st.button("🗑️ NOVA SESSÃO"):
-        st.session_state.full_session_data = []
-        st.session_state.trace_ax = [0] * MAX_SAMPLES
-        st.session_state.trace_ay = [0] * MAX_SAMPLES
-        st.session_state.trace_az = [0] * MAX_SAMPLES
-        st.session_state.trace_gx = [0] * MAX_SAMPLES
-        st.session_state.trace_gy = [0] * MAX_SAMPLES
-        st.session_state.trace_gz = [0] * MAX_SAMPLES
+        ingestion.clear()
+        st.session_state.pop('export_ready', None)
         st.rerun()
 
 with col_monitor1:
     st.markdown('<div class="hud-label">RAW: EVENTOS</div>', unsafe_allow_html=True)
-    st.markdown(f"""<div class="payload-box">{json.dumps(st.session_state.raw_event, indent=2)}</div>""", unsafe_allow_html=True)
+    st.markdown(f"""<div class="payload-box">{json.dumps(snap['last_event'], indent=2)}</div>""", unsafe_allow_html=True)
 
 with col_monitor2:
     st.markdown('<div class="hud-label">RAW: RESPOSTA IA</div>', unsafe_allow_html=True)
-    st.markdown(f"""<div class="payload-box">{json.dumps(st.session_state.raw_ai, indent=2)}</div>""", unsafe_allow_html=True)
+    st.markdown(f"""<div class="payload-box">{json.dumps(snap['last_response'], indent=2)}</div>""", unsafe_allow_html=True)
+
+# Só refaz a página (e reenvia os gráficos) quando o veículo selecionado recebeu
+# amostras ou resposta da IA; o resto da frota só atualiza a tabela a cada
+# FLEET_REFRESH_S. Sem veículo ainda, qualquer mensagem nova serve. A verificação
+# roda num fragmento a cada REFRESH_S: entre uma e outra o script não fica preso
+# em sleep, então cliques e trocas de veículo são atendidos na hora.
+@st.fragment(run_every=REFRESH_S)
+def watch_updates(device_id, version, device_version, rendered_at):
+    if device_id is None:
+        changed = ingestion.version != version
+    else:
+        changed = (ingestion.device_version(device_id) != device_version
+                   or (time.monotonic() - rendered_at >= FLEET_REFRESH_S and ingestion.version != version))
+    if changed:
+        st.rerun()
 
-time.sleep(1)
-st.rerun()
\ No newline at end of file
+watch_updates(snap['device_id'], snap['version'], snap['device_version'], time.monotonic())
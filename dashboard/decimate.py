@@ -0,0 +1,38 @@
+"""
+Redução de pontos para os gráficos do dashboard.
+
+Com horas de histórico, mandar todas as amostras para o navegador custa CPU no
+servidor (serialização do JSON do Plotly) e no cliente. minmax_indices divide a
+série em blocos e mantém o mínimo e o máximo de cada um, na ordem original:
+picos (frenagens, curvas) continuam visíveis mesmo com 100x menos pontos.
+"""
+
+import numpy as np
+
+
+def minmax_indices(y, max_points):
+    """
+    Índices (ordenados) de no máximo ~max_points amostras de y preservando o
+    mínimo e o máximo de cada bloco. Séries curtas voltam inteiras.
+    """
+    y = np.asarray(y)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(max_points // 2, 1)
+    size = n // buckets
+    main = buckets * size
+    blocks = y[:main].reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    parts = [offsets + np.argmin(blocks, axis=1), offsets + np.argmax(blocks, axis=1)]
+    if main < n:
+        # Resto que não fecha um bloco inteiro (sempre inclui a última amostra)
+        tail = y[main:]
+        parts.append(np.array([main + np.argmin(tail), main + np.argmax(tail), n - 1]))
+    return np.unique(np.concatenate(parts))
+
+
+def decimate(y, max_points):
+    """(x, y) prontos para o gráfico: x é o índice da amostra na janela."""
+    idx = minmax_indices(y, max_points)
+    return idx, np.asarray(y)[idx]
@@ -0,0 +1,119 @@
+"""
+Estado do dashboard por veículo.
+
+Cada dispositivo tem o próprio RingBuffer de amostras, o histórico recente de
+predições e os eventos (id no log da sessão) ainda sem resposta da IA. As respostas são
+associadas ao evento pelo par (dispositivo, ts), não pela posição na sessão.
+A memória é limitada: no máximo `max_devices` veículos (o menos recente é
+descartado), buffers de capacidade fixa e históricos com tamanho máximo.
+"""
+
+import time
+from collections import Counter, OrderedDict, deque
+
+from ring_buffer import RingBuffer, TRACE_COLUMNS
+
+
+class DeviceState:
+    def __init__(self, device_id, capacity, history, max_pending):
+        self.device_id = device_id
+        self.traces = RingBuffer(capacity, TRACE_COLUMNS, prefill=True)
+        self.predictions = deque(maxlen=history)     # (ts, resultado, horário)
+        self.class_counts = Counter()
+        self.pending = OrderedDict()                 # ts -> evento aguardando a IA
+        self.max_pending = max_pending
+        self.events = 0
+        self.last_ts = None
+        self.last_seen = 0.0
+        self.last_prediction = None
+        self.last_event = {}
+        self.last_response = {}
+
+    def add_event(self, meta, samples, ref=None):
+        self.traces.extend(samples)
+        self.events += 1
+        self.last_ts = meta.get('ts', 0)
+        self.last_seen = time.time()
+        self.last_event = meta
+        if ref is not None:
+            self.pending[self.last_ts] = ref
+            while len(self.pending) > self.max_pending:
+                self.pending.popitem(last=False)
+
+    def add_prediction(self, ts, label):
+        """Registra a resposta; devolve o evento (dispositivo, ts) aguardando ou None."""
+        label = str(label).lower()
+        self.predictions.append((ts, label, time.time()))
+        self.class_counts[label] += 1
+        self.last_prediction = label
+        self.last_response = {'ts': ts, 'resultado': label}
+        self.last_seen = time.time()
+        return self.pending.pop(ts, None)
+
+
+class DeviceStore:
+    """
+    capacity_fn(device_id) -> capacidade do buffer de amostras do dispositivo.
+    """
+
+    def __init__(self, capacity_fn, max_devices=1000, history=200, max_pending=64):
+        self.capacity_fn = capacity_fn
+        self.max_devices = max_devices
+        self.history = history
+        self.max_pending = max_pending
+        self._devices = OrderedDict()   # ordem de atividade (mais recente no fim)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, device_id):
+        return device_id in self._devices
+
+    def get(self, device_id):
+        return self._devices.get(device_id)
+
+    def _touch(self, device_id):
+        state = self._devices.get(device_id)
+        if state is None:
+            state = DeviceState(device_id, self.capacity_fn(device_id), self.history, self.max_pending)
+            self._devices[device_id] = state
+            while len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+        else:
+            self._devices.move_to_end(device_id)
+        return state
+
+    def is_duplicate(self, device_id, ts):
+        state = self._devices.get(device_id)
+        return state is not None and state.last_ts == ts
+
+    def add_event(self, device_id, meta, samples, ref=None):
+        state = self._touch(device_id)
+        state.add_event(meta, samples, ref)
+        return state
+
+    def add_prediction(self, device_id, ts, label):
+        return self._touch(device_id).add_prediction(ts, label)
+
+    def devices(self):
+        """IDs do mais recente para o mais antigo."""
+        return list(reversed(self._devices))
+
+    def clear(self):
+        self._devices.clear()
+
+    def fleet_rows(self):
+        """Uma linha por veículo para a tabela de visão geral da frota."""
+        rows = []
+        for state in reversed(self._devices.values()):
+            rows.append({
+                "device_id": state.device_id,
+                "ultimo_evento": time.strftime("%H:%M:%S", time.localtime(state.last_seen)),
+                "eventos": state.events,
+                "ultima_predicao": (state.last_prediction or "--").upper(),
+                "aggressive": state.class_counts.get('aggressive', 0),
+                "normal": state.class_counts.get('normal', 0),
+                "slow": state.class_counts.get('slow', 0),
+                "aguardando_ia": len(state.pending),
+            })
+        return rows
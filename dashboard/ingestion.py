@@ -0,0 +1,241 @@
+"""
+Ingestão das mensagens MQTT fora dos reruns do Streamlit.
+
+O callback do paho só enfileira o payload bruto (submit); uma única thread
+decodifica e aplica cada mensagem no DeviceStore compartilhado assim que chega,
+com ou sem navegador aberto. As sessões do navegador apenas leem snapshot(),
+que copia sob o mesmo lock o que a página precisa. A fila é limitada: quando
+enche, a mensagem é descartada e contada (o callback do paho nunca bloqueia).
+Os eventos também vão para o SessionLog em disco (ver session_log.py) e, se
+configurado, para o histórico persistente (backend_lambda/telemetry_store.py).
+"""
+
+import io
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from event_codec import decode_payload
+from idempotency import event_key
+
+
+class IngestionMetrics:
+    """Contadores da ingestão; lag = chegada no callback -> aplicado no store."""
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.lag_ms = 0.0          # última mensagem
+        self.lag_avg_ms = 0.0      # média exponencial
+        self.lag_max_ms = 0.0
+        self.started = time.time()
+
+    def record_lag(self, lag_ms):
+        self.lag_ms = lag_ms
+        self.lag_avg_ms = lag_ms if self.processed == 0 else \
+            (1 - self.alpha) * self.lag_avg_ms + self.alpha * lag_ms
+        self.lag_max_ms = max(self.lag_max_ms, lag_ms)
+
+    def as_dict(self, depth):
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {
+            'fila': depth,
+            'fila_max': self.max_depth,
+            'recebidas': self.received,
+            'processadas': self.processed,
+            'descartadas': self.dropped,
+            'duplicadas': self.duplicates,
+            'erros': self.errors,
+            'msgs_s': self.processed / elapsed,
+            'lag_ms': self.lag_ms,
+            'lag_medio_ms': self.lag_avg_ms,
+            'lag_max_ms': self.lag_max_ms,
+        }
+
+
+class IngestionWorker:
+    """
+    store: DeviceStore compartilhado; session_log: SessionLog em disco;
+    telemetry: TelemetryStore opcional. Todo acesso a eles passa por self.lock
+    (a thread de ingestão escreve, as sessões do navegador leem).
+    dedup: DedupFilter (idempotency.py); sem ele, só o último ts de cada
+    veículo é comparado.
+    """
+
+    def __init__(self, store, session_log, telemetry=None, dedup=None, queue_size=10000):
+        self.store = store
+        self.session_log = session_log
+        self.telemetry = telemetry
+        self.dedup = dedup
+        self.last_update = "OFFLINE"
+        self.version = 0                   # incrementa a cada mudança no estado
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.metrics = IngestionMetrics()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- lado do MQTT -------------------------------------------------------
+    def submit(self, topic, payload):
+        """Chamado pelo callback do paho: só enfileira, sem decodificar."""
+        self.metrics.received += 1
+        try:
+            self.queue.put_nowait((topic, bytes(payload), time.monotonic()))
+        except queue.Full:
+            self.metrics.dropped += 1
+            return
+        self.metrics.max_depth = max(self.metrics.max_depth, self.queue.qsize())
+
+    # --- thread de ingestão -------------------------------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ingestion", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                topic, payload, received_at = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                # Sem mensagens: fecha a transação aberta do log
+                with self.lock:
+                    self.session_log.flush()
+                continue
+            try:
+                self.handle(topic, payload)
+            except Exception:
+                self.metrics.errors += 1
+            else:
+                self.metrics.record_lag((time.monotonic() - received_at) * 1000.0)
+                self.metrics.processed += 1
+            finally:
+                self.queue.task_done()
+
+    def handle(self, topic, payload):
+        """Decodifica fora do lock e aplica a mensagem no store."""
+        if "eventos" in topic:
+            # JSON ou binário -> metadados + amostras (n, 7) em NumPy
+            data, samples = decode_payload(payload)
+            self._apply_event(topic, data, samples)
+        elif "resposta_IA" in topic:
+            data = json.loads(payload)
+            if not isinstance(data, dict):
+                raise ValueError("Resposta da IA deve ser um objeto JSON.")
+            self._apply_response(topic, data)
+
+    def _apply_event(self, topic, data, samples):
+        device_id = data.get('dev_id') or topic.split('/')[1]
+        ts = data.get('ts', 0)
+        now = datetime.now()
+        # --- TRAVA DE DUPLICIDADE ---
+        # Reentregas (mesmo veículo, ts e amostras) não chegam ao store nem aos logs
+        duplicate = self.dedup.check(event_key(device_id, ts, samples)) if self.dedup is not None else None
+        with self.lock:
+            self.last_update = now.strftime("%H:%M:%S")
+            if duplicate is None:
+                duplicate = self.store.is_duplicate(device_id, ts)
+            if duplicate:
+                self.metrics.duplicates += 1
+                return
+            event_id = self.session_log.append_event(device_id, ts, now.strftime("%Y-%m-%d %H:%M:%S"), samples)
+            self.store.add_event(device_id, {**data, "n_amostras": len(samples)}, samples, ref=event_id)
+            if self.telemetry is not None:
+                self.telemetry.add_event(device_id, ts, samples)
+            self.version += 1
+
+    def _apply_response(self, topic, data):
+        # A resposta vai para o evento (veículo, ts) correspondente, não para a última linha
+        resultado = data.get("resultado", "ERRO")
+        with self.lock:
+            self.last_update = datetime.now().strftime("%H:%M:%S")
+            device_id = topic.split('/')[1]
+            event_id = self.store.add_prediction(device_id, data.get('ts', 0), resultado)
+            if event_id is not None:
+                self.session_log.set_prediction(event_id, str(resultado).upper())
+            if self.telemetry is not None:
+                self.telemetry.add_prediction(device_id, data.get('ts', 0), resultado)
+            self.version += 1
+
+    # --- lado do navegador --------------------------------------------------
+    def _traces(self, state, window):
+        # Janelas maiores que o buffer em memória vêm do histórico em disco,
+        # só para o veículo que está sendo visto
+        if window is not None and window > state.traces.capacity and self.telemetry is not None:
+            return self.telemetry.last_samples(state.device_id, window)
+        return state.traces.view(window).copy()
+
+    def device_version(self, device_id):
+        """
+        Muda quando device_id recebe amostras ou uma resposta da IA (None se ele
+        não está no store). A página do veículo só é refeita quando isso muda.
+        """
+        with self.lock:
+            state = self.store.get(device_id) if device_id is not None else None
+            return self._device_version(state)
+
+    @staticmethod
+    def _device_version(state):
+        if state is None:
+            return None
+        return state.traces.version, state.last_response.get('ts'), state.last_prediction
+
+    def snapshot(self, device_id=None, window=None):
+        """
+        Cópia consistente do estado para renderizar uma página. Sem device_id
+        (ou se ele saiu do store) usa o veículo mais recente; window limita as
+        amostras copiadas às últimas `window` (lidas do TelemetryStore quando
+        passam da capacidade do buffer em memória).
+        """
+        with self.lock:
+            devices = self.store.devices()
+            if device_id not in self.store:
+                device_id = devices[0] if devices else None
+            state = self.store.get(device_id) if device_id is not None else None
+            return {
+                'devices': devices,
+                'device_id': device_id,
+                'traces': self._traces(state, window) if state else None,
+                'last_prediction': state.last_prediction if state else None,
+                'last_event': dict(state.last_event) if state else {},
+                'last_response': dict(state.last_response) if state else {},
+                'fleet': self.store.fleet_rows(),
+                'session_rows': self.session_log.rows,
+                'version': self.version,
+                'device_version': self._device_version(state),
+                'last_update': self.last_update,
+                'metrics': {**self.metrics.as_dict(self.queue.qsize()),
+                            'taxa_duplicadas': self.metrics.duplicates / max(self.metrics.processed, 1)},
+            }
+
+    def export_csv(self):
+        """
+        CSV da sessão atual em bytes (só quando o usuário pede). Montado em
+        memória a cada pedido: um arquivo fixo em disco seria sobrescrito por
+        outra sessão do navegador exportando ao mesmo tempo.
+        """
+        with self.lock:
+            self.session_log.flush()
+            session = self.session_log.session
+        out = io.StringIO(newline='')
+        self.session_log.export_csv(out, session=session)
+        return out.getvalue().encode('utf-8')
+
+    def clear(self):
+        with self.lock:
+            self.session_log.new_session()
+            self.store.clear()
+            self.version += 1
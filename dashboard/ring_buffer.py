@@ -0,0 +1,80 @@
+"""
+Buffer circular de capacidade fixa sobre um array NumPy pré-alocado.
+
+Substitui as listas trace_* do dashboard: extend() copia o bloco recebido para
+no máximo duas fatias do array (sem realocar nada), e view() devolve as
+amostras em ordem cronológica para os gráficos.
+"""
+
+import numpy as np
+
+TRACE_COLUMNS = ['t', 'ax', 'ay', 'az', 'gx', 'gy', 'gz']
+
+
+class RingBuffer:
+    """
+    capacity linhas x len(columns) colunas. Com prefill=True o buffer começa
+    cheio de `fill` (os gráficos abrem com a linha de base, como antes).
+    `version` conta as linhas já recebidas e serve para detectar mudanças.
+    """
+
+    def __init__(self, capacity, columns=TRACE_COLUMNS, dtype=np.float64, fill=0.0, prefill=False):
+        if capacity <= 0:
+            raise ValueError("capacity deve ser positiva.")
+        self.capacity = int(capacity)
+        self.columns = list(columns)
+        self._col = {c: i for i, c in enumerate(self.columns)}
+        self.fill = fill
+        self.prefill = prefill
+        self.data = np.empty((self.capacity, len(self.columns)), dtype=dtype)
+        self.clear()
+
+    def clear(self):
+        # Sem prefill as linhas além de size nunca são lidas: não precisa tocar no
+        # array (buffers grandes só ocupam memória conforme as amostras chegam)
+        if self.prefill:
+            self.data.fill(self.fill)
+        self.head = 0                                   # próxima posição de escrita
+        self.size = self.capacity if self.prefill else 0
+        self.version = 0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, block):
+        """Acrescenta (k, n_colunas) linhas; com k > capacity só as últimas ficam."""
+        block = np.asarray(block, dtype=self.data.dtype)
+        if block.ndim == 1:
+            block = block[None]
+        k = len(block)
+        if k == 0:
+            return
+        self.version += k
+        if k >= self.capacity:
+            self.data[:] = block[-self.capacity:]
+            self.head = 0
+            self.size = self.capacity
+            return
+        first = min(k, self.capacity - self.head)
+        self.data[self.head:self.head + first] = block[:first]
+        if first < k:
+            self.data[:k - first] = block[first:]
+        self.head = (self.head + k) % self.capacity
+        self.size = min(self.size + k, self.capacity)
+
+    def append(self, row):
+        self.extend(np.asarray(row, dtype=self.data.dtype)[None])
+
+    def view(self, last=None):
+        """
+        Últimas `last` linhas (todas por padrão) em ordem cronológica. É uma view
+        sem cópia quando a região não dá a volta no array, senão uma cópia.
+        """
+        n = self.size if last is None else min(last, self.size)
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n]
+        return np.concatenate((self.data[start:], self.data[:start + n - self.capacity]))
+
+    def column(self, name, last=None):
+        return self.view(last)[:, self._col[name]]
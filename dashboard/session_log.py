@@ -0,0 +1,119 @@
+"""
+Log da sessão do dashboard em SQLite (append-only, em disco).
+
+Substitui a lista full_session_data (um dict com str(ax) etc. por evento) e o
+to_csv() refeito a cada rerun. Cada evento vira uma linha em `eventos` e suas
+amostras vão para `amostras` em colunas numéricas (t, ax..gz), gravadas em
+transações agrupadas pela thread de ingestão. "NOVA SESSÃO" só abre um novo id
+de sessão; os dados anteriores continuam no arquivo.
+
+O CSV só é gerado quando o usuário pede (export_csv), lendo o banco em blocos
+por uma conexão própria, sem montar a sessão inteira em memória.
+"""
+
+import csv
+import sqlite3
+import time
+
+EXPORT_COLUMNS = ['session', 'device_id', 'timestamp_device', 'horario_chegada', 'pico_acc',
+                  'predicao_ia', 't', 'ax', 'ay', 'az', 'gx', 'gy', 'gz']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY,
+    session INTEGER NOT NULL,
+    device_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    horario_chegada TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    pico_acc REAL,
+    predicao_ia TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_eventos_sessao ON eventos (session, id);
+CREATE TABLE IF NOT EXISTS amostras (
+    evento_id INTEGER NOT NULL,
+    t REAL, ax REAL, ay REAL, az REAL, gx REAL, gy REAL, gz REAL
+);
+CREATE INDEX IF NOT EXISTS idx_amostras_evento ON amostras (evento_id);
+"""
+
+
+class SessionLog:
+    """
+    Escrita por uma única thread (a de ingestão). commit_every / commit_interval
+    limitam quantos eventos ficam na transação aberta; flush() força o commit.
+    """
+
+    def __init__(self, path, commit_every=200, commit_interval=1.0):
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.session = (self.conn.execute("SELECT MAX(session) FROM eventos").fetchone()[0] or 0) + 1
+        self.rows = 0                      # eventos da sessão atual
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def append_event(self, device_id, ts, horario_chegada, samples):
+        """Grava o evento e suas amostras (n, 7); devolve o id do evento."""
+        pico = float(samples[:, 1].max()) if len(samples) else 0.0
+        cur = self.conn.execute(
+            "INSERT INTO eventos (session, device_id, ts, horario_chegada, n, pico_acc, predicao_ia) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.session, device_id, int(ts), horario_chegada, len(samples), pico, "Processando..."))
+        event_id = cur.lastrowid
+        self.conn.executemany("INSERT INTO amostras VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              ((event_id, *row) for row in samples.tolist()))
+        self.rows += 1
+        self._mark()
+        return event_id
+
+    def set_prediction(self, event_id, label):
+        self.conn.execute("UPDATE eventos SET predicao_ia = ? WHERE id = ?", (label, event_id))
+        self._mark()
+
+    def _mark(self):
+        self._pending += 1
+        if self._pending >= self.commit_every or time.monotonic() - self._last_commit >= self.commit_interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.conn.commit()
+            self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def new_session(self):
+        self.flush()
+        self.session += 1
+        self.rows = 0
+
+    def export_csv(self, out, session=None, chunk=5000):
+        """
+        Escreve a sessão (atual por padrão) em `out` (arquivo texto), uma linha
+        por amostra. Usa outra conexão: pode rodar junto com a ingestão.
+        """
+        session = self.session if session is None else session
+        conn = sqlite3.connect(self.path)
+        try:
+            writer = csv.writer(out)
+            writer.writerow(EXPORT_COLUMNS)
+            cur = conn.execute(
+                "SELECT e.session, e.device_id, e.ts, e.horario_chegada, e.pico_acc, e.predicao_ia, "
+                "a.t, a.ax, a.ay, a.az, a.gx, a.gy, a.gz "
+                "FROM eventos e JOIN amostras a ON a.evento_id = e.id "
+                "WHERE e.session = ? ORDER BY e.id, a.rowid", (session,))
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                writer.writerows(rows)
+        finally:
+            conn.close()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -20,6 +20,20 @@
 #define MAX_SAMPLES 200
 #define JSON_BUFFER_SIZE 2500
 
+// --- FORMATO DO PAYLOAD DE EVENTO ---
+// Binário v1: cabeçalho fixo + colunas int16 little-endian (~740 bytes com 49 amostras,
+// contra ~2,1 KB do JSON). Layout documentado em backend_lambda/event_codec.py.
+// O padrão continua JSON: o binário só funciona depois que a IoT Rule do tópico
+// de eventos passar a repassar o corpo como 'payload_b64' (ver lambda_function.py):
+//   SELECT encode(*, 'base64') AS payload_b64, topic(2) AS dev_id FROM 'veiculos/+/eventos'
+#define PAYLOAD_FORMAT_JSON    0
+#define PAYLOAD_FORMAT_BINARY  1
+#define EVENT_PAYLOAD_FORMAT   PAYLOAD_FORMAT_JSON
+#define BIN_PAYLOAD_VERSION     1
+#define BIN_PAYLOAD_HEADER_SIZE 28
+#define BIN_ACC_LSB             100   // LSB por m/s² (resolução 0,01, igual ao JSON)
+#define BIN_GYRO_LSB            100   // LSB por °/s
+
 // --- DEFAULTS
 #define DEFAULT_PRE_TRIGGER_SAMPLES  24
 #define DEFAULT_POST_TRIGGER_SAMPLES 25
@@ -82,6 +96,7 @@ void Modem_UART_Init(void);
 void Modem_RX_Callback(void);
 bool SIMCOM_Init_Sequence(void);
 bool SIMCOM_Publish_Event(const char* json_payload);
+bool SIMCOM_Publish_Payload(const uint8_t* payload, uint16_t len);
 
 // Flash
 void Save_Config_To_Flash(void);
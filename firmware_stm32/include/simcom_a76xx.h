@@ -16,6 +16,8 @@ void Modem_RX_Callback(void);
 
 bool SIMCOM_Publish_Event(const char* json_payload);
 
+bool SIMCOM_Publish_Payload(const uint8_t* payload, uint16_t len);
+
 bool SIMCOM_Send_SMS(const char* phone_number, const char* message);
 
 bool SIMCOM_Get_Location(float* latitude, float* longitude);
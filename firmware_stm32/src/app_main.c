@@ -76,6 +76,69 @@ void Build_JSON(void) {
     strcat(g_json_payload, "]}");
 }
 
+// Amostra i do evento (pré-gatilho em ordem cronológica, depois pós-gatilho)
+static SensorSample* Event_Sample(uint32_t i) {
+    if (i < g_config.pre_trigger_samples)
+        return &pre_trigger_buffer[(pre_trigger_index + i) % g_config.pre_trigger_samples];
+    return &post_trigger_buffer[i - g_config.pre_trigger_samples];
+}
+
+static int16_t Quantize(float v, float lsb) {
+    float q = v * lsb;
+    q += (q >= 0.0f) ? 0.5f : -0.5f;
+    if (q > 32767.0f) q = 32767.0f;
+    else if (q < -32768.0f) q = -32768.0f;
+    return (int16_t)q;
+}
+
+// Escrita little-endian sem depender de alinhamento (Cortex-M3 também é LE)
+static uint8_t* Put_U16(uint8_t* p, uint16_t v) { p[0] = v & 0xFF; p[1] = v >> 8; return p + 2; }
+static uint8_t* Put_U32(uint8_t* p, uint32_t v) { p = Put_U16(p, v & 0xFFFF); return Put_U16(p, v >> 16); }
+static uint8_t* Put_F32(uint8_t* p, float f) { uint32_t v; memcpy(&v, &f, 4); return Put_U32(p, v); }
+
+/*
+ * Payload binário v1 em g_json_payload. Retorna o tamanho em bytes
+ * (0 se não couber no buffer). Layout em backend_lambda/event_codec.py.
+ */
+uint16_t Build_Binary_Payload(void) {
+    uint8_t *buf = (uint8_t*)g_json_payload, *p = buf;
+    uint16_t n = g_config.pre_trigger_samples + g_config.post_trigger_samples;
+    uint8_t dev_len = (uint8_t)strlen(DEVICE_ID);
+    uint16_t dev_padded = (dev_len + 1) & ~1u;
+    uint32_t total = BIN_PAYLOAD_HEADER_SIZE + dev_padded + 7u * 2u * n;
+    if (n == 0 || total > JSON_BUFFER_SIZE) return 0;
+
+    // Cabeçalho
+    *p++ = 'T'; *p++ = 'B'; *p++ = BIN_PAYLOAD_VERSION; *p++ = 0;
+    p = Put_U16(p, n);
+    *p++ = dev_len; *p++ = 0;
+    p = Put_U32(p, trigger_timestamp);
+    p = Put_U32(p, Event_Sample(0)->timestamp_ms);
+    p = Put_F32(p, g_config.event_threshold_x);
+    p = Put_F32(p, g_config.event_threshold_y);
+    p = Put_U16(p, BIN_ACC_LSB);
+    p = Put_U16(p, BIN_GYRO_LSB);
+    memset(p, 0, dev_padded); memcpy(p, DEVICE_ID, dev_len); p += dev_padded;
+
+    // Coluna de tempo: delta (ms) para a amostra anterior
+    uint32_t prev = Event_Sample(0)->timestamp_ms;
+    for (uint32_t i = 0; i < n; i++) {
+        uint32_t t = Event_Sample(i)->timestamp_ms, dt = t - prev;
+        p = Put_U16(p, dt > 0xFFFF ? 0xFFFF : (uint16_t)dt);
+        prev = t;
+    }
+    // Colunas ax, ay, az, gx, gy, gz
+    for (int k = 0; k < 6; k++) {
+        float lsb = (k < 3) ? BIN_ACC_LSB : BIN_GYRO_LSB;
+        for (uint32_t i = 0; i < n; i++) {
+            SensorSample *s = Event_Sample(i);
+            float v = (k==0)?s->ax : (k==1)?s->ay : (k==2)?s->az : (k==3)?s->gx : (k==4)?s->gy : s->gz;
+            p = Put_U16(p, (uint16_t)Quantize(v, lsb));
+        }
+    }
+    return (uint16_t)(p - buf);
+}
+
 void Normal_Mode(void) {
     // 1. Leitura
     MPU6050_Read_All();
@@ -124,9 +187,18 @@ void Normal_Mode(void) {
             break;
 
         case STATE_PROCESSING:
+#if EVENT_PAYLOAD_FORMAT == PAYLOAD_FORMAT_BINARY
+            HAL_UART_Transmit(&huart2, (uint8_t*)"[CORE] Gerando Payload e Enviando...\r\n", 38, HAL_MAX_DELAY);
+            {
+                uint16_t len = Build_Binary_Payload();
+                if (len > 0) SIMCOM_Publish_Payload((const uint8_t*)g_json_payload, len);
+                else HAL_UART_Transmit(&huart2, (uint8_t*)ANSI_COLOR_RED "[ERRO] Payload maior que o buffer.\r\n" ANSI_COLOR_RESET, 45, HAL_MAX_DELAY);
+            }
+#else
             HAL_UART_Transmit(&huart2, (uint8_t*)"[CORE] Gerando JSON e Enviando...\r\n", 35, HAL_MAX_DELAY);
             Build_JSON();
             SIMCOM_Publish_Event(g_json_payload);
+#endif
             
             current_state = STATE_MONITORING;
             // Atualiza o timestamp novamente ao terminar para não disparar outro KA imediatamente
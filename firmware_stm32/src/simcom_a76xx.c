@@ -64,6 +64,11 @@ bool SIMCOM_Init_Sequence(void) {
 }
 
 bool SIMCOM_Publish_Event(const char* json_payload) {
+    return SIMCOM_Publish_Payload((const uint8_t*)json_payload, (uint16_t)strlen(json_payload));
+}
+
+// Publica bytes arbitrários (JSON ou payload binário, que pode conter '\0')
+bool SIMCOM_Publish_Payload(const uint8_t* payload, uint16_t len) {
     char cmd[256];
     Send_AT_Command("AT+CMQTTSTOP\r\n", "OK", 2000); HAL_Delay(500);
     if(!Send_AT_Command("AT+CMQTTSTART\r\n", "+CMQTTSTART: 0", 10000)) return false;
@@ -83,8 +88,12 @@ bool SIMCOM_Publish_Event(const char* json_payload) {
     sprintf(cmd, "AT+CMQTTTOPIC=0,%d\r\n", 35);
     if(Send_AT_Command(cmd, ">", 2000)) Send_AT_Command("veiculos/STM32_VERSAO_FINAL/eventos", "OK", 2000);
 
-    sprintf(cmd, "AT+CMQTTPAYLOAD=0,%d\r\n", (int)strlen(json_payload));
-    if(Send_AT_Command(cmd, ">", 2000)) Send_AT_Command(json_payload, "OK", 5000);
+    sprintf(cmd, "AT+CMQTTPAYLOAD=0,%d\r\n", (int)len);
+    if(Send_AT_Command(cmd, ">", 2000)) {
+        // Envio direto pela UART: Send_AT_Command usa strlen e cortaria o binário no primeiro zero
+        HAL_UART_Transmit(&huart1, (uint8_t*)payload, len, HAL_MAX_DELAY);
+        Send_AT_Command("", "OK", 5000);
+    }
 
     bool res = Send_AT_Command("AT+CMQTTPUB=0,1,60\r\n", "+CMQTTPUB: 0,0", 15000);
     Send_AT_Command("AT+CMQTTDISC=0,60\r\n", "OK", 5000);
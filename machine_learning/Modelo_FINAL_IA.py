@@ -8,7 +8,7 @@ Script de Treinamento FINAL (XGBoost Simples Otimizado)
 5. Treina o modelo final com os parâmetros campeões.
 6. Salva os 3 artefatos finais para produção/implantação.
 
-Requer: pip install optuna
+Requer: pip install optuna pyarrow
 """
 
 import os
@@ -17,19 +17,35 @@ import json
 import warnings
 import numpy as np
 import pandas as pd
-from scipy import signal, stats
+from pandas.tseries.api import guess_datetime_format
 from tqdm import tqdm
 import joblib
 import sys
 from time import time
 import optuna # <-- NOVO
+import hashlib
+import multiprocessing
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+# Extração de features compartilhada com a Lambda (backend_lambda/feature_engineering.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend_lambda'))
+from feature_engineering import (FEATURE_COLUMNS, RAW_CHANNELS, derive_channels,
+                                 extract_features_batch, sliding_window_batch)
+from gravity import remove_gravity
+from out_of_core import (DEFAULT_BLOCK_ROWS, FeatureStore, MemoryMonitor, StoreIter, balanced_class_weights,
+                         external_dmatrix, fit_scaler, native_params, stratified_sample)
 
 # Modelos
+import xgboost as xgb
 from xgboost import XGBClassifier
 
 # Pré-processamento e Métricas
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.model_selection import StratifiedKFold
 from sklearn.metrics import f1_score
 from imblearn.over_sampling import SMOTE
 
@@ -44,12 +60,41 @@ RANDOM_STATE = 42
 N_OPTUNA_TRIALS = 50
 # Validação cruzada DENTRO de cada tentativa do Optuna
 N_OPTUNA_CV_SPLITS = 3 
+# Árvores sem melhora no fold de validação antes de parar; tentativas iniciais nunca podadas
+EARLY_STOPPING_ROUNDS = 50
+N_PRUNER_STARTUP_TRIALS = 5
+# Busca paralela: processos compartilhando o estudo (arquivo de journal ou URL do
+# SQLAlchemy, ver OPTUNA_STORAGE mais abaixo)
+OPTUNA_WORKERS = 1
+OPTUNA_WORK_DIR = ".optuna_data"
+
+# Ingestão paralela (um CSV por processo) e cache de features por arquivo
+N_WORKERS = os.cpu_count() or 1
+FEATURE_CACHE_DIR = ".feature_cache"
+# Incrementar quando o pipeline de features mudar (invalida o cache antigo)
+FEATURE_CACHE_VERSION = 2
+
+# Eixos do array (n, 6) usado na normalização/reamostragem e linhas usadas para
+# detectar o formato da coluna de tempo
+AXES = RAW_CHANNELS
+TIME_SAMPLE_ROWS = 64
+
+# Classes mantidas no treinamento
+CLASSES_DESEJADAS = ['normal', 'aggressive', 'slow']
+
+# Modo fora da memória (--out_of_core): matriz de features em disco, lida em blocos;
+# o Optuna/SMOTE usam uma amostra estratificada de até TUNE_ROWS linhas
+OUT_OF_CORE_DIR = ".features_ooc"
+TUNE_ROWS = 200_000
 
 # Nomes dos arquivos de saída FINAIS
 SCALER_PATH = "scaler_final.joblib"
 LABEL_ENCODER_PATH = "label_encoder_final.joblib"
 MODEL_PATH = "xgboost_final.joblib"
 FEATURE_COLUMNS_PATH = "feature_columns_final.json"
+BOOSTER_PATH = "xgboost_final.ubj"
+# Journal do estudo do Optuna (retomável), gravado junto dos arquivos de saída
+OPTUNA_STORAGE = os.path.join(os.path.dirname(os.path.abspath(MODEL_PATH)), "optuna_study.log")
 
 # --- Funções de Carregamento e Normalização (Helpers) ---
 # (Colapsei as funções auxiliares aqui para economizar espaço)
@@ -86,150 +131,253 @@ def detect_and_normalize_df(df, fpath):
         return None
     for axis in['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z']:colmap[axis]=find_original_col(axis)
     colmap['label']=find_original_col('label');colmap['time']=find_original_col('time');colmap['session']=find_original_col('session')
-    norm=pd.DataFrame()
-    if colmap['time'] is not None:
-        raw=df[colmap['time']]
-        try:
-            tdt=pd.to_datetime(raw,errors='coerce')
-            if tdt.notna().sum()>5 and tdt.isna().sum()<(len(tdt)/2):
-                norm['time_seconds']=(tdt.astype('int64')/1e9).values.astype(float)
-            else:
-                raise ValueError("Não é datetime, tentar numérico")
-        except Exception:
-            try:
-                tnum=pd.to_numeric(raw,errors='coerce')
-                if tnum.notna().sum()==0 or(tnum.nunique()<2):
-                    raise ValueError("Time column is constant or non-numeric, using fake time")
-                tmax=np.nanmax(tnum);t=tnum.astype(float)
-                if tmax>1e18:t=t/1e9
-                elif tmax>1e15:t=t/1e6
-                elif tmax>1e12:t=t/1e3
-                norm['time_seconds']=t
-            except Exception:
-                norm['time_seconds']=np.arange(len(df)).astype(float)/TARGET_FS
-    else:
-        norm['time_seconds']=np.arange(len(df)).astype(float)/TARGET_FS
-    if 'dataset1_merged' not in fname and'time_seconds'in norm.columns:
-        norm['time_seconds']=norm['time_seconds']-norm['time_seconds'].min()
-    for axis in['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z']:
+    n=len(df)
+    t=_time_to_seconds(df[colmap['time']],n) if colmap['time'] is not None else np.arange(n,dtype=float)/TARGET_FS
+    if 'dataset1_merged' not in fname:
+        t=t-np.nanmin(t)
+    values=np.empty((n,len(AXES)),dtype=np.float64)
+    for i,axis in enumerate(AXES):
         col=colmap.get(axis)
         if col is not None and col in df.columns:
             try:
-                norm[axis]=pd.to_numeric(df[col],errors='coerce')
-                if norm[axis].isna().all()and df[col].dtype=='object':
-                    norm[axis]=pd.to_numeric(df[col].str.replace(',','.'),errors='coerce')
-            except Exception:norm[axis]=np.nan
-        else:
-            if'gyro'in axis:norm[axis]=0.0
-            else:norm[axis]=np.nan
-    if colmap.get('label')is not None and colmap['label']in df.columns:norm['label']=df[colmap['label']].astype(str).str.lower()
-    else:norm['label']='unknown'
-    if colmap.get('session')is not None and colmap['session']in df.columns:norm['session']=df[colmap['session']].astype(str)
-    else:norm['session']=os.path.basename(fpath)
-    norm=norm.sort_values('time_seconds',na_position='last').reset_index(drop=True)
-    norm=norm.dropna(subset=['acc_x','acc_y','acc_z'])
-    return norm
-def resample_to_fs(df,target_fs=TARGET_FS):
-    t0=df['time_seconds'].values
-    if len(t0)<2:return pd.DataFrame()
-    start,end=t0[0],t0[-1]
-    new_t=np.arange(start,end,1.0/target_fs)
-    if len(new_t)<2:return pd.DataFrame()
-    res=pd.DataFrame({'time_seconds':new_t})
-    for axis in['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z']:
-        if axis in df.columns and pd.to_numeric(df[axis],errors='coerce').notna().any():
-            y=df[axis].values
-            res[axis]=np.interp(new_t,t0,y)
+                v=pd.to_numeric(df[col],errors='coerce')
+                if v.isna().all() and not pd.api.types.is_numeric_dtype(df[col]):
+                    v=pd.to_numeric(df[col].astype(str).str.replace(',','.'),errors='coerce')
+                values[:,i]=v.to_numpy(dtype=np.float64,na_value=np.nan)
+            except Exception:values[:,i]=np.nan
         else:
-            res[axis]=0.0
-    idx=np.searchsorted(t0,new_t,side='right')-1
+            values[:,i]=0.0 if 'gyro' in axis else np.nan
+    # Rótulos e sessões viram códigos inteiros uma única vez por arquivo (rótulos em
+    # ordem alfabética: empate na maioria da janela -> menor rótulo, como antes)
+    if colmap.get('label') is not None and colmap['label'] in df.columns:
+        label_codes,labels=pd.factorize(df[colmap['label']].astype(str).str.lower(),sort=True)
+    else:
+        label_codes,labels=np.zeros(n,dtype=np.intp),np.array(['unknown'])
+    if colmap.get('session') is not None and colmap['session'] in df.columns:
+        session_codes,sessions=pd.factorize(df[colmap['session']].astype(str))
+    else:
+        session_codes,sessions=np.zeros(n,dtype=np.intp),np.array([os.path.basename(fpath)])
+    keep=np.isfinite(t)&~np.isnan(values[:,:3]).any(axis=1)
+    if not keep.all():
+        t,values,label_codes,session_codes=t[keep],values[keep],label_codes[keep],session_codes[keep]
+    return {'t':t,'values':values,'label_codes':np.asarray(label_codes),'labels':np.asarray(labels,dtype=str),
+            'session_codes':np.asarray(session_codes),'sessions':np.asarray(sessions)}
+def _time_to_seconds(raw,n):
+    """
+    Coluna de tempo -> segundos (float64). O formato é detectado em uma amostra do
+    início (TIME_SAMPLE_ROWS valores): numérico (s/ms/us/ns pela magnitude) ou
+    data/hora em texto (formato inferido da amostra e usado na coluna inteira).
+    Constante ou irreconhecível -> tempo sintético a TARGET_FS.
+    """
+    fake=np.arange(n,dtype=float)/TARGET_FS
+    sample=raw.iloc[:TIME_SAMPLE_ROWS].dropna()
+    if len(sample)==0:
+        return fake
+    if pd.api.types.is_numeric_dtype(raw) or pd.to_numeric(sample,errors='coerce').notna().mean()>0.5:
+        t=pd.to_numeric(raw,errors='coerce').to_numpy(dtype=np.float64,na_value=np.nan)
+        finite=t[np.isfinite(t)]
+        if len(finite)==0 or finite.min()==finite.max():
+            return fake
+        tmax=finite.max()
+        if tmax>1e18:t=t/1e9
+        elif tmax>1e15:t=t/1e6
+        elif tmax>1e12:t=t/1e3
+        return t
+    fmt=guess_datetime_format(str(sample.iloc[0]))
+    try:
+        tdt=pd.to_datetime(raw,errors='coerce',format=fmt)
+    except (ValueError,TypeError):
+        tdt=pd.to_datetime(raw,errors='coerce')
+    if not (tdt.notna().sum()>5 and tdt.isna().sum()<(n/2)):
+        return fake
+    if tdt.dt.tz is not None:
+        tdt=tdt.dt.tz_convert('UTC').dt.tz_localize(None)
+    return (tdt-pd.Timestamp(0)).dt.total_seconds().to_numpy(dtype=np.float64,na_value=np.nan)
+def session_slices(nd):
+    """
+    Índices de cada sessão, na ordem do primeiro instante de cada uma (a mesma do
+    groupby sobre os dados ordenados por tempo). Uma sessão só -> slice sem cópia.
+    """
+    codes,t=nd['session_codes'],nd['t']
+    n_sessions=len(nd['sessions'])
+    if n_sessions<=1:
+        if len(t):yield slice(None)
+        return
+    order=np.argsort(codes,kind='stable')
+    bounds=np.searchsorted(codes[order],np.arange(n_sessions+1))
+    first=np.full(n_sessions,np.inf)
+    np.minimum.at(first,codes,t)
+    for s in np.argsort(first,kind='stable'):
+        if bounds[s+1]>bounds[s]:
+            yield order[bounds[s]:bounds[s+1]]
+def monotonic_order(t):
+    """
+    Índices que deixam t estritamente crescente, ou None se já está (o caso comum:
+    nenhuma ordenação nem cópia). Só ordena (estável) se houver amostra fora de
+    ordem; em timestamps repetidos fica a primeira amostra.
+    """
+    d=np.diff(t)
+    if (d>0).all():return None
+    order=np.argsort(t,kind='stable') if (d<0).any() else np.arange(len(t))
+    ts=t[order]
+    keep=np.empty(len(ts),dtype=bool);keep[0]=True
+    np.greater(ts[1:],ts[:-1],out=keep[1:])
+    return order[keep]
+def resample_to_fs(t,values,label_codes,target_fs=TARGET_FS):
+    """
+    Reamostra (n, 6) para target_fs (t estritamente crescente). Todos os eixos são
+    interpolados de uma vez, com a mesma conta do np.interp; o rótulo é o da última
+    amostra <= cada instante. Retorna (new_t, (m, 6), rótulos (m,)) ou None.
+    Eixos sem nenhum valor viram 0.
+    """
+    if len(t)<2:return None
+    new_t=np.arange(t[0],t[-1],1.0/target_fs)
+    if len(new_t)<2:return None
+    idx=np.searchsorted(t,new_t,side='right')-1
     idx[idx<0]=0
-    res['label']=df['label'].values[idx]
-    res['session']=df['session'].values[idx]
-    return res
-def remove_gravity(df,fs=TARGET_FS,cutoff_hz=GRAVITY_CUTOFF_HZ):
-    b,a=signal.butter(2,cutoff_hz/(0.5*fs),btype='low',analog=False)
-    df_out=df.copy()
-    for axis in['acc_x','acc_y','acc_z']:
-        if axis not in df_out.columns:
-            continue
-        try:
-            if len(df[axis].values)>10:
-                g=signal.filtfilt(b,a,df[axis].values)
-                df_out[axis]=df[axis].values-g
-            else:
-                df_out[axis]=df[axis].values-np.mean(df[axis].values)
-        except Exception as e:
-            df_out[axis]=df[axis].values-np.mean(df[axis].values)
-    return df_out
-def sliding_windows(df,win_size=WINDOW_SIZE,step=WINDOW_STEP,label_by='majority'):
-    X,Y,S=[],[],[]
-    n=len(df)
-    dt=1.0/TARGET_FS
-    for col in['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z']:
-        if col not in df.columns:
-            df[col]=0.0
-    df['acc_vm']=np.sqrt(df['acc_x']**2+df['acc_y']**2+df['acc_z']**2)
-    df['gyro_vm']=np.sqrt(df['gyro_x']**2+df['gyro_y']**2+df['gyro_z']**2)
-    df['jerk_x']=np.concatenate(([0.0],np.diff(df['acc_x'])/dt))
-    df['jerk_y']=np.concatenate(([0.0],np.diff(df['acc_y'])/dt))
-    df['jerk_z']=np.concatenate(([0.0],np.diff(df['acc_z'])/dt))
-    df['jerk_vm']=np.sqrt(df['jerk_x']**2+df['jerk_y']**2+df['jerk_z']**2)
-    feature_channels=['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z','acc_vm','gyro_vm','jerk_x','jerk_y','jerk_z','jerk_vm']
-    for start in range(0,n-win_size+1,step):
-        w=df.iloc[start:start+win_size]
-        arr=w[feature_channels].values
-        try:
-            mode_vals=pd.Series(w['label'].values).mode()
-            if len(mode_vals)>0:lab=str(mode_vals.iloc[0])
-            else:lab=str(w['label'].values[win_size//2])
-        except Exception:
-            lab=str(w['label'].values[win_size//2])
-        X.append(arr);Y.append(lab);S.append(w['session'].values[0])
-    return np.array(X),np.array(Y),np.array(S)
-def extract_features_window(arr,fs=TARGET_FS):
-    feats={}
-    axes=['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z','acc_vm','gyro_vm','jerk_x','jerk_y','jerk_z','jerk_vm']
-    win_size=arr.shape[0]
-    for i,ax in enumerate(axes):
-        v=arr[:,i]
-        feats[f'{ax}_mean']=np.mean(v);feats[f'{ax}_std']=np.std(v)
-        feats[f'{ax}_var']=np.var(v);feats[f'{ax}_min']=np.min(v)
-        feats[f'{ax}_max']=np.max(v);feats[f'{ax}_median']=np.median(v)
-        feats[f'{ax}_rms']=np.sqrt(np.mean(v**2));feats[f'{ax}_energy']=np.sum(v**2)
-        feats[f'{ax}_iqr']=np.subtract(*np.percentile(v,[75,25]))
-        feats[f'{ax}_skew']=stats.skew(v);feats[f'{ax}_kurtosis']=stats.kurtosis(v)
-        if len(v)>1:zc=((v[:-1]*v[1:])<0).sum()/(len(v)-1)
-        else:zc=0.0
-        feats[f'{ax}_zcross_rate']=zc
-        try:
-            fft=np.fft.rfft(v);mags=np.abs(fft);freqs=np.fft.rfftfreq(len(v),d=1.0/fs)
-            if len(mags)>1:
-                idx=np.argmax(mags[1:])+1
-                feats[f'{ax}_dom_freq']=freqs[idx];feats[f'{ax}_dom_mag']=mags[idx]
-            else:
-                feats[f'{ax}_dom_freq']=0.0;feats[f'{ax}_dom_mag']=0.0
-        except Exception:
-            feats[f'{ax}_dom_freq']=0.0;feats[f'{ax}_dom_mag']=0.0
-    return feats
+    j=np.minimum(idx,len(t)-2)
+    x0=t[j]
+    slope=(values[j+1]-values[j])/(t[j+1]-x0)[:,None]
+    res=slope*(new_t-x0)[:,None]+values[j]
+    exact=new_t==x0
+    if exact.any():res[exact]=values[j[exact]]
+    empty=np.isnan(values).all(axis=0)
+    if empty.any():res[:,empty]=0.0
+    return new_t,res,label_codes[idx]
+def majority_labels(codes,n_classes,win_size=WINDOW_SIZE,step=WINDOW_STEP):
+    # Contagem por classe via soma acumulada: counts[j]=cs[start+win]-cs[start]
+    # Empate -> menor código (factorize ordenado), igual a pd.Series.mode().iloc[0]
+    n=len(codes)
+    starts=np.arange(0,n-win_size+1,step)
+    onehot=np.zeros((n+1,n_classes),dtype=np.int32)
+    onehot[np.arange(1,n+1),codes]=1
+    cs=np.cumsum(onehot,axis=0,out=onehot)
+    counts=cs[starts+win_size]-cs[starts]
+    return np.argmax(counts,axis=1),starts
+def sliding_windows(values,label_codes,labels,win_size=WINDOW_SIZE,step=WINDOW_STEP):
+    # Um único array contíguo (n,12) por sessão; as janelas são views com strides
+    arr=derive_channels(np.ascontiguousarray(values,dtype=np.float64),fs=TARGET_FS)
+    X=sliding_window_batch(arr,win_size,step)
+    if len(X)==0:
+        return X,np.array([],dtype=str)
+    lab_codes,_=majority_labels(label_codes,len(labels),win_size,step)
+    return X,np.asarray(labels,dtype=str)[lab_codes]
 def extract_features(X_windows,fs=TARGET_FS):
-    feat_list=[]
-    for w in X_windows:
-        feat_list.append(extract_features_window(w,fs=fs))
-    return pd.DataFrame(feat_list)
+    feats=extract_features_batch(X_windows,fs=fs)
+    return pd.DataFrame(feats,columns=FEATURE_COLUMNS)
 
 # --- Função de Carregamento Principal ---
 
-def load_and_extract_features(csv_dir, target_fs=TARGET_FS):
-    all_features_list = []
-    all_labels_list = []
+def file_cache_key(fpath, target_fs=TARGET_FS):
+    """
+    Chave do cache: hash do conteúdo do CSV + parâmetros de pré-processamento.
+    Qualquer mudança no arquivo ou em TARGET_FS/WINDOW_SIZE/WINDOW_STEP/GRAVITY_CUTOFF_HZ
+    invalida a entrada.
+    """
+    h = hashlib.sha256()
+    with open(fpath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    params = f"v{FEATURE_CACHE_VERSION}|fs={target_fs}|win={WINDOW_SIZE}|step={WINDOW_STEP}|g={GRAVITY_CUTOFF_HZ}"
+    h.update(params.encode())
+    return h.hexdigest()
+
+def process_csv_file(fpath, target_fs=TARGET_FS, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Processa um CSV completo (leitura, normalização, reamostragem, janelas e features).
+    Executado em um processo do pool; retorna (features, labels) ou None.
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"{file_cache_key(fpath, target_fs)}.parquet")
+        if os.path.exists(cache_path):
+            cached = pd.read_parquet(cache_path)
+            return cached[FEATURE_COLUMNS], cached['label'].values.astype(str)
+
+    try:
+        try: 
+            df = pd.read_csv(fpath)
+        except (pd.errors.ParserError, UnicodeDecodeError): 
+            df = pd.read_csv(fpath, sep=';', encoding='latin1')
+    except Exception as e:
+        print(f"   [AVISO] Falha ao ler {fpath}: {e}")
+        return None
     
-    print("\n[INFO] Carregando e processando arquivos CSV...")
-    csv_paths = glob.glob(os.path.join(csv_dir, "*.csv"))
+    if df.empty: 
+        return None
+        
+    nd = detect_and_normalize_df(df, fpath)
+    del df
+    if len(nd['t']) < 2: 
+        return None
+
+    features_list = []
+    labels_list = []
+    # Sessões como índices sobre os arrays (n, 6) do arquivo; ordenação só se preciso
+    for idx in session_slices(nd):
+        t, values, label_codes = nd['t'][idx], nd['values'][idx], nd['label_codes'][idx]
+        order = monotonic_order(t)
+        if order is not None:
+            t, values, label_codes = t[order], values[order], label_codes[order]
+        if len(t) < 2: continue
+        
+        resampled = resample_to_fs(t, values, label_codes, target_fs=target_fs)
+        if resampled is None or len(resampled[0]) < WINDOW_SIZE: continue
+        _, values, label_codes = resampled
+            
+        # Filtro projetado uma vez por (fs, cutoff); acc_xyz filtrados em uma chamada, no próprio array
+        values[:, :3] = remove_gravity(values[:, :3], target_fs, cutoff_hz=GRAVITY_CUTOFF_HZ)
+        Xw, Yw = sliding_windows(values, label_codes, nd['labels'], win_size=WINDOW_SIZE, step=WINDOW_STEP)
+        if len(Xw) == 0: continue
+            
+        features_list.append(extract_features(Xw, fs=target_fs))
+        labels_list.append(Yw)
+
+    if features_list:
+        feats = pd.concat(features_list, ignore_index=True)
+        labels = np.concatenate(labels_list)
+    else:
+        feats = pd.DataFrame(np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32), columns=FEATURE_COLUMNS)
+        labels = np.array([], dtype=str)
+
+    if cache_path:
+        # Escrita atômica: outro processo nunca lê um parquet pela metade
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        feats.assign(label=labels).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+
+    if len(labels) == 0:
+        return None
+    return feats, labels
+
+def _map_ordered(worker, paths, n_workers):
+    """
+    Como pool.map (resultados na ordem dos arquivos), mas com no máximo
+    2 * n_workers arquivos em andamento: resultados prontos não se acumulam
+    na memória enquanto o consumidor grava os anteriores.
+    """
+    if not (n_workers and n_workers > 1 and len(paths) > 1):
+        for fpath in paths:
+            yield worker(fpath)
+        return
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(paths))) as pool:
+        todo = iter(paths)
+        pending = deque(pool.submit(worker, fpath) for fpath in islice(todo, 2 * n_workers))
+        while pending:
+            result = pending.popleft().result()
+            fpath = next(todo, None)
+            if fpath is not None:
+                pending.append(pool.submit(worker, fpath))
+            yield result
+
+def select_csv_paths(csv_dir):
+    csv_paths = sorted(glob.glob(os.path.join(csv_dir, "*.csv")))
     
     ignore_list = ['dados.csv', 'mobd_imu_labeled.csv', 'dataset1.csv']
     
-    for fpath in tqdm(csv_paths, desc="Arquivos CSV"):
+    selected_paths = []
+    for fpath in csv_paths:
         fname_lower = os.path.basename(fpath).lower()
         
         is_ignored = any(ignored in fname_lower for ignored in ignore_list)
@@ -237,71 +385,96 @@ def load_and_extract_features(csv_dir, target_fs=TARGET_FS):
         
         if is_ignored or (is_output_file and 'dataset1_merged.csv' not in fname_lower):
             continue
-                
-        try:
-            try: 
-                df = pd.read_csv(fpath)
-            except (pd.errors.ParserError, UnicodeDecodeError): 
-                df = pd.read_csv(fpath, sep=';', encoding='latin1')
-        except Exception as e:
-            print(f"   [AVISO] Falha ao ler {fpath}: {e}")
-            continue
-        
-        if df.empty: 
-            continue
-            
-        nd = detect_and_normalize_df(df, fpath)
-        if len(nd) < 2: 
-            continue
+        selected_paths.append(fpath)
+    return selected_paths
 
-        unique_sessions = nd['session'].unique()
+def iter_feature_blocks(csv_dir, target_fs=TARGET_FS, n_workers=N_WORKERS, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Gera (features, labels) arquivo a arquivo, na ordem dos CSVs, já filtrados
+    para CLASSES_DESEJADAS e sem NaN/inf. Nada é acumulado: quem consome decide
+    se concatena em memória (load_and_extract_features) ou grava em disco
+    (build_feature_store).
+    """
+    print("\n[INFO] Carregando e processando arquivos CSV...")
+    selected_paths = select_csv_paths(csv_dir)
 
-        for session_id in unique_sessions:
-            df_session = nd[nd['session'] == session_id].copy()
-            df_session = df_session.sort_values('time_seconds').reset_index(drop=True)
-            if len(df_session) < 2: continue
-            
-            rd = resample_to_fs(df_session, target_fs=target_fs)
-            if len(rd) < WINDOW_SIZE: continue
-                
-            rd = remove_gravity(rd, fs=target_fs, cutoff_hz=GRAVITY_CUTOFF_HZ)
-            Xw, Yw, Sw = sliding_windows(rd, win_size=WINDOW_SIZE, step=WINDOW_STEP, label_by='majority')
-            if len(Xw) == 0: continue
-                
-            feats = extract_features(Xw, fs=target_fs)
-            all_features_list.append(feats)
-            all_labels_list.append(Yw)
-            
-    if not all_features_list:
+    # Um arquivo por tarefa, resultados na ordem dos arquivos (determinístico)
+    worker = partial(process_csv_file, target_fs=target_fs, cache_dir=cache_dir)
+    n_total, n_kept = 0, 0
+    classes_orig, classes_kept = set(), set()
+    for result in tqdm(_map_ordered(worker, selected_paths, n_workers), total=len(selected_paths), desc="Arquivos CSV"):
+        if result is None: continue
+        feats, labels = result
+        n_total += len(labels)
+        classes_orig.update(np.unique(labels))
+        mask = np.isin(labels, CLASSES_DESEJADAS)
+        if not mask.any(): continue
+        feats = feats[mask].reset_index(drop=True)
+        labels = labels[mask]
+        feats = feats.fillna(0.0); feats = feats.replace([np.inf, -np.inf], 0.0)
+        n_kept += len(labels)
+        classes_kept.update(np.unique(labels))
+        yield feats, labels
+
+    if n_total == 0:
         raise RuntimeError("Nenhum dado processado. Verifique os CSVs.")
-        
-    X_full = pd.concat(all_features_list, ignore_index=True)
-    y_full = np.concatenate(all_labels_list)
 
-    print(f"\n[INFO] Amostras antes do filtro: {len(y_full)}")
-    print(f"[INFO] Classes originais: {np.unique(y_full)}")
-    classes_desejadas = ['normal', 'aggressive', 'slow']
-    y_series = pd.Series(y_full); mask = y_series.isin(classes_desejadas)
+    print(f"\n[INFO] Amostras antes do filtro: {n_total}")
+    print(f"[INFO] Classes originais: {np.array(sorted(classes_orig))}")
+    print(f"[INFO] Amostras retidas: {n_kept}")
+    print(f"[INFO] Classes retidas: {np.array(sorted(classes_kept))}")
     
-    X_full = X_full[mask].reset_index(drop=True)
-    y_full = y_full[mask]
-    
-    print(f"[INFO] Amostras retidas: {len(y_full)}")
-    print(f"[INFO] Classes retidas: {np.unique(y_full)}")
-    
-    if len(y_full) == 0:
+    if n_kept == 0:
         raise RuntimeError("Nenhuma amostra restou após filtrar.")
-    
-    X_full = X_full.fillna(0.0); X_full = X_full.replace([np.inf, -np.inf], 0.0)
-    
+
+def load_and_extract_features(csv_dir, target_fs=TARGET_FS, n_workers=N_WORKERS, cache_dir=FEATURE_CACHE_DIR):
+    all_features_list = []
+    all_labels_list = []
+    for feats, labels in iter_feature_blocks(csv_dir, target_fs=target_fs, n_workers=n_workers, cache_dir=cache_dir):
+        all_features_list.append(feats)
+        all_labels_list.append(labels)
+        
+    X_full = pd.concat(all_features_list, ignore_index=True)
+    y_full = np.concatenate(all_labels_list)
     return X_full, y_full
 
+def build_feature_store(csv_dir, store_dir, target_fs=TARGET_FS, n_workers=N_WORKERS, cache_dir=FEATURE_CACHE_DIR):
+    """Mesmas features de load_and_extract_features, gravadas em disco (float32) conforme chegam."""
+    store = FeatureStore.create(store_dir, FEATURE_COLUMNS)
+    try:
+        for feats, labels in iter_feature_blocks(csv_dir, target_fs=target_fs, n_workers=n_workers, cache_dir=cache_dir):
+            X = np.array(feats[FEATURE_COLUMNS], dtype=np.float32)
+            X[~np.isfinite(X)] = 0.0
+            store.append(X, labels)
+    finally:
+        store.close()
+    print(f"[INFO] Matriz de features em disco: {store.n_rows} x {len(store.columns)} float32 em {store_dir}")
+    return store
+
 # --- Função de Otimização (Optuna) ---
 
-def objective(trial, X_res, y_res):
+def build_cv_folds(X_res, y_res, n_threads=-1):
+    """
+    Matrizes dos folds da validação cruzada, montadas uma única vez e
+    reaproveitadas por todas as tentativas: cada fold tem um QuantileDMatrix
+    de treino (quantis do histograma calculados aqui) e o de validação com
+    os mesmos cortes (ref=treino). Mesmos folds do StratifiedKFold de antes.
+    """
+    skf = StratifiedKFold(n_splits=N_OPTUNA_CV_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+    folds = []
+    for train_idx, val_idx in skf.split(X_res, y_res):
+        dtrain = xgb.QuantileDMatrix(X_res[train_idx], label=y_res[train_idx], nthread=n_threads)
+        dval = xgb.QuantileDMatrix(X_res[val_idx], label=y_res[val_idx], ref=dtrain, nthread=n_threads)
+        folds.append((dtrain, dval, np.asarray(y_res[val_idx])))
+    return folds
+
+def objective(trial, folds, n_threads=-1):
     """
     Função 'objetivo' que o Optuna tentará maximizar.
-    Ela testa um conjunto de hiperparâmetros usando validação cruzada.
+    Ela testa um conjunto de hiperparâmetros usando validação cruzada sobre
+    as matrizes de build_cv_folds (xgb.train nativo, sem re-quantizar os
+    dados a cada tentativa). Os folds rodam em sequência (cada treino usa
+    n_threads núcleos) para a tentativa poder ser podada depois de qualquer fold.
     """
     
     # 1. Definição do espaço de busca de hiperparâmetros
@@ -318,38 +491,197 @@ def objective(trial, X_res, y_res):
         'reg_alpha': trial.suggest_float('reg_alpha', 0.0, 5.0),
         'reg_lambda': trial.suggest_float('reg_lambda', 0.0, 5.0),
         'random_state': RANDOM_STATE,
-        'n_jobs': -1
+        'n_jobs': n_threads
     }
+    # Mesmos parâmetros que o XGBClassifier passaria ao xgb.train (tree_method='hist')
+    params, num_rounds = native_params(param)
     
-    # 2. Instancia o modelo com os parâmetros da tentativa (trial)
-    model = XGBClassifier(**param, use_label_encoder=False)
+    # 2. Avalia o modelo usando validação cruzada (para um score robusto)
+    # Os folds vêm dos dados já balanceados (X_res, y_res)
+    scores = []
+    best_rounds = []
+    for fold, (dtrain, dval, y_val) in enumerate(folds):
+        # 3. Treina com early stopping no mlogloss do fold de validação
+        booster = xgb.train(params, dtrain, num_boost_round=num_rounds, evals=[(dval, 'val')],
+                            early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+        n_best = booster.best_iteration + 1
+        y_pred = booster.predict(dval, iteration_range=(0, n_best)).astype(np.int64)
+        scores.append(f1_score(y_val, y_pred, average='macro'))
+        best_rounds.append(n_best)
+        
+        # 4. Poda: média parcial comparada com a das outras tentativas no mesmo fold
+        trial.report(float(np.mean(scores)), fold)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
     
-    # 3. Avalia o modelo usando validação cruzada (para um score robusto)
-    # Usamos os dados já balanceados (X_res, y_res) para a busca
-    skf = StratifiedKFold(n_splits=N_OPTUNA_CV_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+    # Número de árvores efetivamente usado (early stopping) para o modelo final
+    trial.set_user_attr('n_estimators_es', int(round(np.mean(best_rounds))))
     
-    scores = cross_val_score(model, X_res, y_res, cv=skf, scoring='f1_macro', n_jobs=-1)
+    # 5. Retorna a média do F1-Macro
+    return float(np.mean(scores))
+
+def optuna_storage(storage):
+    """
+    URL do SQLAlchemy ('sqlite:///optuna.db') -> RDB; caminho de arquivo ->
+    JournalStorage em arquivo (vários processos, sem servidor); vazio/None ->
+    estudo só em memória.
+    """
+    if not storage:
+        return None
+    if '://' in storage:
+        return storage
+    try:
+        from optuna.storages.journal import JournalFileBackend, JournalFileOpenLock
+    except ImportError:  # optuna < 4.0
+        from optuna.storages import JournalFileStorage as JournalFileBackend, JournalFileOpenLock
+    # Symlinks (lock padrão) exigem privilégio no Windows
+    lock = JournalFileOpenLock(storage) if os.name == 'nt' else None
+    return optuna.storages.JournalStorage(JournalFileBackend(storage, lock_obj=lock))
+
+def load_study(storage, study_name, seed=RANDOM_STATE):
+    """Cria o estudo ou retoma o que já existe no storage com esse nome."""
+    return optuna.create_study(
+        study_name=study_name, storage=optuna_storage(storage), direction='maximize', load_if_exists=True,
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=N_PRUNER_STARTUP_TRIALS, n_warmup_steps=0))
+
+def data_fingerprint(X, y):
+    """Hash curto dos dados da busca: o mesmo conjunto retoma o mesmo estudo."""
+    h = hashlib.blake2b(digest_size=6)
+    h.update(memoryview(np.ascontiguousarray(X)).cast('B'))
+    h.update(memoryview(np.ascontiguousarray(y)).cast('B'))
+    return h.hexdigest()
+
+_FINISHED = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+
+def trials_started(study, since=0):
+    """
+    Tentativas concluídas/podadas mais as que estão rodando, contando como
+    rodando só as de número >= since (as RUNNING mais antigas sobraram de uma
+    execução interrompida e nunca terminam).
+    """
+    return sum(t.state in _FINISHED or (t.state == optuna.trial.TrialState.RUNNING and t.number >= since)
+               for t in study.get_trials(deepcopy=False))
+
+# Lock compartilhado pelos processos da busca (ver _init_optuna_worker)
+_TRIAL_LOCK = None
+
+def _init_optuna_worker(lock):
+    global _TRIAL_LOCK
+    _TRIAL_LOCK = lock
+
+def _optuna_worker(storage, study_name, data_dir, n_trials, n_threads, seed, since):
+    """
+    Processo da busca paralela: lê X_res/y_res por memmap, monta os folds e roda
+    tentativas até o estudo ter n_trials. A contagem (incluindo as tentativas
+    que os outros processos estão rodando) e a criação da tentativa acontecem
+    sob _TRIAL_LOCK, então dois processos nunca ocupam a mesma vaga.
+    """
+    warnings.filterwarnings('ignore', category=UserWarning)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    X_res = np.load(os.path.join(data_dir, 'X_res.npy'), mmap_mode='r')
+    y_res = np.load(os.path.join(data_dir, 'y_res.npy'))
+    # Uma vez por processo; todas as tentativas deste worker reusam as matrizes
+    folds = build_cv_folds(X_res, y_res, n_threads)
+    del X_res
+    study = load_study(storage, study_name, seed=seed)
+    while True:
+        with _TRIAL_LOCK:
+            if trials_started(study, since) >= n_trials:
+                break
+            trial = study.ask()
+        try:
+            value = objective(trial, folds, n_threads)
+        except optuna.TrialPruned:
+            study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+        except Exception:
+            study.tell(trial, state=optuna.trial.TrialState.FAIL)
+            raise
+        else:
+            study.tell(trial, value)
+
+def run_study(X_res, y_res, storage=OPTUNA_STORAGE, study_name=None, n_trials=N_OPTUNA_TRIALS,
+              n_workers=OPTUNA_WORKERS, work_dir=OPTUNA_WORK_DIR):
+    """
+    Busca com n_workers processos compartilhando o storage. Os núcleos são
+    divididos: cada processo roda uma tentativa por vez e cada fit do XGBoost
+    usa cpu_count // n_workers threads. Tentativas concluídas/podadas que já
+    estão no storage contam para n_trials (um estudo interrompido continua de
+    onde parou). Sem study_name, o nome vem do hash dos dados.
+    Os processos desta chamada não passam de n_trials (lock entre contar e
+    criar cada tentativa); outras máquinas no mesmo storage não entram nessa
+    contagem.
+    """
+    n_workers = max(1, int(n_workers))
+    if n_workers > 1 and not storage:
+        raise ValueError("A busca paralela precisa de um storage compartilhado (--storage).")
+    n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    study_name = study_name or f"xgboost_final_{data_fingerprint(X_res, y_res)}"
+    study = load_study(storage, study_name)
+    done = len(study.get_trials(deepcopy=False, states=_FINISHED))
+    print(f"[INFO] Estudo '{study_name}' ({storage or 'memória'}): {done}/{n_trials} tentativas já concluídas; "
+          f"{n_workers} processo(s) x {n_threads} thread(s) do XGBoost")
+    if done >= n_trials:
+        return study
     
-    # 4. Retorna a média do F1-Macro
-    return np.mean(scores)
+    if n_workers == 1:
+        folds = build_cv_folds(X_res, y_res, n_threads)
+        study.optimize(lambda trial: objective(trial, folds, n_threads), n_trials=n_trials - done,
+                       show_progress_bar=True)
+    else:
+        # Os processos leem os dados balanceados por memmap em vez de receber uma cópia cada
+        os.makedirs(work_dir, exist_ok=True)
+        np.save(os.path.join(work_dir, 'X_res.npy'), X_res)
+        np.save(os.path.join(work_dir, 'y_res.npy'), y_res)
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_optuna_worker,
+                                     initargs=(multiprocessing.Lock(),)) as pool:
+                since = len(study.get_trials(deepcopy=False))
+                futures = [pool.submit(_optuna_worker, storage, study_name, work_dir, n_trials, n_threads,
+                                       RANDOM_STATE + i + 1, since)
+                           for i in range(n_workers)]
+                for future in futures:
+                    future.result()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        study = load_study(storage, study_name)
+    
+    states = [t.state for t in study.get_trials(deepcopy=False)]
+    print(f"[INFO] Tentativas: {states.count(optuna.trial.TrialState.COMPLETE)} concluídas, "
+          f"{states.count(optuna.trial.TrialState.PRUNED)} podadas")
+    return study
 
 
 # --- Ponto de Entrada Principal ---
 
-def main(csv_dir):
+def main(csv_dir, n_workers=N_WORKERS, cache_dir=FEATURE_CACHE_DIR, out_of_core=False,
+         ooc_dir=OUT_OF_CORE_DIR, tune_rows=TUNE_ROWS, block_rows=DEFAULT_BLOCK_ROWS,
+         storage=OPTUNA_STORAGE, study_name=None, optuna_workers=OPTUNA_WORKERS):
     """
     Função principal para orquestrar o pipeline de treinamento final.
+    out_of_core: features em disco (float32, memmap), scaler por partial_fit e
+    modelo final treinado de uma DMatrix em memória externa; SMOTE e Optuna
+    rodam sobre uma amostra estratificada de até tune_rows linhas.
+    storage/study_name/optuna_workers: ver run_study.
     """
     warnings.filterwarnings('ignore', category=UserWarning)
+    mem = MemoryMonitor()
     
     try:
         t_start = time()
         
         # --- 1. Carregar e Processar Dados ---
-        X_full, y_full = load_and_extract_features(csv_dir, target_fs=TARGET_FS)
+        with mem.stage("1. Features"):
+            if out_of_core:
+                store = build_feature_store(csv_dir, ooc_dir, target_fs=TARGET_FS,
+                                            n_workers=n_workers, cache_dir=cache_dir)
+                feature_columns_list, y_full = store.columns, store.y
+            else:
+                X_full, y_full = load_and_extract_features(csv_dir, target_fs=TARGET_FS,
+                                                           n_workers=n_workers, cache_dir=cache_dir)
+                feature_columns_list = X_full.columns.tolist()
         
         # --- 2. Salvar Colunas de Features ---
-        feature_columns_list = X_full.columns.tolist()
         with open(FEATURE_COLUMNS_PATH, 'w') as f:
             json.dump(feature_columns_list, f)
         print(f"\n[INFO] Lista de features ({len(feature_columns_list)} colunas) salva em: {FEATURE_COLUMNS_PATH}")
@@ -362,33 +694,45 @@ def main(csv_dir):
         
         # --- 4. Escalar Features (e salvar) ---
         # IMPORTANTE: Scaler é treinado nos dados originais (NÃO balanceados)
-        scaler = StandardScaler()
-        X_full_s = scaler.fit_transform(X_full)
+        with mem.stage("4. Scaler"):
+            if out_of_core:
+                # partial_fit bloco a bloco; o SMOTE/Optuna usam uma amostra escalada em memória
+                scaler = fit_scaler(store, block_rows=block_rows)
+                tune_idx = stratified_sample(y_full_enc, tune_rows, seed=RANDOM_STATE)
+                X_full_s = scaler.transform(store.rows(tune_idx).astype(np.float64))
+                y_tune_enc = y_full_enc[tune_idx]
+                print(f"[INFO] Amostra para SMOTE/Optuna: {len(tune_idx)} de {store.n_rows} linhas")
+            else:
+                scaler = StandardScaler()
+                X_full_s = scaler.fit_transform(X_full)
+                y_tune_enc = y_full_enc
+                del X_full
         joblib.dump(scaler, SCALER_PATH)
-        print(f"[INFO] Scaler (treinado em {len(X_full_s)} amostras) salvo em: {SCALER_PATH}")
+        print(f"[INFO] Scaler (treinado em {len(y_full_enc)} amostras) salvo em: {SCALER_PATH}")
         
         # --- 5. Balancear Dados (SMOTE) ---
         # Agora aplicamos SMOTE nos dados escalados para treinar
-        print(f"\n[INFO] Aplicando SMOTE... (Contagem antes: {np.bincount(y_full_enc)})")
-        try:
-            min_class = np.min(np.bincount(y_full_enc))
-            k_n = min(5, min_class - 1) if min_class > 1 else 1
-            smote = SMOTE(random_state=RANDOM_STATE, k_neighbors=k_n)
-            X_res, y_res = smote.fit_resample(X_full_s, y_full_enc)
-            print(f"[INFO] SMOTE concluído. (Contagem depois: {np.bincount(y_res)})")
-        except Exception as e:
-            print(f"[ERRO] SMOTE falhou: {e}. Abortando.")
-            sys.exit(1)
+        print(f"\n[INFO] Aplicando SMOTE... (Contagem antes: {np.bincount(y_tune_enc)})")
+        with mem.stage("5. SMOTE"):
+            try:
+                min_class = np.min(np.bincount(y_tune_enc))
+                k_n = min(5, min_class - 1) if min_class > 1 else 1
+                smote = SMOTE(random_state=RANDOM_STATE, k_neighbors=k_n)
+                X_res, y_res = smote.fit_resample(X_full_s, y_tune_enc)
+                print(f"[INFO] SMOTE concluído. (Contagem depois: {np.bincount(y_res)})")
+            except Exception as e:
+                print(f"[ERRO] SMOTE falhou: {e}. Abortando.")
+                sys.exit(1)
+            del X_full_s
             
         # --- 6. Otimização com Optuna ---
         print(f"\n[INFO] Iniciando otimização com Optuna ({N_OPTUNA_TRIALS} tentativas)...")
         t_optuna_start = time()
         
-        # Cria um "estudo" do Optuna, com o objetivo de maximizar o score
-        study = optuna.create_study(direction='maximize')
-        
-        # Passa os dados balanceados (X_res, y_res) para a função 'objective'
-        study.optimize(lambda trial: objective(trial, X_res, y_res), n_trials=N_OPTUNA_TRIALS, show_progress_bar=True)
+        with mem.stage("6. Optuna"):
+            # Estudo persistente (retomável) com poda por fold; workers > 1 dividem os núcleos
+            study = run_study(X_res, y_res, storage=storage, study_name=study_name,
+                              n_trials=N_OPTUNA_TRIALS, n_workers=optuna_workers)
         
         print(f"[INFO] Otimização concluída em {time() - t_optuna_start:.2f}s.")
         
@@ -406,9 +750,11 @@ def main(csv_dir):
         # --- 8. Treinar e Salvar Modelo Final ---
         print("\n[INFO] Treinando o modelo XGBoost_final com os melhores parâmetros...")
         
-        # Adiciona parâmetros fixos aos melhores encontrados
+        # Adiciona parâmetros fixos aos melhores encontrados; o número de árvores é o
+        # que o early stopping usou na melhor tentativa
         final_params = {
             **best_params,
+            'n_estimators': study.best_trial.user_attrs.get('n_estimators_es', best_params['n_estimators']),
             'objective': 'multi:softmax',
             'num_class': 3,
             'eval_metric': 'mlogloss',
@@ -417,11 +763,27 @@ def main(csv_dir):
             'use_label_encoder': False
         }
         
-        model_final = XGBClassifier(**final_params)
-        model_final.fit(X_res, y_res) # Treina em 100% dos dados balanceados
+        with mem.stage("8. Modelo final"):
+            if out_of_core:
+                # Todas as linhas, lidas em blocos do disco; o balanceamento vira peso por classe
+                del X_res, y_res
+                weights = balanced_class_weights(y_full_enc, len(le.classes_))
+                dtrain = external_dmatrix(StoreIter(store, scaler, y_full_enc, class_weights=weights,
+                                                    block_rows=block_rows))
+                params, num_rounds = native_params(final_params)
+                booster = xgb.train(params, dtrain, num_boost_round=num_rounds)
+                booster.save_model(BOOSTER_PATH)
+                # Mesmo formato do modo em memória (XGBClassifier em joblib) para a Lambda/simulador
+                model_final = XGBClassifier()
+                model_final.load_model(BOOSTER_PATH)
+                print(f"[INFO] Booster nativo salvo em: {BOOSTER_PATH}")
+            else:
+                model_final = XGBClassifier(**final_params)
+                model_final.fit(X_res, y_res) # Treina em 100% dos dados balanceados
         
         joblib.dump(model_final, MODEL_PATH)
         print(f"[INFO] Modelo final salvo em: {MODEL_PATH}")
+        mem.summary()
 
         print("\n" + "="*50)
         print(f"PIPELINE FINAL CONCLUÍDO (Tempo Total: {time() - t_start:.2f}s)")
@@ -443,10 +805,22 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="Script de Treinamento Final (XGBoost Otimizado com Optuna).")
     parser.add_argument('--csv_dir', required=False, default='.', help="Diretório contendo os CSVs (padrão: '.').")
+    parser.add_argument('--workers', type=int, default=N_WORKERS, help=f"Processos para leitura dos CSVs (padrão: {N_WORKERS}).")
+    parser.add_argument('--cache_dir', default=FEATURE_CACHE_DIR, help=f"Cache de features por arquivo (padrão: '{FEATURE_CACHE_DIR}').")
+    parser.add_argument('--no_cache', action='store_true', help="Desativa o cache de features.")
+    parser.add_argument('--out_of_core', action='store_true', help="Features em disco e treino em memória externa (dados maiores que a RAM).")
+    parser.add_argument('--ooc_dir', default=OUT_OF_CORE_DIR, help=f"Diretório da matriz em disco (padrão: '{OUT_OF_CORE_DIR}').")
+    parser.add_argument('--tune_rows', type=int, default=TUNE_ROWS, help=f"Linhas da amostra para SMOTE/Optuna no modo --out_of_core (padrão: {TUNE_ROWS}).")
+    parser.add_argument('--storage', default=OPTUNA_STORAGE, help=f"Storage do Optuna: arquivo de journal ou URL (ex.: sqlite:///optuna.db); '' = só em memória (padrão: '{OPTUNA_STORAGE}').")
+    parser.add_argument('--study_name', default=None, help="Nome do estudo a criar/retomar (padrão: derivado do hash dos dados).")
+    parser.add_argument('--optuna_workers', type=int, default=OPTUNA_WORKERS, help=f"Processos da busca; os núcleos são divididos entre eles (padrão: {OPTUNA_WORKERS}).")
+    parser.add_argument('--block_rows', type=int, default=DEFAULT_BLOCK_ROWS, help=f"Linhas por bloco lido do disco (padrão: {DEFAULT_BLOCK_ROWS}).")
     args = parser.parse_args()
     
     # Desabilitar logs verbosos do Optuna
     optuna.logging.set_verbosity(optuna.logging.WARNING)
     
     print(f"[INFO] Usando diretório de CSVs: {args.csv_dir}")
-    main(csv_dir=args.csv_dir)
+    main(csv_dir=args.csv_dir, n_workers=args.workers, cache_dir=None if args.no_cache else args.cache_dir,
+         out_of_core=args.out_of_core, ooc_dir=args.ooc_dir, tune_rows=args.tune_rows, block_rows=args.block_rows,
+         storage=args.storage, study_name=args.study_name, optuna_workers=args.optuna_workers)
@@ -0,0 +1,253 @@
+"""
+Treinamento fora da memória (conjuntos de features maiores que a RAM).
+
+Usado por Modelo_FINAL_IA.py com --out_of_core:
+
+- FeatureStore : matriz float32 (n, n_features) em disco, escrita bloco a bloco
+                 conforme os CSVs são processados e lida por memmap; rótulos em .npy
+- fit_scaler   : StandardScaler ajustado com partial_fit, um bloco por vez
+- StoreIter    : xgboost.DataIter que entrega os blocos já escalados; alimenta um
+                 ExtMemQuantileDMatrix (DMatrix em memória externa nas versões
+                 antigas do XGBoost) sem montar a matriz inteira
+- MemoryMonitor: pico de RSS do processo por etapa do pipeline
+
+Layout de <root>:
+
+    meta.json   colunas, número de linhas e dtype
+    X.f32       linhas float32 (C-order), uma após a outra
+    y.npy       rótulos (str)
+    xgb_cache*  páginas da DMatrix em memória externa (criadas pelo XGBoost)
+"""
+
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from time import time
+
+import numpy as np
+import xgboost as xgb
+from sklearn.preprocessing import StandardScaler
+
+X_FILE = 'X.f32'
+Y_FILE = 'y.npy'
+META_FILE = 'meta.json'
+XGB_CACHE_PREFIX = 'xgb_cache'
+DEFAULT_BLOCK_ROWS = 65536
+
+
+# --- Memória ------------------------------------------------------------------
+
+def current_rss_mb():
+    """RSS atual do processo em MB (/proc no Linux; senão o pico do getrusage)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == 'darwin' else 1024)
+
+
+class MemoryMonitor:
+    """
+    with monitor.stage('nome'): ... mede o pico de RSS durante a etapa com uma
+    thread que amostra a cada `interval` s. Só o processo principal é medido
+    (os processos de leitura dos CSVs ficam de fora).
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.stages = []        # (nome, início MB, pico MB, fim MB, segundos)
+
+    @contextmanager
+    def stage(self, name):
+        start = current_rss_mb()
+        peak = [start]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                peak[0] = max(peak[0], current_rss_mb())
+
+        sampler = threading.Thread(target=sample, name="mem-monitor", daemon=True)
+        sampler.start()
+        t0 = time()
+        try:
+            yield
+        finally:
+            done.set()
+            sampler.join()
+            end = current_rss_mb()
+            row = (name, start, max(peak[0], end), end, time() - t0)
+            self.stages.append(row)
+            print(f"[MEM] {name}: pico {row[2]:.0f} MB (início {start:.0f} MB, fim {end:.0f} MB, {row[4]:.1f}s)")
+
+    def summary(self):
+        print("\n[MEM] Pico de memória por etapa:")
+        for name, start, peak, end, secs in self.stages:
+            print(f"   {name:<32} pico {peak:>8.0f} MB | +{peak - start:>7.0f} MB | {secs:>8.1f}s")
+
+
+# --- Matriz de features em disco ----------------------------------------------
+
+class FeatureStore:
+    """
+    FeatureStore.create(root, columns) abre para escrita (append + close);
+    FeatureStore.open(root) lê. X é um memmap (n, n_features) float32 somente
+    leitura; blocks() percorre as linhas em fatias de block_rows.
+    """
+
+    def __init__(self, root, columns, n_rows=0, labels=None):
+        self.root = root
+        self.columns = list(columns)
+        self.n_rows = n_rows
+        self._labels = labels
+        self._file = None
+        self._pending_labels = []
+
+    @classmethod
+    def create(cls, root, columns):
+        os.makedirs(root, exist_ok=True)
+        store = cls(root, columns)
+        store._file = open(os.path.join(root, X_FILE), 'wb')
+        return store
+
+    @classmethod
+    def open(cls, root):
+        with open(os.path.join(root, META_FILE)) as f:
+            meta = json.load(f)
+        labels = np.load(os.path.join(root, Y_FILE), allow_pickle=False)
+        return cls(root, meta['columns'], meta['n_rows'], labels)
+
+    def append(self, X, y):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != len(self.columns):
+            raise ValueError(f"Bloco deve ter formato (n, {len(self.columns)}), recebido {X.shape}.")
+        if len(X) != len(y):
+            raise ValueError(f"Bloco com {len(X)} linhas e {len(y)} rótulos.")
+        self._file.write(X.tobytes())
+        self._pending_labels.append(np.asarray(y, dtype=str))
+        self.n_rows += len(X)
+
+    def close(self):
+        if self._file is None:
+            return self
+        self._file.close()
+        self._file = None
+        self._labels = np.concatenate(self._pending_labels) if self._pending_labels else np.array([], dtype=str)
+        self._pending_labels = []
+        np.save(os.path.join(self.root, Y_FILE), self._labels, allow_pickle=False)
+        with open(os.path.join(self.root, META_FILE), 'w') as f:
+            json.dump({'columns': self.columns, 'n_rows': self.n_rows, 'dtype': 'float32'}, f)
+        return self
+
+    @property
+    def X(self):
+        if not self.n_rows:
+            return np.empty((0, len(self.columns)), dtype=np.float32)
+        return np.memmap(os.path.join(self.root, X_FILE), dtype=np.float32, mode='r',
+                         shape=(self.n_rows, len(self.columns)))
+
+    @property
+    def y(self):
+        return self._labels
+
+    def blocks(self, block_rows=DEFAULT_BLOCK_ROWS):
+        for start in range(0, self.n_rows, block_rows):
+            yield start, min(start + block_rows, self.n_rows)
+
+    def rows(self, idx):
+        """Linhas idx (ordenadas) em memória, float32."""
+        return np.asarray(self.X[np.sort(idx)])
+
+
+def fit_scaler(store, block_rows=DEFAULT_BLOCK_ROWS):
+    """StandardScaler ajustado bloco a bloco (partial_fit), em float64 como o fit em memória."""
+    scaler = StandardScaler()
+    X = store.X
+    for start, stop in store.blocks(block_rows):
+        scaler.partial_fit(np.asarray(X[start:stop], dtype=np.float64))
+    return scaler
+
+
+def balanced_class_weights(y_codes, n_classes):
+    """Peso por classe n / (k * n_c): substitui o SMOTE quando os dados não cabem na RAM."""
+    counts = np.bincount(y_codes, minlength=n_classes).astype(np.float64)
+    weights = np.zeros(n_classes)
+    present = counts > 0
+    weights[present] = len(y_codes) / (present.sum() * counts[present])
+    return weights
+
+
+def stratified_sample(y_codes, n_rows, seed=42):
+    """Até n_rows índices (ordenados) mantendo a proporção das classes."""
+    if n_rows is None or n_rows >= len(y_codes):
+        return np.arange(len(y_codes))
+    rng = np.random.default_rng(seed)
+    frac = n_rows / len(y_codes)
+    picked = []
+    for code in np.unique(y_codes):
+        members = np.flatnonzero(y_codes == code)
+        k = max(1, int(round(len(members) * frac)))
+        picked.append(rng.choice(members, size=min(k, len(members)), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+# --- XGBoost em memória externa -----------------------------------------------
+
+class StoreIter(xgb.DataIter):
+    """
+    Percorre o FeatureStore em blocos, escalando cada um com o scaler já
+    ajustado. O XGBoost chama reset()/next() quantas vezes precisar e guarda
+    as páginas quantizadas em cache_prefix.
+    """
+
+    def __init__(self, store, scaler, y_codes, class_weights=None, block_rows=DEFAULT_BLOCK_ROWS, cache_prefix=None):
+        self._store = store
+        self._scaler = scaler
+        self._y = y_codes
+        self._class_weights = class_weights
+        self._bounds = list(store.blocks(block_rows))
+        self._pos = 0
+        super().__init__(cache_prefix=cache_prefix or os.path.join(store.root, XGB_CACHE_PREFIX))
+
+    def next(self, input_data):
+        if self._pos == len(self._bounds):
+            return False
+        start, stop = self._bounds[self._pos]
+        X = self._scaler.transform(np.asarray(self._store.X[start:stop], dtype=np.float64)).astype(np.float32)
+        y = self._y[start:stop]
+        weight = self._class_weights[y] if self._class_weights is not None else None
+        input_data(data=X, label=y, weight=weight)
+        self._pos += 1
+        return True
+
+    def reset(self):
+        self._pos = 0
+
+
+def external_dmatrix(data_iter, max_bin=256):
+    """Matriz quantizada em memória externa (ExtMemQuantileDMatrix no XGBoost >= 3.0)."""
+    if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+        return xgb.ExtMemQuantileDMatrix(data_iter, max_bin=max_bin)
+    return xgb.DMatrix(data_iter)
+
+
+# Nomes do XGBClassifier -> parâmetros do xgb.train
+_SKLEARN_TO_NATIVE = {'learning_rate': 'eta', 'random_state': 'seed', 'n_jobs': 'nthread',
+                      'reg_alpha': 'alpha', 'reg_lambda': 'lambda'}
+_SKLEARN_ONLY = {'n_estimators', 'use_label_encoder'}
+
+
+def native_params(params):
+    """Parâmetros do XGBClassifier -> (params do xgb.train, num_boost_round)."""
+    out = {'tree_method': 'hist'}
+    for key, value in params.items():
+        if key in _SKLEARN_ONLY:
+            continue
+        if key == 'n_jobs' and (value is None or value < 0):
+            continue            # nthread padrão = todos os núcleos
+        out[_SKLEARN_TO_NATIVE.get(key, key)] = value
+    return out, int(params.get('n_estimators', 100))
@@ -3,15 +3,20 @@ import csv
 import datetime
 import json 
 import numpy as np
-import pandas as pd
-import joblib
 from collections import deque
 import matplotlib.pyplot as plt
-from scipy import signal, stats
 import sys
 import os
 # Certifique-se de que o arquivo ac_shared_memory.py está na mesma pasta
 from ac_shared_memory import AssettoCorsaSharedMemory
+# Extração de features compartilhada com a Lambda (backend_lambda/feature_engineering.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend_lambda'))
+from feature_engineering import derive_channels, extract_features_batch
+from gravity import remove_gravity
+from model_artifacts import load_artifacts
+from prediction_cache import PredictionCache, model_version
+from streaming_features import StreamingScorer
+from telemetry_store import TelemetryStore
 
 # ==============================================================================
 # 1. CONFIGURAÇÕES
@@ -30,6 +35,17 @@ GRAVITY_CUTOFF_HZ = 0.5
 # Configuração de Latência
 LATENCIA_LTE_SEC = 1.0  # Simula 1 segundo de delay de upload
 
+# Histórico persistente (janelas + predições) para consultas entre execuções
+TELEMETRIA_DIR = os.environ.get('TELEMETRIA_DIR', 'telemetria')
+KIND_EVENTO, KIND_HEARTBEAT = 0, 1
+
+# Backend de predição: 'sklearn', 'xgboost', 'onnx' ou 'compiled' (ver backend_lambda/predictors.py)
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'sklearn')
+
+# Pontuação contínua (backend_lambda/streaming_features.py): além dos eventos,
+# classifica a janela das últimas 50 amostras a cada 10 novas. SCORE_CONTINUO=1 ativa
+SCORE_CONTINUO = os.environ.get('SCORE_CONTINUO', '0') == '1'
+
 # Cores
 class Colors:
     HEADER = '\033[95m'
@@ -58,10 +74,11 @@ log("AWS está DESATIVADA. Rodando localmente com SIMULAÇÃO DE LATÊNCIA.", "A
 # 3. CARREGAMENTO IA
 # ==============================================================================
 try:
-    SCALER = joblib.load('scaler_final.joblib')
-    MODEL = joblib.load('xgboost_final.joblib')
-    ENCODER = joblib.load('label_encoder_final.joblib')
-    log("IA Carregada.", "SISTEMA")
+    ARTIFACTS = load_artifacts('.', fmt='auto', backend=MODEL_BACKEND)
+    log(f"IA Carregada (backend: {ARTIFACTS.backend}).", "SISTEMA")
+    # Janelas repetidas (heartbeat parado, completado com a última amostra) não passam pelo modelo de novo
+    PRED_CACHE = PredictionCache(model_version(ARTIFACTS, '.'))
+    SCORER = StreamingScorer(ARTIFACTS, fs=TAXA_ATUALIZACAO_HZ) if SCORE_CONTINUO else None
 except Exception as e:
     log(f"Erro ao carregar IA: {e}", "ERRO")
     exit()
@@ -69,72 +86,21 @@ except Exception as e:
 # ==============================================================================
 # 4. FUNÇÕES IA
 # ==============================================================================
-def remove_gravity(df, fs=TAXA_ATUALIZACAO_HZ, cutoff_hz=GRAVITY_CUTOFF_HZ):
-    b, a = signal.butter(2, cutoff_hz / (0.5*fs), btype='low', analog=False)
-    df_out = df.copy()
-    for axis in ['acc_x','acc_y','acc_z']:
-        try:
-            g = signal.filtfilt(b, a, df[axis].values)
-            df_out[axis] = df[axis].values - g
-        except:
-            df_out[axis] = df[axis].values - np.mean(df[axis].values)
-    return df_out
-
-def extract_features_window(arr, fs=TAXA_ATUALIZACAO_HZ):
-    feats = {}
-    axes = ['acc_x','acc_y','acc_z', 'gyro_x', 'gyro_y', 'gyro_z',
-            'acc_vm', 'gyro_vm', 'jerk_x', 'jerk_y', 'jerk_z', 'jerk_vm']
-    for i, ax in enumerate(axes):
-        v = arr[:, i]
-        feats[f'{ax}_mean'] = float(np.mean(v))
-        feats[f'{ax}_std']  = float(np.std(v))
-        feats[f'{ax}_var']  = float(np.var(v))
-        feats[f'{ax}_min']  = float(np.min(v))
-        feats[f'{ax}_max']  = float(np.max(v))
-        feats[f'{ax}_median'] = float(np.median(v))
-        feats[f'{ax}_rms'] = float(np.sqrt(np.mean(v**2)))
-        feats[f'{ax}_energy'] = float(np.sum(v**2))
-        feats[f'{ax}_iqr'] = float(np.subtract(*np.percentile(v, [75, 25])))
-        feats[f'{ax}_skew'] = float(stats.skew(v))
-        feats[f'{ax}_kurtosis'] = float(stats.kurtosis(v))
-        
-        if len(v) > 1: zc = ((v[:-1] * v[1:]) < 0).sum() / (len(v)-1)
-        else: zc = 0.0
-        feats[f'{ax}_zcross_rate'] = float(zc)
-        
-        try:
-            fft = np.fft.rfft(v); mags = np.abs(fft); freqs = np.fft.rfftfreq(len(v), d=1.0/fs)
-            if len(mags) > 1:
-                idx = np.argmax(mags[1:]) + 1
-                feats[f'{ax}_dom_freq'] = float(freqs[idx])
-                feats[f'{ax}_dom_mag'] = float(mags[idx])
-            else:
-                feats[f'{ax}_dom_freq'] = 0.0; feats[f'{ax}_dom_mag'] = 0.0
-        except:
-            feats[f'{ax}_dom_freq'] = 0.0; feats[f'{ax}_dom_mag'] = 0.0
-    return feats
-
 def processar_pacote_ia(lista_amostras):
-    cols = ['time', 'acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z']
-    df = pd.DataFrame(lista_amostras, columns=cols)
-    
-    dt = 1.0 / TAXA_ATUALIZACAO_HZ
-    df['acc_vm'] = np.sqrt(df['acc_x']**2 + df['acc_y']**2 + df['acc_z']**2)
-    df['gyro_vm'] = np.sqrt(df['gyro_x']**2 + df['gyro_y']**2 + df['gyro_z']**2)
-    for ax in ['x', 'y', 'z']:
-        df[f'jerk_{ax}'] = np.concatenate(([0.0], np.diff(df[f'acc_{ax}']) / dt))
-    df['jerk_vm'] = np.sqrt(df['jerk_x']**2 + df['jerk_y']**2 + df['jerk_z']**2)
-
-    df_filt = remove_gravity(df)
+    # Cache por impressão digital da janela (ver backend_lambda/prediction_cache.py)
+    return PRED_CACHE.get_or_compute(lista_amostras, lambda: classificar_janela(lista_amostras))
+
+def classificar_janela(lista_amostras):
+    # (n, 7) t/ax..gz -> (n, 12) na ordem CHANNELS; vm e jerk saem da aceleração bruta
+    arr = np.asarray(lista_amostras, dtype=np.float64)
+    arr_window = derive_channels(arr[:, 1:], fs=TAXA_ATUALIZACAO_HZ)
+    # Só acc_xyz perdem a gravidade (coeficientes em cache, três eixos em um filtfilt)
+    arr_window[:, :3] = remove_gravity(arr[:, 1:4], TAXA_ATUALIZACAO_HZ, cutoff_hz=GRAVITY_CUTOFF_HZ)
+    features = extract_features_batch(arr_window[None], dtype=np.float64)
     
-    feature_cols = ['acc_x','acc_y','acc_z','gyro_x','gyro_y','gyro_z',
-                    'acc_vm','gyro_vm','jerk_x','jerk_y','jerk_z','jerk_vm']
-    arr_window = df_filt[feature_cols].values
-    features_dict = extract_features_window(arr_window)
-    
-    X_scaled = SCALER.transform(pd.DataFrame([features_dict]))
-    y_pred_idx = MODEL.predict(X_scaled)
-    resultado = ENCODER.inverse_transform(y_pred_idx)[0]
+    X_scaled = ARTIFACTS.scale_features(features)
+    y_pred_idx = ARTIFACTS.predict(X_scaled)
+    resultado = str(ARTIFACTS.classes[y_pred_idx[0]])
     
     return resultado
 
@@ -149,7 +115,8 @@ samples_collected = 0
 last_heartbeat = time.time()
 packet_count = 0
 
-# Preparar CSV
+# Preparar CSV e o histórico (o cenário é o id do dispositivo)
+telemetria = TelemetryStore(TELEMETRIA_DIR)
 arquivo_csv = open(nome_arquivo_csv, 'w', newline='')
 writer = csv.writer(arquivo_csv)
 writer.writerow(['cenario', 'packet_id', 'tipo_pacote', 'predicao_ia', 'timestamp_real', 'acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z'])
@@ -178,6 +145,10 @@ try:
             
             sample = [ts, ax, ay, az, gx, gy, gz]
             
+            if SCORER is not None:
+                for _, fim, res_cont in SCORER.push(CENARIO_TESTE, sample[1:]):
+                    print(f"〰️ Contínuo | amostra {fim} | IA: {res_cont.upper()}")
+            
             triggered = (abs(ax) > TRIGGER_THRESHOLD_MS2) or (abs(az) > TRIGGER_THRESHOLD_MS2)
             
             if event_in_progress:
@@ -196,6 +167,8 @@ try:
                     for s in current_event_list:
                         writer.writerow([CENARIO_TESTE, packet_count, 'EVENTO', res] + s)
                     arquivo_csv.flush()
+                    telemetria.add_event(CENARIO_TESTE, int(current_event_list[0][0] * 1000), current_event_list,
+                                         label=res, kind=KIND_EVENTO)
                     
                     # 3. SIMULAÇÃO DE LATÊNCIA LTE (Bloqueante)
                     # O script para aqui, simulando o tempo de upload do pacote
@@ -227,6 +200,8 @@ try:
                             for s in hb:
                                 writer.writerow([CENARIO_TESTE, packet_count, 'HEARTBEAT', res_hb] + s)
                             arquivo_csv.flush()
+                            telemetria.add_event(CENARIO_TESTE, int(hb[0][0] * 1000), hb,
+                                                 label=res_hb, kind=KIND_HEARTBEAT)
                             
                             # Simulação de Latência no Heartbeat também
                             log(f"Enviando Heartbeat LTE... ({LATENCIA_LTE_SEC}s)", "REDE")
@@ -241,6 +216,7 @@ try:
 
 except KeyboardInterrupt:
     print("\nFim do teste.")
+    log(f"Cache de predições: {PRED_CACHE.snapshot()}", "IA")
 finally:
     ac.close()
     arquivo_csv.close()
\ No newline at end of file
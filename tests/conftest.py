@@ -0,0 +1,14 @@
+"""
+Os módulos do projeto não são um pacote instalável: cada script adiciona
+backend_lambda/ ao sys.path (ver lambda_function.py, dashboard.py). Os testes
+fazem o mesmo para backend_lambda/ e dashboard/.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sub in ('backend_lambda', 'dashboard'):
+    path = os.path.join(ROOT, sub)
+    if path not in sys.path:
+        sys.path.insert(0, path)
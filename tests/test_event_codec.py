@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pytest
+
+from event_codec import (SAMPLE_KEYS, decode_binary, decode_json, decode_payload, encode_binary,
+                         is_binary, payload_to_event)
+
+
+def make_samples(n=49, seed=0):
+    """Amostras (n, 7) com duas casas decimais, como o firmware envia."""
+    rng = np.random.default_rng(seed)
+    samples = np.empty((n, 7))
+    samples[:, 0] = 1_000_000 + np.cumsum(rng.integers(45, 55, n))
+    samples[:, 1:] = np.round(rng.normal(0, 8, (n, 6)), 2)
+    return samples
+
+
+def test_binario_ida_e_volta():
+    samples = make_samples()
+    payload = encode_binary('veiculo_01', 123456, samples, thr=(3.0, 2.5))
+    assert is_binary(payload)
+    meta, decoded = decode_binary(payload)
+    np.testing.assert_array_equal(decoded, samples)
+    assert meta['dev_id'] == 'veiculo_01'
+    assert meta['ts'] == 123456
+    assert meta['thr'] == [3.0, 2.5]
+
+
+def test_binario_dev_id_de_tamanho_impar():
+    samples = make_samples(10)
+    meta, decoded = decode_payload(encode_binary('abc', 1, samples))
+    assert meta['dev'] == 'abc'
+    np.testing.assert_array_equal(decoded, samples)
+
+
+def test_json_e_binario_decodificam_igual():
+    samples = make_samples()
+    event = {'dev': 'v1', 'ts': 42, 'thr': [3.0, 3.0]}
+    event.update({k: samples[:, i].tolist() for i, k in enumerate(SAMPLE_KEYS)})
+    meta_json, from_json = decode_json(json.dumps(event).encode())
+    meta_bin, from_bin = decode_payload(encode_binary('v1', 42, samples))
+    np.testing.assert_array_equal(from_json, from_bin)
+    assert meta_json['dev_id'] == meta_bin['dev_id'] == 'v1'
+
+
+def test_payload_to_event_binario():
+    samples = make_samples(20)
+    event = payload_to_event(encode_binary('v2', 7, samples), as_lists=True)
+    assert event['dev_id'] == 'v2'
+    assert event['ax'] == samples[:, 1].tolist()
+
+
+def test_binario_truncado():
+    payload = encode_binary('v1', 1, make_samples(10))
+    with pytest.raises(ValueError):
+        decode_binary(payload[:-4])
+    with pytest.raises(ValueError):
+        decode_binary(payload[:10])
+
+
+def test_json_com_colunas_de_tamanhos_diferentes():
+    event = {k: [0.0] * 5 for k in SAMPLE_KEYS}
+    event['gz'] = [0.0] * 4
+    with pytest.raises(ValueError):
+        decode_json(json.dumps(event))
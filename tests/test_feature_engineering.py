@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from feature_engineering import (CHANNELS, FEATURE_COLUMNS, derive_channels, extract_features_batch,
+                                 sliding_window_batch)
+
+FS = 20.0
+
+
+def reference_features(arr, fs=FS):
+    """Laço por janela da versão original (extract_features_window), como referência."""
+    feats = {}
+    for i, ax in enumerate(CHANNELS):
+        v = arr[:, i]
+        feats[f'{ax}_mean'] = np.mean(v); feats[f'{ax}_std'] = np.std(v)
+        feats[f'{ax}_var'] = np.var(v); feats[f'{ax}_min'] = np.min(v)
+        feats[f'{ax}_max'] = np.max(v); feats[f'{ax}_median'] = np.median(v)
+        feats[f'{ax}_rms'] = np.sqrt(np.mean(v**2)); feats[f'{ax}_energy'] = np.sum(v**2)
+        feats[f'{ax}_iqr'] = np.subtract(*np.percentile(v, [75, 25]))
+        feats[f'{ax}_skew'] = stats.skew(v); feats[f'{ax}_kurtosis'] = stats.kurtosis(v)
+        feats[f'{ax}_zcross_rate'] = ((v[:-1] * v[1:]) < 0).sum() / (len(v) - 1) if len(v) > 1 else 0.0
+        mags = np.abs(np.fft.rfft(v)); freqs = np.fft.rfftfreq(len(v), d=1.0 / fs)
+        if len(mags) > 1:
+            idx = np.argmax(mags[1:]) + 1
+            feats[f'{ax}_dom_freq'] = freqs[idx]; feats[f'{ax}_dom_mag'] = mags[idx]
+        else:
+            feats[f'{ax}_dom_freq'] = 0.0; feats[f'{ax}_dom_mag'] = 0.0
+    return np.array([feats[c] for c in FEATURE_COLUMNS])
+
+
+def make_stream(n=600, seed=0):
+    """Sessão (n, 6) com um trecho parado (janelas constantes -> skew/kurtosis NaN)."""
+    rng = np.random.default_rng(seed)
+    raw = rng.normal(0, 3, (n, 6))
+    raw[200:320] = [0.0, 0.0, 9.81, 0.0, 0.0, 0.0]
+    return derive_channels(raw, fs=FS)
+
+
+# O scipy avisa de perda de precisão nas janelas constantes (e devolve NaN, como o lote)
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_batch_igual_ao_laco_por_janela():
+    windows = sliding_window_batch(make_stream(), 50, 10)
+    batch = extract_features_batch(windows, fs=FS, dtype=np.float64)
+    ref = np.stack([reference_features(np.asarray(w)) for w in windows])
+    assert batch.shape == (len(windows), len(FEATURE_COLUMNS))
+    np.testing.assert_array_equal(np.isnan(batch), np.isnan(ref))
+    assert np.isnan(ref).any()
+    np.testing.assert_allclose(batch, ref, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_chunks_nao_mudam_o_resultado():
+    windows = sliding_window_batch(make_stream(), 50, 10)
+    whole = extract_features_batch(windows, fs=FS, dtype=np.float64)
+    chunked = extract_features_batch(windows, fs=FS, dtype=np.float64, chunk_size=7)
+    np.testing.assert_array_equal(whole, chunked)
+
+
+def test_sliding_window_batch_sem_copia():
+    arr = make_stream(100)
+    windows = sliding_window_batch(arr, 50, 10)
+    assert windows.shape == (6, 50, len(CHANNELS))
+    assert np.shares_memory(windows, arr)
+    np.testing.assert_array_equal(windows[2], arr[20:70])
+    assert sliding_window_batch(arr[:30], 50, 10).shape == (0, 50, len(CHANNELS))
@@ -0,0 +1,51 @@
+import numpy as np
+
+from gravity import GravityStream, remove_gravity
+
+FS = 20.0
+
+
+def make_acc(n=4000):
+    """Gravidade/inclinação constantes + movimento de 4 Hz (bem acima do corte de 0,5 Hz)."""
+    t = np.arange(n) / FS
+    motion = np.sin(2 * np.pi * 4.0 * t)[:, None] * [1.0, 2.0, 0.5]
+    return np.array([2.0, -1.0, 9.81]) + motion
+
+
+def test_regime_permanente_igual_ao_filtfilt():
+    acc = make_acc()
+    offline = remove_gravity(acc, FS)
+    stream = GravityStream(FS)
+    online = np.concatenate([stream.process('v1', acc[i:i + 7]) for i in range(0, len(acc), 7)])
+    # Fora das bordas o causal só difere pela fase da pequena fração do movimento
+    # que passa no passa-baixas (~1,6% a 4 Hz)
+    np.testing.assert_allclose(online[400:-400], offline[400:-400], atol=0.05)
+    assert np.all(np.abs(online[400:].mean(axis=0)) < 0.01)
+
+
+def test_sinal_constante_sai_zero_desde_a_primeira_amostra():
+    stream = GravityStream(FS)
+    out = stream.process('v1', np.tile([0.3, -0.2, 9.81], (50, 1)))
+    np.testing.assert_allclose(out, 0.0, atol=1e-9)
+
+
+def test_blocos_continuam_o_anterior():
+    acc = make_acc(500)
+    whole = GravityStream(FS).process('v1', acc)
+    stream = GravityStream(FS)
+    parts = [stream.process('v1', acc[i:i + 13]) for i in range(0, len(acc), 13)]
+    np.testing.assert_allclose(np.concatenate(parts), whole, atol=1e-12)
+
+
+def test_estado_separado_por_dispositivo_e_lru():
+    acc = make_acc(200)
+    stream = GravityStream(FS, max_devices=2)
+    a = stream.process('a', acc[:100])
+    stream.process('b', acc[:50] + 5.0)
+    np.testing.assert_allclose(a, GravityStream(FS).process('a', acc[:100]))
+    np.testing.assert_allclose(stream.process('a', acc[100:]), GravityStream(FS).process('a', acc)[100:],
+                               atol=1e-12)
+    stream.process('c', acc[:10])
+    assert len(stream) == 2
+    stream.reset()
+    assert len(stream) == 0
@@ -0,0 +1,54 @@
+import numpy as np
+
+from idempotency import DedupFilter, SQLiteBackend, event_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_duplicada_dentro_do_ttl_e_nova_depois():
+    clock = FakeClock()
+    dedup = DedupFilter(ttl_s=10, clock=clock)
+    assert dedup.check('a') is False
+    clock.now = 9.9
+    assert dedup.check('a') is True
+    clock.now = 20.0
+    assert dedup.check('a') is False
+    assert dedup.stats.snapshot()['duplicates'] == 1
+
+
+def test_lru_descarta_a_chave_mais_antiga():
+    dedup = DedupFilter(ttl_s=1000, max_entries=3, clock=FakeClock())
+    for key in 'abcd':
+        assert dedup.check(key) is False
+    assert len(dedup) == 3
+    assert dedup.check('a') is False        # saiu pelo limite de tamanho
+    assert dedup.check('d') is True
+
+
+def test_forget_libera_a_reentrega(tmp_path):
+    dedup = DedupFilter(ttl_s=60, backend=SQLiteBackend(str(tmp_path / 'dedup.db')))
+    assert dedup.check('k') is False
+    dedup.forget('k')
+    assert dedup.check('k') is False
+    assert dedup.check('k') is True
+
+
+def test_backend_compartilhado_entre_filtros(tmp_path):
+    path = str(tmp_path / 'dedup.db')
+    first = DedupFilter(ttl_s=60, backend=SQLiteBackend(path))
+    second = DedupFilter(ttl_s=60, backend=SQLiteBackend(path))
+    assert first.check('k') is False
+    assert second.check('k') is True
+    assert second.stats.snapshot()['backend_hits'] == 1
+
+
+def test_event_key_igual_com_e_sem_coluna_t():
+    samples = np.arange(70, dtype=np.float64).reshape(10, 7)
+    assert event_key('v1', 5, samples) == event_key('v1', 5, samples[:, 1:])
+    assert event_key('v1', 5, samples) != event_key('v1', 6, samples)
@@ -0,0 +1,28 @@
+import csv
+import io
+
+import numpy as np
+
+from device_store import DeviceStore
+from ingestion import IngestionWorker
+from session_log import EXPORT_COLUMNS, SessionLog
+
+
+def test_export_csv_em_memoria_por_pedido(tmp_path):
+    log = SessionLog(str(tmp_path / 'sessao.db'))
+    worker = IngestionWorker(DeviceStore(lambda _: 10), log)
+    samples = np.arange(14, dtype=np.float64).reshape(2, 7)
+    log.append_event('carro_1', 1000, '12:00:00', samples)
+
+    first = worker.export_csv()
+    log.new_session()
+    log.append_event('carro_2', 2000, '12:00:01', samples[:1])
+    second = worker.export_csv()
+
+    rows = list(csv.reader(io.StringIO(first.decode('utf-8'))))
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert [r[1] for r in rows[1:]] == ['carro_1', 'carro_1']
+    # o segundo pedido não mexe no que o primeiro já devolveu
+    assert [r[1] for r in csv.reader(io.StringIO(second.decode('utf-8')))][1:] == ['carro_2']
+    assert not list(tmp_path.glob('*.csv'))
+    log.close()
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from mqtt_publisher import ResponsePublisher
+
+
+class FakeClient:
+    def __init__(self, fail_topics=(), delay=0.0):
+        self.fail_topics = set(fail_topics)
+        self.delay = delay
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def publish(self, topic, qos, payload):
+        time.sleep(self.delay)
+        if topic in self.fail_topics:
+            raise RuntimeError('boom')
+        with self._lock:
+            self.sent.append((topic, payload))
+
+
+@pytest.mark.parametrize('mode', ['sync', 'async', 'batch'])
+def test_falhas_marcadas_pela_tag(mode):
+    client = FakeClient(fail_topics={'t/b'})
+    pub = ResponsePublisher(lambda: client, mode=mode, workers=2)
+    for tag, topic in enumerate(['t/a', 't/b', 't/c']):
+        pub.publish(topic, '{}', tag=tag)
+    pub.flush()
+    assert sorted(t for t, _ in client.sent) == ['t/a', 't/c']
+    assert pub.stats.failed_tags == [1]
+
+
+def test_reset_por_invocacao_e_total_do_container():
+    client = FakeClient(fail_topics={'t/x'})
+    pub = ResponsePublisher(lambda: client)
+    pub.publish('t/a', '{}')
+    pub.publish('t/x', '{}')
+    pub.stats.reset()
+    pub.publish('t/b', '{}')
+    snap = pub.stats.snapshot()
+    assert (snap['sent'], snap['failed']) == (1, 0)
+    assert (snap['total_sent'], snap['total_failed']) == (2, 1)
+
+
+def test_async_publica_enquanto_o_chamador_segue():
+    client = FakeClient(delay=0.05)
+    pub = ResponsePublisher(lambda: client, mode='async')
+    t0 = time.perf_counter()
+    pub.publish('t/a', '{}')
+    assert time.perf_counter() - t0 < 0.04     # publish() não espera o envio
+    time.sleep(0.05)                           # trabalho do handler entre publish e flush
+    pub.flush()
+    assert time.perf_counter() - t0 < 0.09
+    assert client.sent == [('t/a', '{}')]
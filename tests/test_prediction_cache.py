@@ -0,0 +1,21 @@
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+def test_chave_tolera_ruido_abaixo_do_quantum():
+    cache = PredictionCache('v1', quantum=1e-3)
+    w = np.random.default_rng(0).integers(-5000, 5000, size=(50, 6)) * 1e-3   # no centro dos degraus
+    assert cache.key(w) == cache.key(w + 2e-4)
+    assert cache.key(w) != cache.key(w + 1e-2)
+
+
+def test_valores_grandes_nao_colidem():
+    cache = PredictionCache('v1', quantum=1e-3)
+    a, b = np.zeros((50, 6)), np.zeros((50, 6))
+    a[0, 0] = 2 ** 32 * 1e-3            # fora do int32: os dois viravam o mesmo inteiro
+    b[0, 0] = 2 ** 33 * 1e-3
+    assert cache.key(a) != cache.key(b)
+    inf = np.zeros((50, 6))
+    inf[0, 0] = np.inf
+    assert cache.key(inf) != cache.key(np.zeros((50, 6)))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from ring_buffer import RingBuffer, TRACE_COLUMNS
+
+
+def rows(start, stop):
+    """Linhas (k, 7) com o índice da linha em todas as colunas."""
+    return np.repeat(np.arange(start, stop, dtype=np.float64)[:, None], len(TRACE_COLUMNS), axis=1)
+
+
+def test_view_em_ordem_antes_de_encher():
+    rb = RingBuffer(5)
+    rb.extend(rows(0, 3))
+    assert len(rb) == 3
+    np.testing.assert_array_equal(rb.view(), rows(0, 3))
+    np.testing.assert_array_equal(rb.view(2), rows(1, 3))
+
+
+def test_volta_no_array_mantem_as_ultimas_linhas():
+    rb = RingBuffer(5)
+    rb.extend(rows(0, 4))
+    rb.extend(rows(4, 7))          # escreve 1 linha no fim e 2 no começo
+    assert len(rb) == 5
+    assert rb.head == 2
+    np.testing.assert_array_equal(rb.view(), rows(2, 7))
+    np.testing.assert_array_equal(rb.view(3), rows(4, 7))
+    np.testing.assert_array_equal(rb.column('ax'), np.arange(2, 7))
+
+
+def test_view_sem_volta_nao_copia():
+    rb = RingBuffer(8)
+    rb.extend(rows(0, 5))
+    assert np.shares_memory(rb.view(), rb.data)
+
+
+def test_bloco_maior_que_a_capacidade():
+    rb = RingBuffer(4)
+    rb.extend(rows(0, 2))
+    rb.extend(rows(2, 12))
+    assert rb.head == 0
+    np.testing.assert_array_equal(rb.view(), rows(8, 12))
+    assert rb.version == 12
+
+
+def test_append_e_last_maior_que_size():
+    rb = RingBuffer(3)
+    for i in range(5):
+        rb.append(rows(i, i + 1)[0])
+    np.testing.assert_array_equal(rb.view(10), rows(2, 5))
+
+
+def test_prefill_comeca_cheio_com_fill():
+    rb = RingBuffer(4, fill=-1.0, prefill=True)
+    assert len(rb) == 4
+    assert np.all(rb.view() == -1.0)
+    rb.extend(rows(0, 1))
+    np.testing.assert_array_equal(rb.view()[-1], rows(0, 1)[0])
+    assert np.all(rb.view()[:3] == -1.0)
+
+
+def test_capacidade_invalida():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from feature_engineering import derive_channels, sliding_window_batch
+from gravity import GravityStream
+from streaming_features import RollingWindows, StreamingScorer
+
+FS = 20.0
+
+
+def make_raw(n=437, seed=0):
+    rng = np.random.default_rng(seed)
+    raw = rng.normal(0, 3, (n, 6))
+    raw[:, 2] += 9.81
+    return raw
+
+
+def push_in_blocks(rolling, device_id, raw, sizes):
+    out, i, k = [], 0, 0
+    while i < len(raw):
+        size = sizes[k % len(sizes)]
+        out.append(rolling.push(device_id, raw[i:i + size]))
+        i, k = i + size, k + 1
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize('sizes', [[1], [3, 17, 1, 60], [437]])
+def test_janelas_iguais_as_da_sessao_inteira(sizes):
+    raw = make_raw()
+    expected = sliding_window_batch(derive_channels(raw, fs=FS), 50, 10)
+    got = push_in_blocks(RollingWindows(50, 10, fs=FS, gravity=False), 'v1', raw, sizes)
+    assert got.shape == expected.shape
+    np.testing.assert_allclose(got, expected, atol=1e-12)
+
+
+def test_gravidade_causal_por_dispositivo():
+    raw = make_raw()
+    no_gravity = raw.copy()
+    no_gravity[:, :3] = GravityStream(FS).process('v1', raw[:, :3])
+    expected = sliding_window_batch(derive_channels(no_gravity, fs=FS), 50, 10)
+    rolling = RollingWindows(50, 10, fs=FS)
+    got = push_in_blocks(rolling, 'v1', raw, [7])
+    np.testing.assert_allclose(got, expected, atol=1e-9)
+
+
+def test_dispositivos_independentes_e_fins_de_janela():
+    raw = make_raw(120)
+    rolling = RollingWindows(50, 10, fs=FS, gravity=False)
+    rolling.push('a', raw[:55])
+    rolling.push('b', raw[:30] + 1.0)
+    windows = rolling.push('a', raw[55:120])
+    assert len(windows) == 7
+    np.testing.assert_array_equal(rolling.window_ends('a', len(windows)), [60, 70, 80, 90, 100, 110, 120])
+    assert rolling.samples_seen('b') == 30
+
+
+class FakeArtifacts:
+    """Classe 0 se a média de acc_x da janela for negativa, 1 senão."""
+    classes = np.array(['normal', 'aggressive'])
+
+    def scale_features(self, features):
+        return features
+
+    def predict(self, X):
+        return (X[:, 0] >= 0).astype(int)
+
+
+def test_scorer_lote_e_zero_motion_gate():
+    raw = make_raw(60)
+    still = np.tile([0.0, 0.0, 9.81, 0.0, 0.0, 0.0], (60, 1))
+    scorer = StreamingScorer(FakeArtifacts(), fs=FS, gravity=False)
+    results = scorer.push_many({'v1': raw, 'parado': still})
+    assert [(d, end) for d, end, _ in results] == [('v1', 50), ('v1', 60), ('parado', 50), ('parado', 60)]
+    assert all(label == 'slow' for d, _, label in results if d == 'parado')
+    assert all(label in ('normal', 'aggressive') for d, _, label in results if d == 'v1')
+
+
+def test_push_many_igual_a_push_por_dispositivo():
+    raws = {f'v{i}': make_raw(130, seed=i) for i in range(4)}
+    batched, single = RollingWindows(50, 10, fs=FS), RollingWindows(50, 10, fs=FS)
+    got = {d: [] for d in raws}
+    expected = {d: [] for d in raws}
+    for t in range(130):
+        # v3 manda blocos de 2 amostras: dois tamanhos no mesmo tick
+        blocks = {d: r[t:t + 1] for d, r in raws.items() if d != 'v3'}
+        if t % 2 == 0:
+            blocks['v3'] = raws['v3'][t:t + 2]
+        for d, w in batched.push_many(blocks).items():
+            got[d].append(w)
+        for d, samples in blocks.items():
+            expected[d].append(single.push(d, samples))
+    for d in raws:
+        np.testing.assert_allclose(np.concatenate(got[d]), np.concatenate(expected[d]), atol=1e-12)